@@ -0,0 +1,111 @@
+# 文件路径: benchmarks/bench_import.py
+"""
+对比逐行 db.session.add 的旧导入与批量插入导入在合成备份上的耗时和 SQL 条数。
+
+运行: python -m benchmarks.bench_import [--logs 500000] [--skip-legacy]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta
+
+from learning_logger import create_app, db
+from learning_logger.models import User, LogEntry
+from learning_logger.services import data_service
+
+from .common import measure, print_comparison, QueryStats
+
+
+def write_synthetic_backup(path, log_count, stages=4, seed=42):
+    """写出一个包含 log_count 条 LogEntry 的备份 ZIP，记录逐行写入，不占用大块内存。"""
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('data/stage.json', json.dumps([
+            {'id': i + 1, 'name': f'阶段{i + 1}', 'start_date': (start + timedelta(days=365 * i)).isoformat(),
+             'user_id': 1} for i in range(stages)], ensure_ascii=False, indent=4))
+        zf.writestr('data/category.json', json.dumps([{'id': 1, 'name': '学习', 'user_id': 1}], ensure_ascii=False))
+        zf.writestr('data/sub_category.json', json.dumps(
+            [{'id': i + 1, 'name': f'标签{i + 1}', 'category_id': 1} for i in range(5)], ensure_ascii=False))
+        with zf.open('data/log_entry.json', 'w', force_zip64=True) as f:
+            f.write(b'[')
+            for i in range(log_count):
+                log_date = start + timedelta(days=i * 365 * stages // max(log_count, 1))
+                record = {
+                    'id': i + 1, 'log_date': log_date.isoformat(), 'time_slot': '09:00-10:00',
+                    'task': f'任务 {i}', 'actual_duration': rng.randint(10, 180), 'legacy_category': None,
+                    'subcategory_id': rng.randint(1, 5), 'mood': rng.randint(1, 5),
+                    'notes': '复习线性代数与概率论，整理错题。', 'stage_id': min(i * stages // log_count, stages - 1) + 1
+                }
+                f.write((',\n' if i else '\n').encode() + json.dumps(record, ensure_ascii=False).encode('utf-8'))
+            f.write(b'\n]')
+        zf.writestr('data/todo.json', json.dumps([
+            {'id': 1, 'content': '整理笔记', 'due_date': None, 'priority': 2, 'is_completed': False,
+             'created_at': datetime(2024, 1, 1).isoformat(), 'completed_at': None, 'user_id': 1}]))
+
+
+def legacy_import(user, zip_path):
+    """旧版导入：整表 json.load，按键名猜测日期字段，逐行 db.session.add。"""
+    model_map = {model.__tablename__: model for model in data_service.MODELS_TO_HANDLE}
+    with zipfile.ZipFile(zip_path) as zf:
+        for table_name in data_service.IMPORT_ORDER:
+            model = model_map[table_name]
+            json_path = f'data/{table_name}.json'
+            if json_path not in zf.namelist():
+                continue
+            with zf.open(json_path) as json_file:
+                for record_data in json.load(json_file):
+                    if 'user_id' in model.__table__.columns:
+                        record_data['user_id'] = user.id
+                    for key, value in record_data.items():
+                        if isinstance(value, str) and value:
+                            if 'datetime' in key or key.endswith('_at') or key.endswith('_utc'):
+                                record_data[key] = datetime.fromisoformat(value).replace(tzinfo=None)
+                            elif 'date' in key:
+                                record_data[key] = date.fromisoformat(value)
+                    db.session.add(model(**record_data))
+    db.session.commit()
+
+
+def make_user(username):
+    user = User(username=username, email=f'{username}@example.com')
+    user.set_password('benchmark')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logs', type=int, default=500_000)
+    parser.add_argument('--skip-legacy', action='store_true', help='只运行新的批量导入')
+    args = parser.parse_args()
+
+    app = create_app('testing')
+    with app.app_context(), tempfile.TemporaryDirectory() as tmp:
+        app.config['MILESTONE_UPLOADS'] = tmp
+        zip_path = os.path.join(tmp, 'backup.zip')
+        write_synthetic_backup(zip_path, args.logs)
+        db.create_all()
+
+        before = QueryStats()
+        if not args.skip_legacy:
+            with measure(db.engine) as before:
+                legacy_import(make_user('legacy'), zip_path)
+
+        user = make_user('bulk')
+        with measure(db.engine) as after, open(zip_path, 'rb') as stream:
+            success, message = data_service.import_data_for_user(user, stream)
+        assert success, message
+        imported = LogEntry.query.join(LogEntry.stage).filter_by(user_id=user.id).count()
+        assert imported == args.logs, imported
+
+        print_comparison(f"import_data_for_user ({args.logs} LogEntry rows)", before, after)
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main()
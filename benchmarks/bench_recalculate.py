@@ -0,0 +1,67 @@
+# 文件路径: benchmarks/bench_recalculate.py
+"""
+对比 recalculate_efficiency_for_stage 的逐日实现与批量实现的查询条数和耗时。
+
+运行: python -m benchmarks.bench_recalculate [天数] [每天记录数]
+"""
+import sys
+from datetime import date, timedelta
+
+from learning_logger import create_app, db
+from learning_logger.models import Stage, DailyData, WeeklyData
+from learning_logger.services import record_service
+
+from .common import measure, print_comparison
+from .datagen import create_user_with_logs
+
+
+def legacy_recalculate(stage):
+    """旧版逐日实现：每个日期各发一次日志查询和一次 DailyData 查询。"""
+    all_logs = stage.log_entries.all()
+    DailyData.query.filter_by(stage_id=stage.id).delete()
+    WeeklyData.query.filter_by(stage_id=stage.id).delete()
+    db.session.commit()
+
+    unique_log_dates = sorted(set(log.log_date for log in all_logs))
+    daily_efficiencies_map = {}
+    for log_date in unique_log_dates:
+        score = record_service._calculate_daily_efficiency_score(log_date, stage.id)
+        record_service._get_or_create_daily_data(log_date, stage.id, score)
+        daily_efficiencies_map[log_date] = score
+    db.session.commit()
+
+    next_stage = Stage.query.filter(Stage.user_id == stage.user_id, Stage.start_date > stage.start_date).order_by(
+        Stage.start_date.asc()).first()
+    stage_end_date = (next_stage.start_date - timedelta(days=1)) if next_stage else date.today()
+    weekly_scores = record_service._compute_weekly_scores(stage, daily_efficiencies_map, stage_end_date)
+    for (year, week_num), score in weekly_scores.items():
+        record_service._get_or_create_weekly_data(year, week_num, stage.id, score)
+    db.session.commit()
+
+
+def snapshot(stage_id):
+    daily = {d.log_date: round(d.efficiency, 9) for d in DailyData.query.filter_by(stage_id=stage_id)}
+    weekly = {(w.year, w.week_num): round(w.efficiency, 9) for w in WeeklyData.query.filter_by(stage_id=stage_id)}
+    return daily, weekly
+
+
+def main(days=730, logs_per_day=3):
+    app = create_app('testing')
+    with app.app_context():
+        db.create_all()
+        _, stage = create_user_with_logs(days=days, logs_per_day=logs_per_day)
+
+        with measure(db.engine) as before:
+            legacy_recalculate(stage)
+        expected = snapshot(stage.id)
+
+        with measure(db.engine) as after:
+            record_service.recalculate_efficiency_for_stage(stage)
+        assert snapshot(stage.id) == expected, "bulk engine diverged from the legacy results"
+
+        print_comparison(f"recalculate_efficiency_for_stage ({days} days x {logs_per_day} logs)", before, after)
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,71 @@
+# 文件路径: benchmarks/bench_startup.py
+"""
+用 `python -X importtime` 测量 create_app 的冷启动导入耗时，并检查重量级依赖是否被提前加载。
+
+运行: python -m benchmarks.bench_startup [预算毫秒] [运行次数]
+任一检查失败时以非零状态退出，可直接放进 CI 防止启动回归。
+"""
+import os
+import subprocess
+import sys
+
+# 这些模块应当只在第一次绘图/分词时加载
+LAZY_MODULES = ('matplotlib', 'jieba', 'numpy', 'wordcloud', 'PIL')
+
+STARTUP_SNIPPET = "from learning_logger import create_app; create_app('testing')"
+
+
+def parse_importtime(stderr):
+    """解析 -X importtime 输出，返回 [(模块名, 自身微秒, 累计微秒, 缩进层级)]。"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def measure_startup(snippet=STARTUP_SNIPPET, preload=False):
+    """在独立进程中执行 snippet，返回 (导入明细, 总导入毫秒数, 已加载的重量级模块)。"""
+    env = dict(os.environ, PRELOAD_HEAVY_MODULES='1' if preload else '0')
+    probe = f"{snippet}; import sys; print(','.join(m for m in {LAZY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', probe], capture_output=True, text=True,
+                            env=env, check=True)
+    rows = parse_importtime(result.stderr)
+    total_ms = sum(cumulative for _, _, cumulative, depth in rows if depth == 0) / 1000
+    loaded = [m for m in result.stdout.strip().splitlines()[-1].split(',') if m] if result.stdout.strip() else []
+    return rows, total_ms, loaded
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else 1500
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    top = 15
+
+    samples = [measure_startup() for _ in range(runs)]
+    rows, best_ms, loaded = min(samples, key=lambda sample: sample[1])
+    _, preload_ms, _ = measure_startup(preload=True)
+
+    print(f"create_app import time: best {best_ms:.0f} ms over {runs} run(s) "
+          f"(with PRELOAD_HEAVY_MODULES=1: {preload_ms:.0f} ms)")
+    print(f"Top {top} top-level imports by cumulative time:")
+    top_level = sorted((r for r in rows if r[3] <= 1), key=lambda r: r[2], reverse=True)[:top]
+    for name, _, cumulative, depth in top_level:
+        print(f"  {cumulative / 1000:8.1f} ms  {'  ' * depth}{name}")
+
+    failures = []
+    if loaded:
+        failures.append(f"heavy modules imported at startup: {', '.join(loaded)}")
+    if best_ms > budget_ms:
+        failures.append(f"import time {best_ms:.0f} ms exceeds budget {budget_ms:.0f} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("OK")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
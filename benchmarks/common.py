@@ -0,0 +1,39 @@
+# 文件路径: benchmarks/common.py
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryStats:
+    """记录一段代码执行期间发出的 SQL 语句数量与耗时。"""
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+
+@contextmanager
+def measure(engine):
+    """在代码块执行期间统计 engine 上的 SQL 条数及总墙钟时间。"""
+    stats = QueryStats()
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        stats.count += 1
+
+    event.listen(engine, 'before_cursor_execute', _on_execute)
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.elapsed = time.perf_counter() - start
+        event.remove(engine, 'before_cursor_execute', _on_execute)
+
+
+def print_comparison(title, before, after):
+    print(f"\n{title}")
+    print(f"{'':<10}{'queries':>10}{'seconds':>12}")
+    print(f"{'before':<10}{before.count:>10}{before.elapsed:>12.3f}")
+    print(f"{'after':<10}{after.count:>10}{after.elapsed:>12.3f}")
+    if after.elapsed > 0:
+        print(f"speedup: {before.elapsed / after.elapsed:.1f}x")
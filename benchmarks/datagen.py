@@ -0,0 +1,137 @@
+# 文件路径: benchmarks/datagen.py
+import random
+from datetime import date, timedelta
+
+from learning_logger import db
+from learning_logger.models import User, Stage, LogEntry, Category, SubCategory
+from learning_logger.services import record_service, rollup_service, token_index_service
+
+
+def create_user_with_logs(username='bench', days=730, logs_per_day=3, start_date=None, seed=42):
+    """
+    生成一个拥有单个阶段、连续 days 天、每天 logs_per_day 条记录的用户。
+    使用批量插入，生成百万级数据时也不会逐条创建 ORM 对象。
+    """
+    rng = random.Random(seed)
+    start_date = start_date or (date.today() - timedelta(days=days - 1))
+
+    user = User(username=username, email=f'{username}@example.com')
+    user.set_password('benchmark')
+    db.session.add(user)
+    db.session.flush()
+
+    stage = Stage(name=f'{username}-stage', start_date=start_date, user_id=user.id)
+    db.session.add(stage)
+    db.session.flush()
+
+    rows = []
+    for day in range(days):
+        log_date = start_date + timedelta(days=day)
+        for _ in range(logs_per_day):
+            rows.append({
+                'log_date': log_date,
+                'task': 'benchmark task',
+                'actual_duration': rng.randint(10, 180),
+                'mood': rng.choice([None, 1, 2, 3, 4, 5]),
+                'stage_id': stage.id,
+            })
+    db.session.execute(LogEntry.__table__.insert(), rows)
+    rollup_service.rebuild_for_user(user.id)
+    db.session.commit()
+    return user, stage
+
+
+# 合成笔记使用的分类、标签与语料，让分词与词云的负载接近真实用户
+CATEGORY_VOCABULARY = {
+    '数学': (['线性代数', '概率论', '高等数学', '离散数学'], ['矩阵', '特征值', '积分', '极限', '贝叶斯', '随机变量', '证明']),
+    '英语': (['单词', '听力', '阅读', '写作'], ['词根', '长难句', '精听', '外刊', '作文', '语法', '同义替换']),
+    '编程': (['Python', '算法', '数据库', '前端'], ['递归', '动态规划', '索引', '事务', '组件', '单元测试', '重构']),
+    '专业课': (['操作系统', '计算机网络', '数据结构', '组成原理'], ['进程', '死锁', '拥塞控制', '二叉树', '缓存', '流水线']),
+    '阅读': (['小说', '历史', '哲学', '传记'], ['人物', '结构', '观点', '摘抄', '时代', '思考']),
+    '运动': (['跑步', '力量', '游泳', '拉伸'], ['配速', '心率', '核心', '呼吸', '耐力', '恢复']),
+}
+NOTE_TEMPLATES = (
+    '复习{sub}，重点整理{a}和{b}相关的错题。',
+    '今天{sub}状态不错，{a}基本掌握，{b}还需要再看一遍。',
+    '完成{sub}的练习，总结了{a}的常见套路，顺便复盘{b}。',
+    '{sub}进度落后，{a}卡了很久，明天先解决{b}。',
+    '看了两节{sub}课程，做了{a}笔记，对{b}有了新的理解。',
+)
+TIME_SLOTS = ('07:00-08:00', '09:00-11:00', '14:00-15:30', '16:00-17:00', '20:00-22:00')
+
+
+def _make_note(rng, subcategory, keywords):
+    a, b = rng.sample(keywords, 2)
+    return rng.choice(NOTE_TEMPLATES).format(sub=subcategory, a=a, b=b)
+
+
+def create_heavy_user(username='heavy', stages=4, categories=6, subcategories_per_category=4, days=1460,
+                      logs_per_day=6, notes_ratio=0.7, start_date=None, seed=42, batch_size=50_000,
+                      with_derived=True):
+    """
+    生成一个重度用户：stages 个阶段均分 days 天，categories 个分类（各带若干标签），
+    共 days * logs_per_day 条日志，约 notes_ratio 比例附带由模板组合的中文笔记。
+    日志分批插入并逐批提交，生成百万级数据时内存占用只与 batch_size 有关。
+    with_derived 为真时同时重建汇总表、词频表并重算各阶段效率，使数据状态与真实使用一致。
+    返回 (user, [stage, ...])。
+    """
+    rng = random.Random(seed)
+    start_date = start_date or (date.today() - timedelta(days=days - 1))
+
+    user = User(username=username, email=f'{username}@example.com')
+    user.set_password('benchmark')
+    db.session.add(user)
+    db.session.flush()
+
+    stage_length = max(days // stages, 1)
+    stage_list = [Stage(name=f'阶段{i + 1}', start_date=start_date + timedelta(days=i * stage_length), user_id=user.id)
+                  for i in range(stages)]
+    db.session.add_all(stage_list)
+
+    category_names = list(CATEGORY_VOCABULARY)
+    subcategories = []
+    for i in range(categories):
+        base = category_names[i % len(category_names)]
+        label_names, keywords = CATEGORY_VOCABULARY[base]
+        name = base if i < len(category_names) else f'{base}{i // len(category_names) + 1}'
+        category = Category(name=name, user_id=user.id)
+        db.session.add(category)
+        for j in range(subcategories_per_category):
+            label = label_names[j % len(label_names)]
+            subcategory = SubCategory(name=label if j < len(label_names) else f'{label}{j}', category=category)
+            db.session.add(subcategory)
+            subcategories.append((subcategory, label, keywords))
+    db.session.commit()
+    stage_ids = [stage.id for stage in stage_list]
+
+    rows = []
+    for day in range(days):
+        log_date = start_date + timedelta(days=day)
+        stage_id = stage_ids[min(day // stage_length, stages - 1)]
+        for _ in range(logs_per_day):
+            subcategory, label, keywords = rng.choice(subcategories)
+            rows.append({
+                'log_date': log_date,
+                'time_slot': rng.choice(TIME_SLOTS),
+                'task': f'{label}：{rng.choice(keywords)}',
+                'actual_duration': rng.randint(10, 180),
+                'mood': rng.choice([None, 1, 2, 3, 4, 5]),
+                'notes': _make_note(rng, label, keywords) if rng.random() < notes_ratio else None,
+                'stage_id': stage_id,
+                'subcategory_id': subcategory.id,
+            })
+            if len(rows) >= batch_size:
+                db.session.execute(LogEntry.__table__.insert(), rows)
+                db.session.commit()
+                rows = []
+    if rows:
+        db.session.execute(LogEntry.__table__.insert(), rows)
+        db.session.commit()
+
+    if with_derived:
+        rollup_service.rebuild_for_user(user.id)
+        token_index_service.rebuild_for_user(user.id)
+        db.session.commit()
+        for stage in stage_list:
+            record_service.recalculate_efficiency_for_stage(stage)
+    return user, stage_list
@@ -0,0 +1,133 @@
+# 文件路径: benchmarks/perf_suite.py
+"""
+基于 pytest-benchmark 的服务层性能基准，数据来自 datagen.create_heavy_user 生成的重度用户。
+依赖见 requirements-dev.txt：pip install -r requirements-dev.txt
+
+文件名不以 test_ 开头，默认的 `pytest` 不会收集；需显式指定：
+    python -m pytest benchmarks/perf_suite.py
+
+数据规模由环境变量控制（默认约 8,700 条日志，几秒内跑完）：
+    BENCH_DAYS=1460  BENCH_LOGS_PER_DAY=6  BENCH_STAGES=4  BENCH_CATEGORIES=6
+    例如 BENCH_DAYS=3650 BENCH_LOGS_PER_DAY=300 生成约一百万条。
+
+基线与回归阈值：
+    python -m benchmarks.run_perf --save                # 在本机记录基线
+    python -m benchmarks.run_perf --compare [--threshold 20]
+比较时任一用例的平均耗时比基线慢超过阈值（百分比）即以非零状态退出。
+所有缓存在测试配置下均为 null 后端，每一轮都是实际计算。
+"""
+import io
+import os
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from learning_logger import create_app, db
+from learning_logger.models import User
+from learning_logger.services import chart_service, data_service, record_service, wordcloud_service
+
+from .datagen import create_heavy_user
+
+DATASET = {
+    'days': int(os.environ.get('BENCH_DAYS', 1460)),
+    'logs_per_day': int(os.environ.get('BENCH_LOGS_PER_DAY', 6)),
+    'stages': int(os.environ.get('BENCH_STAGES', 4)),
+    'categories': int(os.environ.get('BENCH_CATEGORIES', 6)),
+}
+WORDCLOUD_MASK = 'book-open.png'
+
+
+@pytest.fixture(scope='module')
+def app(tmp_path_factory):
+    _app = create_app('testing')
+    _app.config['MILESTONE_UPLOADS'] = str(tmp_path_factory.mktemp('uploads'))
+    with _app.app_context():
+        db.create_all()
+        yield _app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture(scope='module')
+def heavy_user(app):
+    user, stages = create_heavy_user(**DATASET)
+    return user, stages
+
+
+@pytest.fixture(scope='module')
+def backup_bytes(heavy_user):
+    user, _ = heavy_user
+    return b''.join(data_service.iter_export_zip(user))
+
+
+def test_chart_data(benchmark, heavy_user):
+    user, _ = heavy_user
+    data, _ = benchmark(chart_service.get_chart_data_for_user, user)
+    assert data
+
+
+def test_category_chart_data(benchmark, heavy_user):
+    user, _ = heavy_user
+    assert benchmark(chart_service.get_category_chart_data, user)
+
+
+def test_category_chart_data_single_stage(benchmark, heavy_user):
+    user, stages = heavy_user
+    assert benchmark(chart_service.get_category_chart_data, user, stages[-1].id)
+
+
+def test_log_page_first(benchmark, heavy_user):
+    _, stages = heavy_user
+    page = benchmark(record_service.get_log_page_for_stage, stages[-1])
+    assert page['weeks']
+
+
+def test_log_page_deep_cursor(benchmark, heavy_user):
+    _, stages = heavy_user
+    stage = stages[-1]
+    first = record_service.get_log_page_for_stage(stage)
+    if first['next_cursor'] is None:
+        pytest.skip('dataset too small for a second page')
+    cursor = record_service.parse_page_cursor(first['next_cursor'])
+    page = benchmark(record_service.get_log_page_for_stage, stage, 'desc', cursor)
+    assert page['weeks']
+
+
+def test_recalculate_efficiency(benchmark, heavy_user):
+    _, stages = heavy_user
+    benchmark.pedantic(record_service.recalculate_efficiency_for_stage, args=(stages[-1],), rounds=5, iterations=1)
+
+
+def test_export(benchmark, heavy_user):
+    user, _ = heavy_user
+
+    def export():
+        return sum(len(chunk) for chunk in data_service.iter_export_zip(user))
+
+    assert benchmark.pedantic(export, rounds=3, iterations=1) > 0
+
+
+def test_import(benchmark, app, backup_bytes):
+    importer = User(username='importer', email='importer@example.com')
+    importer.set_password('benchmark')
+    db.session.add(importer)
+    db.session.commit()
+
+    def run_import():
+        return data_service.import_data_for_user(importer, io.BytesIO(backup_bytes))
+
+    success, message = benchmark.pedantic(run_import, rounds=3, iterations=1)
+    assert success, message
+
+
+def test_wordcloud(benchmark, app, heavy_user):
+    if not os.path.exists(os.path.join(app.static_folder, 'fonts', 'NotoSansSC-Regular.ttf')):
+        pytest.skip('word cloud font is not installed')
+    user, _ = heavy_user
+
+    def generate():
+        etag, render = wordcloud_service.prepare_wordcloud(user, mask_name=WORDCLOUD_MASK)
+        return render()
+
+    assert benchmark.pedantic(generate, rounds=3, iterations=1)
@@ -0,0 +1,41 @@
+# 文件路径: benchmarks/run_perf.py
+"""
+运行 perf_suite 并管理基线。需要 requirements-dev.txt 中的 pytest-benchmark。
+
+运行: python -m benchmarks.run_perf [--save] [--compare] [--threshold 百分比] [pytest 额外参数...]
+--save     把本次结果保存为基线（存放在 benchmarks/.baselines/，按机器与 Python 版本分目录）
+--compare  与最近一次保存的基线比较，任一用例平均耗时变慢超过 --threshold（默认 20%）时以非零状态退出
+基线与机器强相关，只应在同一台机器（或同一 CI 规格）上比较。
+"""
+import argparse
+import os
+import sys
+
+import pytest
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_DIR = os.path.join(BENCH_DIR, '.baselines')
+SUITE = os.path.join(BENCH_DIR, 'perf_suite.py')
+
+
+def build_args(save=False, compare=False, threshold=20.0, extra=()):
+    args = [SUITE, '-q', f'--benchmark-storage=file://{BASELINE_DIR}',
+            '--benchmark-columns=min,mean,median,max,rounds', '--benchmark-sort=name']
+    if save:
+        args.append('--benchmark-save=baseline')
+    if compare:
+        args += ['--benchmark-compare', f'--benchmark-compare-fail=mean:{threshold:g}%']
+    return args + list(extra)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--save', action='store_true', help='保存本次结果为基线')
+    parser.add_argument('--compare', action='store_true', help='与最近的基线比较')
+    parser.add_argument('--threshold', type=float, default=20.0, help='允许的平均耗时退化百分比')
+    args, extra = parser.parse_known_args(argv)
+    return pytest.main(build_args(args.save, args.compare, args.threshold, extra))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
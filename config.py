@@ -10,8 +10,59 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     WTF_CSRF_ENABLED = True
     MATPLOTLIB_BACKEND = 'Agg'
+    # 在 create_app 中预先导入 matplotlib/jieba 等依赖，配合 gunicorn preload_app 使用
+    PRELOAD_HEAVY_MODULES = os.environ.get('PRELOAD_HEAVY_MODULES', '0') == '1'
     SQLALCHEMY_ECHO = False
 
+    # 按请求统计 SQL 条数与耗时（Server-Timing 响应头、结构化日志、/admin/metrics）
+    SQL_PROFILER_ENABLED = os.environ.get('SQL_PROFILER_ENABLED', '1') == '1'
+    SQL_PROFILER_TOP_N = 5
+    # 超过任一阈值的请求以 WARNING 级别记录
+    SQL_PROFILER_WARN_QUERIES = int(os.environ.get('SQL_PROFILER_WARN_QUERIES', 30))
+    SQL_PROFILER_WARN_MS = float(os.environ.get('SQL_PROFILER_WARN_MS', 200))
+    # 可访问 /admin/metrics 的账号邮箱，逗号分隔
+    ADMIN_EMAILS = [e.strip() for e in os.environ.get('ADMIN_EMAILS', '').split(',') if e.strip()]
+
+    # 导入后重算效率的后台线程数（SQLite 下固定为 1）
+    RECALC_MAX_WORKERS = int(os.environ.get('RECALC_MAX_WORKERS', 4))
+    RECALC_JOBS_EAGER = False
+
+    # 缓存后端: 'memory'（进程内 LRU）、'redis' 或 'null'。
+    # 'memory' 的失效只作用于处理写请求的那个进程：gunicorn 多 worker 部署时其他 worker
+    # 会继续返回旧值直到 TTL 过期，因此 'memory' 只适用于单 worker；多 worker 请使用 'redis'。
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_MAX_ENTRIES = 1024
+    CHART_CACHE_TTL = 300
+    # 词云 PNG 体积较大，单独限制条目数
+    WORDCLOUD_CACHE_TTL = 24 * 3600
+    WORDCLOUD_CACHE_MAX_ENTRIES = 64
+    CHART_IMAGE_CACHE_TTL = 24 * 3600
+    CHART_IMAGE_CACHE_MAX_ENTRIES = 256
+    # 首页摘要：写入时主动失效，TTL 只兜底倒计时到期等与写入无关的变化
+    DASHBOARD_CACHE_TTL = 60
+    SETTINGS_CACHE_TTL = 3600
+    # 'memory' 后端下其他 worker 收不到失效，设置最多滞后这么多秒
+    SETTINGS_LOCAL_CACHE_TTL = 15
+    # 登录用户身份缓存；User 行变更时自动失效
+    USER_CACHE_TTL = 300
+    # 'memory' 后端下其他 worker 收不到失效：删除用户或修改用户名/邮箱后最多滞后这么多秒
+    USER_LOCAL_CACHE_TTL = 5
+
+    # 词云与导出图的渲染进程池：0 表示在请求线程内直接渲染。
+    # 每个 gunicorn worker 各自持有一个进程池，每个渲染进程都会创建完整应用并预加载
+    # matplotlib/jieba/wordcloud（约 100MB+），单机常驻渲染进程数 = gunicorn workers × 此值，
+    # 因此默认只开 2 个；提高前先按内存与 CPU 核数核算。
+    RENDER_POOL_WORKERS = int(os.environ.get('RENDER_POOL_WORKERS', 2))
+    RENDER_QUEUE_SIZE = int(os.environ.get('RENDER_QUEUE_SIZE', 8))
+    RENDER_TIMEOUT = int(os.environ.get('RENDER_TIMEOUT', 30))
+    RENDER_START_METHOD = os.environ.get('RENDER_START_METHOD', 'spawn')
+
+    # 学习记录页每次加载的周数（首屏与无限滚动的每一页）
+    RECORDS_WEEKS_PER_PAGE = 8
+    # 流式渲染时每次发送的最小字符数
+    TEMPLATE_STREAM_BUFFER_SIZE = 8192
+
     UPLOAD_FOLDER_BASE = os.path.join(basedir, 'static', 'uploads')
     MILESTONE_UPLOADS = os.path.join(UPLOAD_FOLDER_BASE, 'milestones')
     BACKGROUND_UPLOADS = os.path.join(UPLOAD_FOLDER_BASE, 'backgrounds')
@@ -49,6 +100,11 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    # 内存 SQLite 只有一个共享连接，重算任务在请求线程中同步执行
+    RECALC_JOBS_EAGER = True
+    # 每个测试都会重建数据库，跨测试的缓存只会返回过期数据
+    CACHE_BACKEND = 'null'
+    RENDER_POOL_WORKERS = 0
 
 
 config = {
@@ -0,0 +1,13 @@
+# 文件路径: gunicorn.conf.py
+# gunicorn 会自动读取当前目录下的此文件。
+import os
+
+# GUNICORN_PRELOAD_APP=1 时在 master 中创建应用并预加载重量级依赖，
+# fork 出的 worker 通过写时复制共享这些内存页，启动也更快。
+# create_app 本身不会建立数据库连接，因此 worker 不会继承 master 的连接。
+preload_app = os.environ.get('GUNICORN_PRELOAD_APP', '0') == '1'
+if preload_app:
+    os.environ.setdefault('PRELOAD_HEAVY_MODULES', '1')
+
+# 每个 worker 进程都有自己的渲染进程池（RENDER_POOL_WORKERS 个进程，默认 2），
+# 单机渲染进程总数 = worker 数 × RENDER_POOL_WORKERS，调大 --workers 时注意一并核算内存。
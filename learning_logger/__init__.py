@@ -6,8 +6,6 @@ from flask_login import LoginManager, current_user
 from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect
 from config import config
-import matplotlib
-import jieba # <-- 1. 导入 jieba
 
 db = SQLAlchemy()
 login_manager = LoginManager()
@@ -23,6 +21,8 @@ def create_app(config_name=os.getenv('FLASK_ENV', 'default')):
     app = Flask(__name__, template_folder='../templates', static_folder='../static')
 
     app.config.from_object(config[config_name])
+    # 渲染进程池的工作进程据此以相同配置创建应用
+    app.config['CONFIG_NAME'] = config_name
     config[config_name].init_app(app)
 
     if app.config.get('SQLALCHEMY_ECHO'):
@@ -55,6 +55,7 @@ def create_app(config_name=os.getenv('FLASK_ENV', 'default')):
         from .blueprints.stage import stage_bp
         from .blueprints.category import category_management_bp
         from .blueprints.motto_management import motto_management_bp
+        from .blueprints.admin import admin_bp
 
         app.register_blueprint(main_bp)
         app.register_blueprint(records_bp, url_prefix='/records')
@@ -68,27 +69,49 @@ def create_app(config_name=os.getenv('FLASK_ENV', 'default')):
         app.register_blueprint(stage_bp)
         app.register_blueprint(category_management_bp)
         app.register_blueprint(motto_management_bp)
+        app.register_blueprint(admin_bp)
 
-        from .models import User, Setting
+        from .services import identity_service, settings_service
         @login_manager.user_loader
         def load_user(user_id):
-            return User.query.get(int(user_id))
+            return identity_service.load_principal(int(user_id))
 
         @app.context_processor
         def inject_user_settings():
             if current_user.is_authenticated:
-                settings_query = Setting.query.filter_by(user_id=current_user.id).all()
-                user_settings = {setting.key: setting.value for setting in settings_query}
-                return dict(user_settings=user_settings)
+                return dict(user_settings=settings_service.get_user_settings(current_user.id))
             return dict(user_settings={})
 
+        app.teardown_request(settings_service.clear_request_memo)
+
+        from . import instrumentation
+        instrumentation.init_app(app)
+
         from . import helpers
         helpers.setup_template_filters(app)
 
-    # --- 2. 性能优化：在应用启动时预加载 jieba 词典 ---
-    app.logger.info("Initializing jieba dictionary...")
-    jieba.initialize()
-    app.logger.info("Jieba dictionary initialized successfully.")
-    # --- 结束优化 ---
+        from .services.rollup_service import rollup_cli
+        app.cli.add_command(rollup_cli)
+        from .services.token_index_service import token_index_cli
+        app.cli.add_command(token_index_cli)
+        from .services.wordcloud_service import wordcloud_cli
+        app.cli.add_command(wordcloud_cli)
+
+    # matplotlib、wordcloud、jieba 等重量级依赖默认在第一次使用时才加载；
+    # 配合 gunicorn preload_app 时在 master 中预先加载，fork 出的 worker 以写时复制方式共享
+    if app.config.get('PRELOAD_HEAVY_MODULES'):
+        preload_heavy_modules(app)
 
     return app
+
+
+def preload_heavy_modules(app):
+    """导入绘图与分词依赖并初始化 jieba 词典。"""
+    app.logger.info("Preloading numpy, matplotlib, wordcloud and the jieba dictionary...")
+    import jieba
+    import numpy  # noqa: F401
+    import wordcloud  # noqa: F401
+    from .services import chart_plotter, trend_engine  # noqa: F401
+    chart_plotter.pyplot()
+    jieba.initialize()
+    app.logger.info("Heavy modules preloaded.")
@@ -0,0 +1,48 @@
+# 文件路径: learning_logger/blueprints/admin.py
+from functools import wraps
+
+from flask import Blueprint, abort, current_app, jsonify
+from flask_login import login_required, current_user
+
+from .. import instrumentation
+from ..services import chart_service, dashboard_service, identity_service, settings_service, wordcloud_service
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+def admin_required(view):
+    """仅 ADMIN_EMAILS 中的账号可访问；其他人看到 404，不暴露入口的存在。也用于其他蓝图中的运维接口。"""
+    @wraps(view)
+    @login_required
+    def wrapped(*args, **kwargs):
+        if current_user.email not in current_app.config['ADMIN_EMAILS']:
+            abort(404)
+        return view(*args, **kwargs)
+    return wrapped
+
+
+@admin_bp.before_request
+@admin_required
+def require_admin():
+    pass
+
+
+@admin_bp.route('/metrics')
+def metrics():
+    """本进程按视图聚合的 SQL 统计、最慢语句以及各缓存的命中率。"""
+    return jsonify({
+        'sql': instrumentation.metrics.snapshot(),
+        'caches': {cache.namespace: cache.stats_dict() for cache in (
+            chart_service.chart_cache, chart_service.chart_image_cache, wordcloud_service.wordcloud_cache,
+            dashboard_service.dashboard_cache, settings_service.settings_cache, identity_service.identity_cache)},
+    })
+
+
+@admin_bp.route('/wordcloud/reload-assets', methods=['POST'])
+def reload_wordcloud_assets():
+    """
+    停用词或遮罩文件更新后调用。本进程立即重新加载并回收渲染进程池；
+    其他进程在下一次生成词云时通过共享的资源版本号发现变化（需要 Redis 缓存后端）。
+    """
+    version = wordcloud_service.reload_assets()
+    return jsonify({'success': True, 'assets_version': version, 'assets': wordcloud_service.asset_stats()})
@@ -4,6 +4,7 @@ from flask import (Blueprint, request, redirect, url_for,
 from flask_login import login_required, current_user
 from .. import db
 from ..models import Category, SubCategory
+from ..services.chart_service import invalidate_chart_data
 
 category_management_bp = Blueprint('category_management', __name__, url_prefix='/categories')
 
@@ -40,6 +41,7 @@ def edit_category(category_id):
     else:
         category.name = name
         db.session.commit()
+        invalidate_chart_data(current_user.id)
         flash('分类已更新。', 'success')
     return redirect(url_for('category_management.manage_categories'))
 
@@ -100,6 +102,7 @@ def edit_subcategory(subcategory_id):
             subcategory.name = name
             subcategory.category_id = category_id
             db.session.commit()
+            invalidate_chart_data(current_user.id)
             flash('标签已更新。', 'success')
     return redirect(url_for('category_management.manage_categories'))
 
@@ -1,14 +1,17 @@
 import io
+import math
 import zipfile
 from datetime import date
 
 from flask import (Blueprint, render_template, jsonify, Response, flash,
-                   redirect, url_for, request, current_app)
+                   redirect, url_for, request, current_app, abort)
 from flask_login import login_required, current_user
-import numpy as np
+from itsdangerous import Signer
 
-from ..services import chart_service, chart_plotter, wordcloud_service
+from ..services import (chart_service, chart_plotter, dashboard_service, identity_service, render_pool,
+                        settings_service, wordcloud_service)
 from ..models import Stage
+from .admin import admin_required
 
 charts_bp = Blueprint('charts', 'charts_bp', url_prefix='/charts')
 
@@ -49,7 +52,7 @@ def clean_nan_for_json(data):
         return {k: clean_nan_for_json(v) for k, v in data.items()}
     if isinstance(data, list):
         return [clean_nan_for_json(i) for i in data]
-    if isinstance(data, float) and np.isnan(data):
+    if isinstance(data, float) and math.isnan(data):
         return None
     return data
 
@@ -61,14 +64,38 @@ def get_chart_data():
     chart_data, _ = chart_service.get_chart_data_for_user(current_user)
     cleaned_chart_data = clean_nan_for_json(chart_data)
 
-    if cleaned_chart_data.get('kpis') and 'avg_daily_minutes' in cleaned_chart_data['kpis']:
-        raw_minutes = cleaned_chart_data['kpis']['avg_daily_minutes']
-        hours, minutes = divmod(int(raw_minutes or 0), 60)
-        cleaned_chart_data['kpis']['avg_daily_formatted'] = f"{hours}小时 {minutes}分钟"
+    kpis = cleaned_chart_data.get('kpis') or {}
+    for raw_key, formatted_key in (('avg_daily_minutes', 'avg_daily_formatted'),
+                                   ('avg_30d_minutes', 'avg_30d_formatted')):
+        if raw_key in kpis:
+            hours, minutes = divmod(int(kpis[raw_key] or 0), 60)
+            kpis[formatted_key] = f"{hours}小时 {minutes}分钟"
 
     return jsonify(cleaned_chart_data)
 
 
+@charts_bp.route('/api/cache-stats')
+@admin_required
+def get_cache_stats():
+    """返回各缓存的命中统计，以及词云静态资源的内存占用。仅管理员可见。"""
+    return jsonify({
+        'chart': chart_service.chart_cache.stats_dict(),
+        'wordcloud': wordcloud_service.wordcloud_cache.stats_dict(),
+        'dashboard': dashboard_service.dashboard_cache.stats_dict(),
+        'settings': settings_service.settings_cache.stats_dict(),
+        'identity': identity_service.identity_cache.stats_dict(),
+        'wordcloud_assets': wordcloud_service.asset_stats()
+    })
+
+
+def _render_unavailable():
+    """渲染队列已满或超时时返回 503，并提示客户端稍后重试。"""
+    response = jsonify({'success': False, 'message': '服务器正忙，请稍后重试。'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '5'
+    return response
+
+
 @charts_bp.route('/api/wordcloud')
 @login_required
 def get_wordcloud_image():
@@ -82,17 +109,163 @@ def get_wordcloud_image():
     else:
         stage_id = None
 
-    img_buffer = wordcloud_service.generate_wordcloud_for_user(
+    etag, render = wordcloud_service.prepare_wordcloud(
         current_user,
         stage_id=stage_id,
         mask_name=mask_name,
         palette=palette
     )
+    if etag is None:
+        return '', 204
 
-    if img_buffer:
-        return Response(img_buffer.getvalue(), mimetype='image/png')
+    # 浏览器已持有同一内容时直接返回 304，不必取出或渲染图片
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
     else:
-        return '', 204
+        try:
+            png = render()
+        except (render_pool.RenderPoolBusy, render_pool.RenderTimeout):
+            return _render_unavailable()
+        if not png:
+            return '', 204
+        response = Response(png, mimetype='image/png')
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+IMAGE_MIMETYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+IMAGE_MAX_AGE = 365 * 24 * 3600
+
+
+def _image_signer():
+    """
+    图片 URL 签名器。签名绑定用户、图表类型与指纹（或“最新”），持有 URL 即可访问对应图表，
+    因此可嵌入邮件或外部仪表盘；更换 SECRET_KEY 即可使所有已发出的 URL 失效。
+    """
+    return Signer(current_app.config['SECRET_KEY'], salt='chart-image')
+
+
+def _sign(value):
+    return _image_signer().get_signature(value).decode('ascii')
+
+
+def _chart_image_url(user_id, kind, fmt, data, **kwargs):
+    fingerprint = chart_service.chart_fingerprint(kind, fmt, data)
+    return url_for('charts.get_chart_image', user_id=user_id, kind=kind, fingerprint=fingerprint, fmt=fmt,
+                   sig=_sign(f'{user_id}/{kind}/{fingerprint}.{fmt}'), **kwargs)
+
+
+def _latest_chart_image_url(user_id, kind, fmt, **kwargs):
+    return url_for('charts.get_signed_latest_chart_image', user_id=user_id, kind=kind, fmt=fmt,
+                   sig=_sign(f'{user_id}/{kind}.{fmt}'), **kwargs)
+
+
+def _verify_signature(value):
+    if not _image_signer().verify_signature(value, request.args.get('sig', '')):
+        abort(404)
+
+
+def _image_source_for(user_id, kind, fmt):
+    """校验图表类型与格式并取出用户的图表数据；任何一项无效都按 404 处理。"""
+    if kind not in chart_service.CHART_IMAGE_SOURCES or fmt not in IMAGE_MIMETYPES:
+        abort(404)
+    principal = identity_service.load_principal(user_id)
+    data = chart_service.get_chart_image_source(principal, kind) if principal else None
+    if data is None:
+        abort(404)
+    return data
+
+
+def _redirect_uncached(location):
+    response = redirect(location)
+    response.cache_control.no_store = True
+    return response
+
+
+@charts_bp.route('/image/<kind>.<fmt>')
+@login_required
+def get_latest_chart_image(kind, fmt):
+    """站内使用：重定向到当前数据对应的签名指纹化图片地址；该重定向本身不可缓存。"""
+    data = _image_source_for(current_user.id, kind, fmt)
+    return _redirect_uncached(_chart_image_url(current_user.id, kind, fmt, data))
+
+
+@charts_bp.route('/image/<int:user_id>/<kind>.<fmt>')
+def get_signed_latest_chart_image(user_id, kind, fmt):
+    """外部仪表盘使用的固定签名地址，总是重定向到最新的指纹化图片；无需登录。"""
+    _verify_signature(f'{user_id}/{kind}.{fmt}')
+    data = _image_source_for(user_id, kind, fmt)
+    return _redirect_uncached(_chart_image_url(user_id, kind, fmt, data))
+
+
+@charts_bp.route('/image/<int:user_id>/<kind>/<fingerprint>.<fmt>')
+def get_chart_image(user_id, kind, fingerprint, fmt):
+    """
+    按签名与内容指纹提供单张图表，无需登录。URL 与内容一一对应，
+    因此以 public + immutable 长期缓存，可由 CDN 代为分发；数据已变化的旧指纹重定向到最新地址。
+    """
+    _verify_signature(f'{user_id}/{kind}/{fingerprint}.{fmt}')
+    data = _image_source_for(user_id, kind, fmt)
+    if chart_service.chart_fingerprint(kind, fmt, data) != fingerprint:
+        return _redirect_uncached(_chart_image_url(user_id, kind, fmt, data))
+    if request.if_none_match.contains(fingerprint):
+        response = Response(status=304)
+        response.set_etag(fingerprint)
+        return response
+
+    try:
+        image = chart_service.chart_image_cache.get_or_compute(
+            user_id, (kind, fingerprint, fmt),
+            lambda: render_pool.run(chart_plotter.render_single_chart, kind, data, fmt).getvalue())
+    except (render_pool.RenderPoolBusy, render_pool.RenderTimeout):
+        return _render_unavailable()
+
+    response = Response(image, mimetype=IMAGE_MIMETYPES[fmt])
+    response.set_etag(fingerprint)
+    response.cache_control.public = True
+    response.cache_control.max_age = IMAGE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+@charts_bp.route('/api/image-urls')
+@login_required
+def get_chart_image_urls():
+    """
+    返回各单图的签名地址：url 指向当前内容（适合邮件，内容固定），
+    latest_url 始终跳转到最新内容（适合外部仪表盘）。均为绝对地址，无需登录即可访问。
+    """
+    fmt = request.args.get('format', 'png')
+    if fmt not in IMAGE_MIMETYPES:
+        fmt = 'png'
+    urls = {}
+    for kind in chart_service.CHART_IMAGE_SOURCES:
+        data = chart_service.get_chart_image_source(current_user, kind)
+        if data is not None:
+            urls[kind] = {'url': _chart_image_url(current_user.id, kind, fmt, data, _external=True),
+                          'latest_url': _latest_chart_image_url(current_user.id, kind, fmt, _external=True)}
+    return jsonify(urls)
+
+
+EXPORT_FORMATS = {'png', 'svg'}
+EXPORT_PREVIEW_DPI = 60
+
+
+def _export_tasks(user, trend_data, category_data, fmt, dpi, per_stage=False):
+    """按需产出导出任务 (文件名, 绘图函数, 参数)；各阶段的分类数据在轮到它提交时才查询。"""
+    username = user.username
+    yield f'trends_summary.{fmt}', chart_plotter.export_trends_image, (username, trend_data, fmt, dpi)
+    yield f'category_summary.{fmt}', chart_plotter.export_category_image, (username, category_data, fmt, dpi)
+    if not per_stage:
+        return
+    stages = Stage.query.filter_by(user_id=user.id).order_by(Stage.start_date.asc()).all()
+    for stage in stages:
+        stage_category_data = chart_service.get_category_chart_data(user, stage.id)
+        if stage_category_data:
+            yield (f'category_stage_{stage.id}.{fmt}', chart_plotter.export_category_image,
+                   (username, stage_category_data, fmt, dpi, f'{username} 的学习分类 · {stage.name}'))
 
 
 @charts_bp.route('/export')
@@ -100,7 +273,13 @@ def get_wordcloud_image():
 def export_charts():
     """
     导出所有图表为图片，并打包成一个 ZIP 文件。
+    各图表作为独立任务在渲染进程池中并行渲染（在途任务数不超过进程数），按完成顺序写入 ZIP。
+    查询参数: format=png|svg，quality=preview 输出低分辨率 PNG，per_stage=1 额外导出各阶段的分类图。
     """
+    fmt = request.args.get('format', 'png')
+    if fmt not in EXPORT_FORMATS:
+        fmt = 'png'
+    dpi = EXPORT_PREVIEW_DPI if request.args.get('quality') == 'preview' and fmt == 'png' else None
     try:
         trend_data, _ = chart_service.get_chart_data_for_user(current_user)
         category_data = chart_service.get_category_chart_data(current_user)
@@ -109,15 +288,13 @@ def export_charts():
             flash('没有可供导出的图表数据。', 'warning')
             return redirect(url_for('charts.chart_page'))
 
-        trends_image_buffer = chart_plotter.export_trends_image(current_user.username, trend_data)
-        category_image_buffer = chart_plotter.export_category_image(current_user.username, category_data)
-
+        tasks = _export_tasks(current_user, trend_data, category_data, fmt, dpi,
+                              per_stage=request.args.get('per_stage', type=int))
         zip_buffer = io.BytesIO()
         with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
-            if trends_image_buffer:
-                zf.writestr('trends_summary.png', trends_image_buffer.getvalue())
-            if category_image_buffer:
-                zf.writestr('category_summary.png', category_image_buffer.getvalue())
+            for name, image_buffer in render_pool.iter_completed(tasks):
+                if image_buffer:
+                    zf.writestr(name, image_buffer.getvalue())
 
         zip_buffer.seek(0)
         username = current_user.username.replace(" ", "_")
@@ -129,6 +306,9 @@ def export_charts():
             mimetype='application/zip',
             headers={'Content-Disposition': f'attachment; filename={filename}'}
         )
+    except (render_pool.RenderPoolBusy, render_pool.RenderTimeout):
+        flash('服务器正忙，图表暂时无法导出，请稍后重试。', 'warning')
+        return redirect(url_for('charts.chart_page'))
     except Exception as e:
         flash(f'导出图表时发生错误: {e}', 'error')
         current_app.logger.error(f"Chart export error: {e}", exc_info=True)
@@ -8,6 +8,7 @@ from flask_login import login_required, current_user
 
 from .. import db
 from ..models import CountdownEvent, Stage
+from ..services.dashboard_service import invalidate_dashboard
 from ..helpers import get_custom_week_info
 
 countdown_bp = Blueprint('countdown', __name__, url_prefix='/countdown')
@@ -130,6 +131,7 @@ def add():
         new_event = CountdownEvent(title=title, target_datetime_utc=utc_dt, user_id=current_user.id)
         db.session.add(new_event)
         db.session.commit()
+        invalidate_dashboard(current_user.id)
         return jsonify({'success': True, 'message': f'新的倒计时目标 “{title}” 已添加！'})
     except Exception as e:
         db.session.rollback()
@@ -146,6 +148,7 @@ def edit(event_id):
         event.title = title
         event.target_datetime_utc = utc_dt
         db.session.commit()
+        invalidate_dashboard(current_user.id)
         return jsonify({'success': True, 'message': f'目标 “{title}” 已更新！'})
     except Exception as e:
         db.session.rollback()
@@ -161,6 +164,7 @@ def delete(event_id):
         title = event.title
         db.session.delete(event)
         db.session.commit()
+        invalidate_dashboard(current_user.id)
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return jsonify({'success': True, 'message': f'目标 “{title}” 已删除。'})
         flash(f'目标 “{title}” 已删除。', 'info')
@@ -7,6 +7,7 @@ from datetime import date, datetime
 
 from .. import db
 from ..models import DailyPlanItem
+from ..services.dashboard_service import invalidate_dashboard
 
 daily_plan_bp = Blueprint('daily_plan', __name__)
 
@@ -72,6 +73,7 @@ def add_item():
             )
             db.session.add(new_item)
             db.session.commit()
+            invalidate_dashboard(current_user.id)
             flash('新的计划已添加。', 'success')
         except Exception as e:
             db.session.rollback()
@@ -88,6 +90,7 @@ def toggle_item(item_id):
     item = DailyPlanItem.query.filter_by(id=item_id, user_id=current_user.id).first_or_404()
     item.is_completed = not item.is_completed
     db.session.commit()
+    invalidate_dashboard(current_user.id)
 
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return jsonify({
@@ -108,6 +111,7 @@ def delete_item(item_id):
     plan_date_str = item.plan_date.isoformat()
     db.session.delete(item)
     db.session.commit()
+    invalidate_dashboard(current_user.id)
 
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return jsonify({'success': True, 'message': '计划已删除'})
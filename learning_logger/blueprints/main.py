@@ -1,32 +1,26 @@
 # 文件路径: learning_logger/blueprints/main.py
 import os
 import pytz
-from datetime import date, datetime
+from datetime import datetime
 from flask import (Blueprint, render_template, redirect, url_for, request, flash, current_app)
 from flask_login import login_required, current_user
-from sqlalchemy import func
 from werkzeug.utils import secure_filename
 
-from .. import db
 from ..forms import AppearanceForm
-from ..models import (Stage, CountdownEvent, LogEntry, Todo, Milestone, DailyPlanItem, Setting)
+from ..services import dashboard_service, settings_service
 
 main_bp = Blueprint('main', __name__)
 
+# 问候语按此时区判断早中晚；在导入时解析一次
+DISPLAY_TIMEZONE = pytz.timezone('Asia/Shanghai')
+
 
 def get_user_setting(key, default=None):
-    setting = Setting.query.filter_by(user_id=current_user.id, key=key).first()
-    return setting.value if setting else default
+    return settings_service.get_user_setting(current_user.id, key, default)
 
 
 def set_user_setting(key, value):
-    setting = Setting.query.filter_by(user_id=current_user.id, key=key).first()
-    if setting:
-        setting.value = value
-    else:
-        setting = Setting(user_id=current_user.id, key=key, value=value)
-        db.session.add(setting)
-    db.session.commit()
+    settings_service.set_user_setting(current_user.id, key, value)
 
 
 @main_bp.route('/')
@@ -35,17 +29,13 @@ def index():
     """
     Displays the main dashboard with a summary of user's activities.
     """
-    try:
-        tz = pytz.timezone('Asia/Shanghai')
-        current_hour = datetime.now(tz).hour
-        if 5 <= current_hour < 12:
-            greeting = f"早上好, {current_user.username}！"
-        elif 12 <= current_hour < 18:
-            greeting = f"下午好, {current_user.username}！"
-        else:
-            greeting = f"晚上好, {current_user.username}！"
-    except Exception:
-        greeting = f"你好, {current_user.username}！"
+    current_hour = datetime.now(DISPLAY_TIMEZONE).hour
+    if 5 <= current_hour < 12:
+        greeting = f"早上好, {current_user.username}！"
+    elif 12 <= current_hour < 18:
+        greeting = f"下午好, {current_user.username}！"
+    else:
+        greeting = f"晚上好, {current_user.username}！"
 
     dashboard_data = {
         'greeting': greeting,
@@ -56,42 +46,29 @@ def index():
         'plan_summary': "今日暂无计划"
     }
 
-    today_duration_minutes = db.session.query(func.sum(LogEntry.actual_duration)).join(Stage).filter(
-        Stage.user_id == current_user.id,
-        LogEntry.log_date == date.today()
-    ).scalar() or 0
+    now_utc = datetime.now(pytz.utc)
+    summary = dashboard_service.get_summary(current_user.id, now_utc=now_utc)
+
+    today_duration_minutes = summary['today_minutes']
     if today_duration_minutes > 0:
         hours, minutes = divmod(today_duration_minutes, 60)
         dashboard_data[
             'records_summary'] = f"今日已记录 {hours} 小时 {minutes} 分钟" if hours > 0 else f"今日已记录 {minutes} 分钟"
 
-    now_utc = datetime.now(pytz.utc)
-    next_event = CountdownEvent.query.filter(
-        CountdownEvent.user_id == current_user.id,
-        CountdownEvent.target_datetime_utc > now_utc
-    ).order_by(CountdownEvent.target_datetime_utc.asc()).first()
-
-    if next_event:
-        if next_event.target_datetime_utc.tzinfo is None:
-            next_event.target_datetime_utc = pytz.utc.localize(next_event.target_datetime_utc)
-        time_diff = next_event.target_datetime_utc - now_utc
-        days_remaining = time_diff.days
+    if summary['next_countdown']:
+        title, target_datetime_utc = summary['next_countdown']
+        days_remaining = (target_datetime_utc - now_utc).days
         if days_remaining >= 0:
-            dashboard_data['countdown_summary'] = f"'{next_event.title}' 还剩 {days_remaining + 1} 天"
+            dashboard_data['countdown_summary'] = f"'{title}' 还剩 {days_remaining + 1} 天"
 
-    pending_todos_count = Todo.query.filter_by(user_id=current_user.id, is_completed=False).count()
-    if pending_todos_count > 0:
-        dashboard_data['todo_summary'] = f"您有 {pending_todos_count} 个待办事项"
+    if summary['pending_todos'] > 0:
+        dashboard_data['todo_summary'] = f"您有 {summary['pending_todos']} 个待办事项"
 
-    milestones_count = Milestone.query.filter_by(user_id=current_user.id).count()
-    if milestones_count > 0:
-        dashboard_data['milestone_summary'] = f"已记录 {milestones_count} 个重要时刻"
+    if summary['milestones'] > 0:
+        dashboard_data['milestone_summary'] = f"已记录 {summary['milestones']} 个重要时刻"
 
-    today_plans_query = DailyPlanItem.query.filter_by(user_id=current_user.id, plan_date=date.today())
-    total_today = today_plans_query.count()
-    if total_today > 0:
-        completed_today = today_plans_query.filter_by(is_completed=True).count()
-        dashboard_data['plan_summary'] = f"今日计划 {completed_today}/{total_today} 项已完成"
+    if summary['plans_total'] > 0:
+        dashboard_data['plan_summary'] = f"今日计划 {summary['plans_completed']}/{summary['plans_total']} 项已完成"
 
     return render_template('dashboard.html', dashboard_data=dashboard_data)
 
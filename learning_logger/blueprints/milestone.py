@@ -9,6 +9,7 @@ from datetime import date, datetime
 
 from .. import db
 from ..models import Milestone, MilestoneCategory, MilestoneAttachment
+from ..services.dashboard_service import invalidate_dashboard
 
 milestone_bp = Blueprint('milestone', __name__)
 
@@ -88,6 +89,7 @@ def add_milestone():
                 db.session.add(attachment)
 
         db.session.commit()
+        invalidate_dashboard(current_user.id)
         flash('新的成就时刻已成功记录！', 'success')
     except Exception as e:
         db.session.rollback()
@@ -151,6 +153,7 @@ def delete_milestone(milestone_id):
                     os.remove(full_path)
         db.session.delete(milestone)
         db.session.commit()
+        invalidate_dashboard(current_user.id)
         flash(f'成就 “{milestone.title}” 已被永久删除。', 'info')
     except Exception as e:
         db.session.rollback()
@@ -3,21 +3,35 @@ import os
 import sys
 from datetime import date
 from flask import (Blueprint, render_template, request, redirect, url_for,
-                   flash, Response, jsonify, current_app, session)
+                   flash, Response, jsonify, current_app, session, stream_with_context,
+                   stream_template, get_flashed_messages)
 from flask_login import login_required, current_user
-from sqlalchemy import func
 
 from .. import db
-from ..services import record_service, data_service
+from ..services import (record_service, data_service, recalc_job_service, chart_service, wordcloud_service,
+                        dashboard_service, settings_service)
 from ..forms import DataImportForm
 from ..models import (User, Stage, Category, SubCategory, LogEntry, DailyData,
                       WeeklyData, Motto, Todo, Milestone, MilestoneCategory,
-                      MilestoneAttachment, DailyPlanItem, Setting, CountdownEvent)
-from ..helpers import get_custom_week_info
+                      MilestoneAttachment, DailyPlanItem, Setting, CountdownEvent, DailyRollup,
+                      NoteTokenFrequency)
 
 records_bp = Blueprint('records', __name__)
 
 
+def _buffered(chunks, size):
+    """把模板逐段产出的小字符串合并到约 size 个字符再发送，减少写操作次数。"""
+    buffer, buffered = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer, buffered = [], 0
+    if buffer:
+        yield ''.join(buffer)
+
+
 def _get_category_data_for_form():
     all_categories = Category.query.filter_by(user_id=current_user.id).order_by(Category.name).all()
     all_subcategories = {}
@@ -51,12 +65,60 @@ def list_records():
         flash('欢迎使用！请先创建一个新的学习阶段以开始记录。', 'info')
         return redirect(url_for('stage.manage_stages'))
     sort_order = request.args.get('sort', 'desc')
-    structured_logs = record_service.get_structured_logs_for_stage(active_stage, sort_order)
-    for week in structured_logs:
-        for day in week['days']:
-            day['total_duration'] = sum(log.actual_duration for log in day['logs'] if log.actual_duration)
-    return render_template('index.html', structured_logs=structured_logs, current_sort=sort_order,
-                           all_stages=all_stages, active_stage=active_stage)
+    log_page = record_service.get_log_page_for_stage(active_stage, sort_order,
+                                                     per_page=current_app.config['RECORDS_WEEKS_PER_PAGE'],
+                                                     stream=True)
+    # 会话在响应开始前就已保存，先取出闪现消息，避免它们在流式渲染时才被消费而残留到下一页
+    get_flashed_messages(with_categories=True)
+    # 页头先发出，各周在模板遍历生成器时才从数据库读出并渲染
+    chunks = stream_template('index.html', log_page=log_page, current_sort=sort_order,
+                             all_stages=all_stages, active_stage=active_stage)
+    return Response(_buffered(chunks, current_app.config['TEMPLATE_STREAM_BUFFER_SIZE']), mimetype='text/html')
+
+
+@records_bp.route('/weeks')
+@login_required
+def list_weeks():
+    """无限滚动：返回游标之后若干周的 HTML 片段及下一页地址。"""
+    stage = Stage.query.filter_by(id=request.args.get('stage_id', type=int), user_id=current_user.id).first()
+    if not stage:
+        return jsonify({'success': False, 'message': '指定的阶段不存在或无权访问。'}), 404
+    sort_order = request.args.get('sort', 'desc')
+    try:
+        cursor = record_service.parse_page_cursor(request.args['cursor'])
+    except (KeyError, ValueError):
+        return jsonify({'success': False, 'message': '无效的分页游标。'}), 400
+
+    log_page = record_service.get_log_page_for_stage(stage, sort_order, cursor,
+                                                     per_page=current_app.config['RECORDS_WEEKS_PER_PAGE'])
+    next_cursor = log_page['next_cursor']
+    return jsonify({
+        'success': True,
+        'html': render_template('_record_weeks.html', weeks=log_page['weeks'], expand_first=False),
+        'next_cursor': next_cursor,
+        'next_url': url_for('records.list_weeks', stage_id=stage.id, sort=sort_order,
+                            cursor=next_cursor) if next_cursor else None,
+    })
+
+
+def _efficiency_updates(day_update):
+    """把 record_service 返回的 DayUpdate 转成前端按选择器回填的数据（选中的元素全部更新）。"""
+    day_key = day_update.log_date.isoformat()
+    return {
+        'daily_efficiency': {
+            'target_id': f"#daily-efficiency-badge-{day_key}",
+            'value': f"日效率: {round(day_update.daily_efficiency, 1)}"
+        },
+        'weekly_efficiency': {
+            # 提前记录合并成的周可能跨页拆成几段，每段都有一个周效率徽章，按 data-week 一并更新
+            'target_id': f'.badge[data-week="{day_update.year}-{day_update.week_num}"]',
+            'value': f"周平均效率: {round(day_update.weekly_efficiency, 1)}"
+        },
+        'daily_duration': {
+            'target_id': f"#daily-duration-text-{day_key}",
+            'value': f"{day_update.total_duration / 60:.1f}h"
+        }
+    }
 
 
 @records_bp.route('/form/add')
@@ -90,46 +152,18 @@ def add():
     if not active_stage_id:
         return jsonify({'success': False, 'message': '无法添加记录，未找到当前活动阶段。'}), 400
 
-    success, message, new_log_id = record_service.add_log_for_stage(active_stage_id, current_user, request.form)
+    success, message, new_log, day_update = record_service.add_log_for_stage(active_stage_id, current_user,
+                                                                             request.form)
 
     if success:
-        new_log = LogEntry.query.get(new_log_id)
         html_to_insert = render_template('_log_entry_item.html', log=new_log)
-        stage = Stage.query.get(active_stage_id)
-
-        daily_data = DailyData.query.filter_by(log_date=new_log.log_date, stage_id=active_stage_id).first()
-        new_daily_efficiency = round(daily_data.efficiency, 1) if daily_data else 0
-
-        year, week_num = get_custom_week_info(new_log.log_date, stage.start_date)
-        weekly_data = WeeklyData.query.filter_by(year=year, week_num=week_num, stage_id=active_stage_id).first()
-        new_weekly_efficiency = round(weekly_data.efficiency, 1) if weekly_data else 0
-
-        total_duration_minutes = db.session.query(func.sum(LogEntry.actual_duration)).filter(
-            LogEntry.log_date == new_log.log_date,
-            LogEntry.stage_id == active_stage_id
-        ).scalar() or 0
-        new_total_duration_hours = f"{total_duration_minutes / 60:.1f}h"
-
         return jsonify({
             'success': True,
             'message': message,
             'html': html_to_insert,
             'target_container': f"#log-table-body-{new_log.log_date.isoformat()}",
             'action': 'append',
-            'updates': {
-                'daily_efficiency': {
-                    'target_id': f"#daily-efficiency-badge-{new_log.log_date.isoformat()}",
-                    'value': f"日效率: {new_daily_efficiency}"
-                },
-                'weekly_efficiency': {
-                    'target_id': f"#weekly-efficiency-badge-{year}-{week_num}",
-                    'value': f"周平均效率: {new_weekly_efficiency}"
-                },
-                'daily_duration': {
-                    'target_id': f"#daily-duration-text-{new_log.log_date.isoformat()}",
-                    'value': new_total_duration_hours
-                }
-            }
+            'updates': _efficiency_updates(day_update) if day_update else {}
         })
     else:
         current_app.logger.error(f"为阶段 {active_stage_id} 添加记录时: {message}")
@@ -154,48 +188,17 @@ def delete(log_id):
     if not log:
         return jsonify({'success': False, 'message': '记录未找到或无权删除。'}), 404
 
-    log_date = log.log_date
-    stage_id = log.stage_id
-    stage = log.stage
     log_row_id = f"#log-entry-row-{log.id}"
 
-    success, message = record_service.delete_log_for_user(log_id, current_user)
+    success, message, day_update = record_service.delete_log_entry(log, current_user)
 
     if success:
-        remaining_logs_count = LogEntry.query.filter_by(log_date=log_date, stage_id=stage_id).count()
-
-        if remaining_logs_count > 0:
-            daily_data = DailyData.query.filter_by(log_date=log_date, stage_id=stage_id).first()
-            new_daily_efficiency = round(daily_data.efficiency, 1) if daily_data else 0
-
-            year, week_num = get_custom_week_info(log_date, stage.start_date)
-            weekly_data = WeeklyData.query.filter_by(year=year, week_num=week_num, stage_id=stage_id).first()
-            new_weekly_efficiency = round(weekly_data.efficiency, 1) if weekly_data else 0
-
-            total_duration_minutes = db.session.query(func.sum(LogEntry.actual_duration)).filter(
-                LogEntry.log_date == log_date,
-                LogEntry.stage_id == stage_id
-            ).scalar() or 0
-            new_total_duration_hours = f"{total_duration_minutes / 60:.1f}h"
-
+        if day_update and day_update.log_count > 0:
             return jsonify({
                 'success': True,
                 'message': message,
                 'remove_target': log_row_id,
-                'updates': {
-                    'daily_efficiency': {
-                        'target_id': f"#daily-efficiency-badge-{log_date.isoformat()}",
-                        'value': f"日效率: {new_daily_efficiency}"
-                    },
-                    'weekly_efficiency': {
-                        'target_id': f"#weekly-efficiency-badge-{year}-{week_num}",
-                        'value': f"周平均效率: {new_weekly_efficiency}"
-                    },
-                    'daily_duration': {
-                        'target_id': f"#daily-duration-text-{log_date.isoformat()}",
-                        'value': new_total_duration_hours
-                    }
-                }
+                'updates': _efficiency_updates(day_update)
             })
         else:
             return jsonify({'success': True, 'message': message, 'reload': True})
@@ -214,10 +217,10 @@ def settings_data():
 @records_bp.route('/export/zip')
 @login_required
 def export_zip():
-    zip_buffer = data_service.export_data_for_user(current_user)
     username = current_user.username.replace(" ", "_")
     filename = f"{username}_backup_{date.today().isoformat()}.zip"
-    return Response(zip_buffer, mimetype="application/zip",
+    zip_stream = data_service.iter_export_zip(current_user._get_current_object())
+    return Response(stream_with_context(zip_stream), mimetype="application/zip",
                     headers={"Content-Disposition": f"attachment;filename={filename}"})
 
 
@@ -229,12 +232,20 @@ def import_zip():
         file_storage = form.file.data
         success, message = data_service.import_data_for_user(current_user, file_storage.stream)
         if success:
-            current_app.logger.info("Import successful. Triggering full efficiency recalculation for all stages.")
-            all_user_stages = Stage.query.filter_by(user_id=current_user.id).all()
-            for stage in all_user_stages:
-                record_service.recalculate_efficiency_for_stage(stage)
-            current_app.logger.info("Full efficiency recalculation finished.")
-            flash(message, 'success')
+            current_app.logger.info("Import successful. Submitting efficiency recalculation job for all stages.")
+            stage_ids = [stage_id for stage_id, in
+                         Stage.query.filter_by(user_id=current_user.id).with_entities(Stage.id)]
+            job = recalc_job_service.submit_recalculation(current_app._get_current_object(), current_user.id,
+                                                          stage_ids)
+            session['recalc_job_id'] = job.id
+            status_url = url_for('records.import_job_status', job_id=job.id)
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return jsonify({'success': True, 'message': message, 'job_id': job.id,
+                                'status_url': status_url}), 202
+            if job.status == 'finished':
+                flash(message, 'success')
+            else:
+                flash(f"{message} 效率数据正在后台重新计算，稍后刷新即可看到最新结果。", 'success')
             return redirect(url_for('records.list_records'))
         else:
             current_app.logger.error(f"Import failed for user {current_user.id}: {message}")
@@ -247,6 +258,15 @@ def import_zip():
         return redirect(url_for('records.settings_data'))
 
 
+@records_bp.route('/import/jobs/<job_id>')
+@login_required
+def import_job_status(job_id):
+    job = recalc_job_service.get_job_for_user(job_id, current_user.id)
+    if not job:
+        return jsonify({'success': False, 'message': '任务不存在或已过期。'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+
 @records_bp.route('/clear_data', methods=['POST'])
 @login_required
 def clear_data():
@@ -283,12 +303,18 @@ def clear_data():
         CountdownEvent.query.filter_by(user_id=user_id).delete(synchronize_session=False)
         DailyPlanItem.query.filter_by(user_id=user_id).delete(synchronize_session=False)
         Setting.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        DailyRollup.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+        NoteTokenFrequency.query.filter_by(user_id=user_id).delete(synchronize_session=False)
         if milestone_ids: Milestone.query.filter(Milestone.id.in_(milestone_ids)).delete(synchronize_session=False)
         MilestoneCategory.query.filter_by(user_id=user_id).delete(synchronize_session=False)
         if category_ids: Category.query.filter(Category.id.in_(category_ids)).delete(synchronize_session=False)
         if stage_ids: Stage.query.filter(Stage.id.in_(stage_ids)).delete(synchronize_session=False)
 
         db.session.commit()
+        chart_service.invalidate_chart_data(user_id)
+        wordcloud_service.invalidate_wordcloud(user_id)
+        dashboard_service.invalidate_dashboard(user_id)
+        settings_service.invalidate_settings(user_id)
         flash('您的所有个人数据（包括附件）已被成功清空！', 'success')
 
     except Exception as e:
@@ -5,6 +5,8 @@ from flask_login import login_required, current_user
 from datetime import date
 from .. import db
 from ..models import Stage
+from ..services import dashboard_service, rollup_service, wordcloud_service
+from ..services.chart_service import invalidate_chart_data
 
 stage_bp = Blueprint('stage', __name__, url_prefix='/stages')
 
@@ -29,6 +31,7 @@ def add_stage():
             new_stage = Stage(name=name, start_date=start_date, user_id=current_user.id)
             db.session.add(new_stage)
             db.session.commit()
+            invalidate_chart_data(current_user.id)
             flash(f'新阶段 "{name}" 已成功创建！', 'success')
         except Exception as e:
             db.session.rollback()
@@ -48,6 +51,7 @@ def edit_stage(stage_id):
         try:
             stage.name = new_name
             db.session.commit()
+            invalidate_chart_data(current_user.id)
             flash('阶段名称已更新。', 'success')
         except Exception as e:
             db.session.rollback()
@@ -62,7 +66,12 @@ def delete_stage(stage_id):
     stage = Stage.query.filter_by(id=stage_id, user_id=current_user.id).first_or_404()
     try:
         db.session.delete(stage)
+        db.session.flush()
+        rollup_service.rebuild_for_user(current_user.id)
         db.session.commit()
+        invalidate_chart_data(current_user.id)
+        wordcloud_service.invalidate_wordcloud(current_user.id)
+        dashboard_service.invalidate_dashboard(current_user.id)
         flash(f'阶段 "{stage.name}" 及其所有相关记录已被永久删除。', 'success')
     except Exception as e:
         db.session.rollback()
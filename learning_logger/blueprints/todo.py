@@ -6,6 +6,7 @@ from datetime import datetime, date
 
 from .. import db
 from ..models import Todo
+from ..services.dashboard_service import invalidate_dashboard
 
 todo_bp = Blueprint('todo', __name__, url_prefix='/todo')
 
@@ -55,6 +56,7 @@ def add_todo():
     )
     db.session.add(new_todo)
     db.session.commit()
+    invalidate_dashboard(current_user.id)
     flash('新的待办事项已添加。', 'success')
     return redirect(url_for('todo.list_todos'))
 
@@ -72,6 +74,7 @@ def toggle_todo(todo_id):
         todo.completed_at = None
 
     db.session.commit()
+    invalidate_dashboard(current_user.id)
 
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
         return jsonify({'success': True, 'is_completed': todo.is_completed})
@@ -109,5 +112,6 @@ def delete_todo(todo_id):
     todo = Todo.query.filter_by(id=todo_id, user_id=current_user.id).first_or_404()
     db.session.delete(todo)
     db.session.commit()
+    invalidate_dashboard(current_user.id)
     flash('待办事项已删除。', 'info')
     return redirect(url_for('todo.list_todos'))
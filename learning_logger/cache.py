@@ -0,0 +1,234 @@
+# 文件路径: learning_logger/cache.py
+"""
+可插拔的缓存后端与按用户划分、带版本失效的缓存封装。
+
+后端由配置 CACHE_BACKEND 选择：
+- 'memory': 进程内 LRU，带 TTL（默认）。失效只在本进程生效，仅适用于单 worker 部署
+- 'redis':  任何实现 get/set/incr/delete 的 Redis 风格客户端（也可以是本地替身），多进程共享失效
+- 'null':   不缓存
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+MISSING = object()
+
+
+class CacheStats:
+    """命中/未命中/失效次数计数器。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def record(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def to_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None
+        }
+
+
+class LRUCache:
+    """线程安全的进程内 LRU 缓存，条目超过 ttl 秒即视为过期。"""
+
+    def __init__(self, max_entries=1024, ttl=300):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key):
+        """计数器单独存放，不受 LRU 淘汰和 TTL 影响，保证版本号只增不减。"""
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def get_counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisCache:
+    """基于 Redis 风格客户端的缓存，值以 pickle 序列化。"""
+
+    def __init__(self, client, ttl=300, prefix='learning_logger:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return MISSING if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=ttl or None)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key):
+        return int(self.client.incr(self.prefix + key))
+
+    def get_counter(self, key):
+        raw = self.client.get(self.prefix + key)
+        return int(raw) if raw is not None else 0
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+class NullCache:
+    """不做任何缓存的后端。"""
+
+    def get(self, key):
+        return MISSING
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def incr(self, key):
+        return 0
+
+    def get_counter(self, key):
+        return 0
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+def create_backend(config, ttl, max_entries=None):
+    """根据应用配置创建缓存后端。max_entries 为空时使用 CACHE_MAX_ENTRIES。"""
+    backend = config.get('CACHE_BACKEND', 'memory')
+    if backend == 'null':
+        return NullCache()
+    if backend == 'redis':
+        client = config.get('CACHE_REDIS_CLIENT')
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(config['CACHE_REDIS_URL'])
+        return RedisCache(client, ttl=ttl)
+    return LRUCache(max_entries=max_entries or config.get('CACHE_MAX_ENTRIES', 1024), ttl=ttl)
+
+
+class UserScopedCache:
+    """
+    按用户划分的缓存。每个用户有一个版本号，键中带上版本号；
+    失效时只需把版本号加一，该用户的所有旧条目便不再被命中。
+    """
+
+    def __init__(self, namespace, ttl_config_key, default_ttl=300, max_entries_config_key=None,
+                 local_ttl_config_key=None):
+        self.namespace = namespace
+        self.ttl_config_key = ttl_config_key
+        # 后端为进程内 'memory' 时失效无法传到其他 worker，此配置项给出的较短 TTL 作为上限
+        self.local_ttl_config_key = local_ttl_config_key
+        self.max_entries_config_key = max_entries_config_key
+        self.default_ttl = default_ttl
+        self.stats = CacheStats()
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    ttl = current_app.config.get(self.ttl_config_key, self.default_ttl)
+                    if self.local_ttl_config_key and current_app.config.get('CACHE_BACKEND', 'memory') == 'memory':
+                        ttl = min(ttl, current_app.config.get(self.local_ttl_config_key, ttl))
+                    max_entries = current_app.config.get(self.max_entries_config_key) \
+                        if self.max_entries_config_key else None
+                    self._backend = create_backend(current_app.config, ttl, max_entries)
+        return self._backend
+
+    def _version_key(self, user_id):
+        return f'{self.namespace}:version:{user_id}'
+
+    def make_key(self, user_id, *parts):
+        version = self.backend.get_counter(self._version_key(user_id))
+        suffix = ':'.join(str(part) for part in parts)
+        return f'{self.namespace}:{user_id}:{version}:{suffix}'
+
+    def get_or_compute(self, user_id, parts, compute):
+        """返回缓存值；未命中时调用 compute() 计算并写入。返回值应视为只读。"""
+        key = self.make_key(user_id, *parts)
+        value = self.backend.get(key)
+        if value is not MISSING:
+            self.stats.record('hits')
+            return value
+        self.stats.record('misses')
+        value = compute()
+        self.backend.set(key, value)
+        return value
+
+    def invalidate(self, user_id):
+        self.backend.incr(self._version_key(user_id))
+        self.stats.record('invalidations')
+
+    def reset(self):
+        """丢弃后端（下次访问时按当前配置重建）并清零计数。"""
+        with self._lock:
+            if self._backend is not None:
+                self._backend.clear()
+            self._backend = None
+            self.stats = CacheStats()
+
+    def stats_dict(self):
+        return {'namespace': self.namespace, 'entries': len(self._backend) if self._backend else 0,
+                **self.stats.to_dict()}
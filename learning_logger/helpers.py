@@ -1,8 +1,10 @@
 # /learning_logger/helpers.py
 
+import math
 import re
-import numpy as np
 from datetime import date, datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from . import db
 from .models import Setting
 
 
@@ -22,6 +24,19 @@ def get_custom_week_info(log_date, start_date):
     return log_date.year, (days_diff // 7) + 1
 
 
+def upsert_statement(model):
+    """
+    返回当前数据库方言的 INSERT 语句，可接 on_conflict_do_update 写成 upsert。
+    仅 PostgreSQL 与 SQLite 支持；其他方言返回 None，由调用方退化为逐行读写。
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(model)
+    if dialect == 'sqlite':
+        return sqlite.insert(model)
+    return None
+
+
 def parse_csv_duration(duration_str):
     """解析CSV中的时长字符串"""
     if not isinstance(duration_str, str) or not duration_str.strip():
@@ -53,13 +68,13 @@ def parse_csv_date(date_str):
 def parse_efficiency_to_numeric(eff_str):
     """将各种格式的效率描述转换为0-5的数值"""
     if not isinstance(eff_str, str) or not eff_str.strip():
-        # [改进] 返回 np.nan 而不是 0，以便在图表中正确处理缺失值
-        return np.nan
+        # [改进] 返回 NaN 而不是 0，以便在图表中正确处理缺失值
+        return math.nan
     eff_str = eff_str.strip()
     match = re.match(r'(\d+\.?\d*)\s*/\s*(\d+\.?\d*)', eff_str)
     if match:
         num, den = float(match.group(1)), float(match.group(2))
-        return (num / den) * 5 if den != 0 else np.nan
+        return (num / den) * 5 if den != 0 else math.nan
     match = re.match(r'(\d+\.?\d*)\s*%', eff_str)
     if match:
         return (float(match.group(1)) / 100) * 5
@@ -67,35 +82,24 @@ def parse_efficiency_to_numeric(eff_str):
     if match:
         val = float(match.group(1))
         # 保证评分在合理范围
-        return val if 0 <= val <= 5 else np.nan
+        return val if 0 <= val <= 5 else math.nan
     mapping = {"高效": 5, "良好": 4, "不错": 4, "一般": 3, "还行": 3, "及格": 3, "较差": 2, "差": 2, "很差": 1,
                "低效": 1}
-    return float(mapping.get(eff_str, np.nan))
+    return float(mapping.get(eff_str, math.nan))
 
 
 def moving_average(data, window_size=7):
     """
     [核心 Bug 修复] 计算移动平均值，此版本会正确地忽略 NaN 值。
     之前的版本会将 NaN 转换为 0，导致移动平均线被错误地拉低。
+    只返回完整窗口的结果，长度为 len(data) - window_size + 1。
     """
+    import numpy as np
+    from .services.trend_engine import rolling_mean
+
     if len(data) < window_size:
         return np.array([])
-
-    result = []
-    # 遍历所有可能的窗口
-    for i in range(len(data) - window_size + 1):
-        window = data[i: i + window_size]
-        # 从窗口中只选择有效的数值（非 NaN）
-        valid_values = window[~np.isnan(window)]
-
-        # 如果窗口中至少有一个有效值，则计算其平均值
-        # 否则，该窗口的移动平均值也为 NaN
-        if len(valid_values) > 0:
-            result.append(np.mean(valid_values))
-        else:
-            result.append(np.nan)
-
-    return np.array(result)
+    return rolling_mean(data, window_size)[window_size - 1:]
 
 
 def setup_template_filters(app):
@@ -0,0 +1,193 @@
+# 文件路径: learning_logger/instrumentation.py
+"""
+基于 SQLAlchemy 引擎事件的按请求 SQL 统计。
+
+每个请求记录语句条数、数据库总耗时以及最慢的若干条语句（附带发起它的应用代码位置），
+并通过三种方式输出：
+- 响应头 Server-Timing（浏览器开发者工具可直接查看）
+- 一行 JSON 结构化日志（条数或耗时超过阈值时为 WARNING，否则为 DEBUG）
+- 按视图聚合的进程内统计，供 /admin/metrics 读取
+
+请求之外（命令行、后台重算线程）发出的语句不计入。
+普通响应在请求上下文结束时（teardown_request）结算日志与聚合统计；
+流式响应在响应体发送完毕、服务器关闭响应时（call_on_close）结算，因此包含模板遍历、ZIP 生成期间发出的语句。
+响应头在发送前写出，流式响应的 Server-Timing 只包含开始发送前的语句。
+"""
+import heapq
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from functools import partial
+from itertools import count
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+_THIS_FILE = os.path.abspath(__file__)
+_STATEMENT_PREVIEW_LENGTH = 300
+_sequence = count()
+
+
+def _app_origin():
+    """返回调用栈中最近一帧应用代码的 '文件:行号 函数名'，用于定位语句由哪段代码发出。"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_PACKAGE_DIR) and filename != _THIS_FILE:
+            relative = os.path.relpath(filename, os.path.dirname(_PACKAGE_DIR))
+            return f"{relative}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _push_bounded(heap, size, entry):
+    """把 entry 放入容量为 size 的小顶堆；返回是否被保留。"""
+    if len(heap) < size:
+        heapq.heappush(heap, entry)
+        return True
+    if entry[0] > heap[0][0]:
+        heapq.heapreplace(heap, entry)
+        return True
+    return False
+
+
+class RequestQueryStats:
+    """单个请求内的语句统计，只保留耗时最长的 top_n 条。"""
+
+    def __init__(self, top_n):
+        self.top_n = top_n
+        self.count = 0
+        self.total_ms = 0.0
+        self.deferred = False
+        self._slowest = []
+
+    def record(self, statement, duration_ms):
+        self.count += 1
+        self.total_ms += duration_ms
+        if len(self._slowest) < self.top_n or duration_ms > self._slowest[0][0]:
+            # 只有进入最慢列表的语句才回溯调用栈
+            entry = {'ms': round(duration_ms, 2), 'statement': statement[:_STATEMENT_PREVIEW_LENGTH],
+                     'origin': _app_origin()}
+            _push_bounded(self._slowest, self.top_n, (duration_ms, next(_sequence), entry))
+
+    def slowest(self):
+        return [entry for _, _, entry in sorted(self._slowest, key=lambda e: e[0], reverse=True)]
+
+
+class MetricsRegistry:
+    """进程内按视图聚合的统计，以及全进程耗时最长的若干条语句。"""
+
+    def __init__(self, top_n=20):
+        self._lock = threading.Lock()
+        self.top_n = top_n
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+            self._slowest = []
+
+    def record_request(self, endpoint, stats):
+        with self._lock:
+            summary = self._endpoints.setdefault(endpoint, {
+                'requests': 0, 'queries': 0, 'db_ms': 0.0, 'max_queries': 0, 'max_db_ms': 0.0})
+            summary['requests'] += 1
+            summary['queries'] += stats.count
+            summary['db_ms'] += stats.total_ms
+            summary['max_queries'] = max(summary['max_queries'], stats.count)
+            summary['max_db_ms'] = max(summary['max_db_ms'], stats.total_ms)
+            for entry in stats.slowest():
+                _push_bounded(self._slowest, self.top_n,
+                              (entry['ms'], next(_sequence), dict(entry, endpoint=endpoint)))
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {
+                name: {'requests': s['requests'], 'queries': s['queries'], 'max_queries': s['max_queries'],
+                       'avg_queries': round(s['queries'] / s['requests'], 2),
+                       'db_ms': round(s['db_ms'], 2), 'max_db_ms': round(s['max_db_ms'], 2),
+                       'avg_db_ms': round(s['db_ms'] / s['requests'], 2)}
+                for name, s in self._endpoints.items()
+            }
+            slowest = [entry for _, _, entry in sorted(self._slowest, key=lambda e: e[0], reverse=True)]
+        return {'pid': os.getpid(), 'endpoints': endpoints, 'slowest_statements': slowest}
+
+
+metrics = MetricsRegistry()
+
+
+def _current_stats():
+    return g.get('_sql_stats') if has_request_context() else None
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and _current_stats() is not None:
+        context._sql_started_at = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = getattr(context, '_sql_started_at', None)
+    stats = _current_stats()
+    if started_at is not None and stats is not None:
+        stats.record(statement, (time.perf_counter() - started_at) * 1000)
+
+
+def _start_request():
+    g._sql_stats = RequestQueryStats(current_app.config['SQL_PROFILER_TOP_N'])
+
+
+def _finalize(app, stats, info):
+    config = app.config
+    metrics.record_request(info['endpoint'], stats)
+    is_slow = stats.count > config['SQL_PROFILER_WARN_QUERIES'] or stats.total_ms > config['SQL_PROFILER_WARN_MS']
+    if is_slow or app.logger.isEnabledFor(logging.DEBUG):
+        line = json.dumps({'event': 'request_sql', **info, 'queries': stats.count,
+                           'db_ms': round(stats.total_ms, 2), 'slowest': stats.slowest()}, ensure_ascii=False)
+        app.logger.log(logging.WARNING if is_slow else logging.DEBUG, line)
+
+
+def _request_info(status):
+    return {'method': request.method, 'path': request.path,
+            'endpoint': request.endpoint or '<unmatched>', 'status': status}
+
+
+def _add_timing_header(response):
+    stats = g.get('_sql_stats')
+    if stats is None:
+        return response
+    if response.is_streamed:
+        # 响应体在请求上下文结束后才生成：统计留在 g 上继续累计，等服务器关闭响应时再结算
+        stats.deferred = True
+        response.call_on_close(partial(_finalize, current_app._get_current_object(), stats,
+                                       _request_info(response.status_code)))
+        desc = f'{stats.count} queries before streaming'
+    else:
+        g._sql_response_status = response.status_code
+        desc = f'{stats.count} queries'
+    response.headers.add('Server-Timing', f'db;dur={stats.total_ms:.2f};desc="{desc}"')
+    return response
+
+
+def _finish_request(exc=None):
+    stats = g.get('_sql_stats')
+    if stats is None or stats.deferred:
+        return
+    g.pop('_sql_stats')
+    # 未经 after_request 的请求（视图抛出异常）按 500 记录
+    _finalize(current_app, stats, _request_info(g.pop('_sql_response_status', 500)))
+
+
+def init_app(app):
+    """SQL_PROFILER_ENABLED 为真时为每个请求开启统计。"""
+    if not app.config.get('SQL_PROFILER_ENABLED'):
+        return
+    app.before_request(_start_request)
+    app.after_request(_add_timing_header)
+    app.teardown_request(_finish_request)
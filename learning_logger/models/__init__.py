@@ -5,7 +5,8 @@
 # 无需关心模型具体存放在哪个子文件中。
 
 from .user_models import User, Setting
-from .learning_models import Stage, Category, SubCategory, LogEntry, DailyData, WeeklyData
+from .learning_models import (Stage, Category, SubCategory, LogEntry, DailyData, WeeklyData, DailyRollup,
+                              NoteTokenFrequency, RecalcJob)
 from .feature_models import (
     CountdownEvent,
     Motto,
@@ -19,7 +20,8 @@ from .feature_models import (
 # 可选：定义 __all__ 来明确指定可以从这个包导出的对象
 __all__ = [
     'User', 'Setting',
-    'Stage', 'Category', 'SubCategory', 'LogEntry', 'DailyData', 'WeeklyData',
+    'Stage', 'Category', 'SubCategory', 'LogEntry', 'DailyData', 'WeeklyData', 'DailyRollup',
+    'NoteTokenFrequency', 'RecalcJob',
     'CountdownEvent', 'Motto', 'Todo', 'MilestoneCategory', 'Milestone',
     'MilestoneAttachment', 'DailyPlanItem'
 ]
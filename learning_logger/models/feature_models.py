@@ -10,6 +10,7 @@ class CountdownEvent(db.Model):
     target_datetime_utc = db.Column(db.DateTime(timezone=True), nullable=False)
     created_at_utc = db.Column(db.DateTime(timezone=True), nullable=True, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    __table_args__ = (db.Index('ix_countdown_event_user_id_target_datetime_utc', 'user_id', 'target_datetime_utc'),)
 
     def __repr__(self):
         return f'<CountdownEvent {self.title}>'
@@ -48,6 +49,7 @@ class Todo(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    __table_args__ = (db.Index('ix_todo_user_id_is_completed', 'user_id', 'is_completed'),)
 
     def to_dict(self):
         return {
@@ -88,6 +90,7 @@ class Milestone(db.Model):
     description = db.Column(db.Text, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     category_id = db.Column(db.Integer, db.ForeignKey('milestone_category.id'), nullable=True)
+    __table_args__ = (db.Index('ix_milestone_user_id_event_date', 'user_id', 'event_date'),)
 
     attachments = db.relationship('MilestoneAttachment', backref='milestone', lazy='dynamic',
                                   cascade="all, delete-orphan")
@@ -136,6 +139,7 @@ class DailyPlanItem(db.Model):
     is_completed = db.Column(db.Boolean, default=False, nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.Index('ix_daily_plan_item_user_id_plan_date', 'user_id', 'plan_date'),)
 
     def to_dict(self):
         return {
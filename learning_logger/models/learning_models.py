@@ -1,6 +1,6 @@
 # 文件路径: learning_logger/models/learning_models.py
 from .. import db
-from datetime import date
+from datetime import date, datetime
 
 
 class Stage(db.Model):
@@ -9,10 +9,12 @@ class Stage(db.Model):
     name = db.Column(db.String(100), nullable=False)
     start_date = db.Column(db.Date, nullable=False, default=date.today)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    __table_args__ = (db.Index('ix_stage_user_id_start_date', 'user_id', 'start_date'),)
 
     weekly_data = db.relationship('WeeklyData', backref='stage', lazy='dynamic', cascade="all, delete-orphan")
     daily_data = db.relationship('DailyData', backref='stage', lazy='dynamic', cascade="all, delete-orphan")
     log_entries = db.relationship('LogEntry', backref='stage', lazy='dynamic', cascade="all, delete-orphan")
+    token_frequencies = db.relationship('NoteTokenFrequency', lazy='dynamic', cascade="all, delete-orphan")
 
     def to_dict(self):
         return {'id': self.id, 'name': self.name, 'start_date': self.start_date.isoformat(), 'user_id': self.user_id}
@@ -63,6 +65,10 @@ class LogEntry(db.Model):
     notes = db.Column(db.Text, nullable=True)
     stage_id = db.Column(db.Integer, db.ForeignKey('stage.id'), nullable=False)
     subcategory_id = db.Column(db.Integer, db.ForeignKey('sub_category.id'), nullable=True)
+    __table_args__ = (
+        db.Index('ix_log_entry_stage_id_log_date', 'stage_id', 'log_date'),
+        db.Index('ix_log_entry_subcategory_id', 'subcategory_id'),
+    )
 
     @property
     def duration_formatted(self):
@@ -85,7 +91,10 @@ class WeeklyData(db.Model):
     week_num = db.Column(db.Integer, nullable=False)
     efficiency = db.Column(db.Float, nullable=True)
     stage_id = db.Column(db.Integer, db.ForeignKey('stage.id'), nullable=False)
-    __table_args__ = (db.UniqueConstraint('year', 'week_num', 'stage_id', name='_stage_year_week_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('year', 'week_num', 'stage_id', name='_stage_year_week_uc'),
+        db.Index('ix_weekly_data_stage_id_year_week_num', 'stage_id', 'year', 'week_num'),
+    )
 
     def to_dict(self):
         return {'id': self.id, 'year': self.year, 'week_num': self.week_num, 'efficiency': self.efficiency,
@@ -98,8 +107,69 @@ class DailyData(db.Model):
     log_date = db.Column(db.Date, nullable=False)
     efficiency = db.Column(db.Float, nullable=True)
     stage_id = db.Column(db.Integer, db.ForeignKey('stage.id'), nullable=False)
-    __table_args__ = (db.UniqueConstraint('log_date', 'stage_id', name='_stage_log_date_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('log_date', 'stage_id', name='_stage_log_date_uc'),
+        db.Index('ix_daily_data_stage_id_log_date', 'stage_id', 'log_date'),
+    )
 
     def to_dict(self):
         return {'id': self.id, 'log_date': self.log_date.isoformat(), 'efficiency': self.efficiency,
                 'stage_id': self.stage_id}
+
+
+class DailyRollup(db.Model):
+    """按用户、按天预聚合的学习数据，由 record_service 在写日志的同一事务中维护。"""
+    __tablename__ = 'daily_rollup'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    log_date = db.Column(db.Date, primary_key=True)
+    total_minutes = db.Column(db.Integer, nullable=False, default=0)
+    weighted_mood_sum = db.Column(db.Integer, nullable=False, default=0)
+    entry_count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {'user_id': self.user_id, 'log_date': self.log_date.isoformat(), 'total_minutes': self.total_minutes,
+                'weighted_mood_sum': self.weighted_mood_sum, 'entry_count': self.entry_count}
+
+
+class NoteTokenFrequency(db.Model):
+    """按阶段统计的笔记分词词频，由 record_service 在写日志时增量维护，供词云直接使用。"""
+    __tablename__ = 'note_token_frequency'
+    stage_id = db.Column(db.Integer, db.ForeignKey('stage.id'), primary_key=True)
+    token = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    __table_args__ = (db.Index('ix_note_token_frequency_user_id', 'user_id'),)
+
+    def to_dict(self):
+        return {'stage_id': self.stage_id, 'token': self.token, 'user_id': self.user_id, 'count': self.count}
+
+
+class RecalcJob(db.Model):
+    """导入后按阶段重算效率的后台任务进度。保存在数据库中，任一 web 进程都能查询。"""
+    __tablename__ = 'recalc_job'
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    __table_args__ = (db.Index('ix_recalc_job_user_id', 'user_id'),)
+
+    @property
+    def status(self):
+        if self.finished_at:
+            return 'failed' if self.failed else 'finished'
+        return 'running' if self.completed or self.failed else 'pending'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'total': self.total,
+            'completed': self.completed,
+            'failed': self.failed,
+            'progress': round((self.completed + self.failed) / self.total * 100) if self.total else 100,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
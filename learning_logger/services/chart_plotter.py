@@ -1,15 +1,30 @@
 # 文件路径: learning_logger/services/chart_plotter.py
 import io
-import matplotlib.pyplot as plt
-import numpy as np
+import threading
 
-plt.style.use('seaborn-v0_8-whitegrid')
-try:
+# matplotlib 与 numpy 导入较慢，推迟到第一次绘图时再加载
+_plt = None
+_plt_lock = threading.Lock()
 
-    plt.rcParams['font.sans-serif'] = ['SimHei']
-    plt.rcParams['axes.unicode_minus'] = False
-except Exception:
-    print("Warning: Chinese font 'SimHei' not found. Chart labels may not render correctly.")
+
+def pyplot():
+    """返回已配置好样式的 matplotlib.pyplot，首次调用时才导入（使用 Agg 后端）。"""
+    global _plt
+    with _plt_lock:
+        if _plt is None:
+            import matplotlib
+            matplotlib.use('Agg')
+            import matplotlib.pyplot as plt
+
+            plt.style.use('seaborn-v0_8-whitegrid')
+            try:
+
+                plt.rcParams['font.sans-serif'] = ['SimHei']
+                plt.rcParams['axes.unicode_minus'] = False
+            except Exception:
+                print("Warning: Chinese font 'SimHei' not found. Chart labels may not render correctly.")
+            _plt = plt
+    return _plt
 
 COLORS = {
     'duration_bar': (96 / 255, 165 / 255, 250 / 255, 0.6),
@@ -22,6 +37,7 @@ COLORS = {
 
 def _plot_weekly_duration(ax, data):
     """在给定的 Axes 上绘制每周学习时长图。"""
+    import numpy as np
     ax.bar(data['labels'], data['actuals'], label='实际时长 (小时)', color=COLORS['duration_bar'], width=0.6)
     trends_y = np.array(data['trends'], dtype=float)
     trends_x = np.arange(len(data['labels']))
@@ -35,6 +51,7 @@ def _plot_weekly_duration(ax, data):
 
 def _plot_weekly_efficiency(ax, data):
     """在给定的 Axes 上绘制每周学习效率图。"""
+    import numpy as np
     eff_y = np.array(data['actuals'], dtype=float)
     eff_x_labels = data['labels']
     valid_eff_mask = ~np.isnan(eff_y)
@@ -52,6 +69,7 @@ def _plot_weekly_efficiency(ax, data):
 
 def _plot_daily_duration(ax, data):
     """在给定的 Axes 上绘制每日学习时长图。"""
+    import numpy as np
     ax.plot(data['labels'], data['actuals'], label='实际时长 (小时)', color=COLORS['duration_line'], alpha=0.5)
     daily_trends_y = np.array(data['trends'], dtype=float)
     daily_trends_x = np.arange(len(data['labels']))
@@ -65,6 +83,7 @@ def _plot_daily_duration(ax, data):
 
 def _plot_daily_efficiency(ax, data):
     """在给定的 Axes 上绘制每日学习效率图。"""
+    import numpy as np
     ax.plot(data['labels'], data['actuals'], label='实际效率', color=COLORS['efficiency_line'], alpha=0.5)
     daily_eff_y = np.array(data['trends'], dtype=float)
     daily_eff_x = np.arange(len(data['labels']))
@@ -76,13 +95,48 @@ def _plot_daily_efficiency(ax, data):
     ax.legend()
 
 
-def export_trends_image(username, trend_data):
+def _plot_category_share(ax, data):
+    """在给定的 Axes 上绘制主分类时长占比环形图。"""
+    plt = pyplot()
+    wedges, _, autotexts = ax.pie(
+        data['data'], labels=data['labels'], autopct='%1.1f%%',
+        startangle=90, pctdistance=0.85, colors=COLORS['category_palette'],
+        wedgeprops=dict(width=0.4, edgecolor='w')
+    )
+    plt.setp(autotexts, size=10, weight="bold", color="white")
+    ax.set_title('主分类时长占比', fontsize=16, weight='bold', pad=20)
+    ax.axis('equal')
+
+
+# 可单独渲染的图表: 名称 -> (绘制函数, 图尺寸)
+SINGLE_CHARTS = {
+    'weekly_duration': (_plot_weekly_duration, (10, 6)),
+    'weekly_efficiency': (_plot_weekly_efficiency, (10, 6)),
+    'daily_duration': (_plot_daily_duration, (10, 6)),
+    'daily_efficiency': (_plot_daily_efficiency, (10, 6)),
+    'category_share': (_plot_category_share, (8, 8)),
+}
+
+
+def _save_figure(fig, fmt, dpi):
+    plt = pyplot()
+    img_buffer = io.BytesIO()
+    fig.savefig(img_buffer, format=fmt, dpi=dpi or 'figure')
+    img_buffer.seek(0)
+    plt.close(fig)
+    return img_buffer
+
+
+def export_trends_image(username, trend_data, fmt='png', dpi=None):
     """
     根据传入的趋势数据，生成并返回趋势图表的图片缓冲。
     :param username: 用户名，用于图表标题。
     :param trend_data: 从 chart_service 获取的数据。
-    :return: 包含 PNG 图片的 BytesIO 缓冲。
+    :param fmt: 输出格式，'png' 或 'svg'。
+    :param dpi: 覆盖输出分辨率（用于低分辨率预览），默认使用图表自身的 dpi。
+    :return: 包含图片的 BytesIO 缓冲。
     """
+    plt = pyplot()
     if not trend_data.get('has_data'):
         return None
 
@@ -95,20 +149,35 @@ def export_trends_image(username, trend_data):
     _plot_daily_efficiency(axes[1, 1], trend_data['daily_efficiency_data'])
 
     fig.tight_layout(rect=[0, 0.03, 1, 0.95])
-    img_buffer = io.BytesIO()
-    fig.savefig(img_buffer, format='png')
-    img_buffer.seek(0)
-    plt.close(fig)
-    return img_buffer
+    return _save_figure(fig, fmt, dpi)
+
+
+def render_single_chart(kind, data, fmt='png', dpi=None):
+    """
+    用对应的 _plot_* 函数单独渲染一张图表。
+    :param kind: SINGLE_CHARTS 中的图表名称。
+    :param data: 该图表的数据（如 trend_data['weekly_duration_data'] 或 category_data['main']）。
+    :return: 包含图片的 BytesIO 缓冲。
+    """
+    plt = pyplot()
+    plot, figsize = SINGLE_CHARTS[kind]
+    fig, ax = plt.subplots(figsize=figsize, dpi=120)
+    plot(ax, data)
+    fig.tight_layout()
+    return _save_figure(fig, fmt, dpi)
 
 
-def export_category_image(username, category_data):
+def export_category_image(username, category_data, fmt='png', dpi=None, title=None):
     """
     根据传入的分类数据，生成并返回分类图表的图片缓冲。
     :param username: 用户名，用于图表标题。
     :param category_data: 从 chart_service 获取的数据。
-    :return: 包含 PNG 图片的 BytesIO 缓冲。
+    :param fmt: 输出格式，'png' 或 'svg'。
+    :param dpi: 覆盖输出分辨率（用于低分辨率预览），默认使用图表自身的 dpi。
+    :param title: 自定义总标题，例如按阶段导出时。
+    :return: 包含图片的 BytesIO 缓冲。
     """
+    plt = pyplot()
     if not category_data or not category_data['main']['labels']:
         fig, ax = plt.subplots(figsize=(12, 8), dpi=100)
         ax.text(0.5, 0.5, '没有可用于导出的分类数据', ha='center', va='center', fontsize=18)
@@ -118,18 +187,10 @@ def export_category_image(username, category_data):
         figure_height = 8 + (num_sub_charts * 4)
         fig = plt.figure(figsize=(12, figure_height), dpi=120)
         gs = fig.add_gridspec(num_sub_charts + 1, 1, height_ratios=[4] + [2] * num_sub_charts)
-        fig.suptitle(f'{username} 的学习分类总览', fontsize=24, weight='bold')
+        fig.suptitle(title or f'{username} 的学习分类总览', fontsize=24, weight='bold')
 
         main_cat_ax = fig.add_subplot(gs[0, 0])
-        main_data = category_data['main']
-        wedges, _, autotexts = main_cat_ax.pie(
-            main_data['data'], labels=main_data['labels'], autopct='%1.1f%%',
-            startangle=90, pctdistance=0.85, colors=COLORS['category_palette'],
-            wedgeprops=dict(width=0.4, edgecolor='w')
-        )
-        plt.setp(autotexts, size=10, weight="bold", color="white")
-        main_cat_ax.set_title('主分类时长占比', fontsize=16, weight='bold', pad=20)
-        main_cat_ax.axis('equal')
+        _plot_category_share(main_cat_ax, category_data['main'])
 
         sorted_main_categories = category_data['main']['labels']
         for i, cat_name in enumerate(sorted_main_categories):
@@ -149,8 +210,4 @@ def export_category_image(username, category_data):
             sub_ax.spines['left'].set_visible(False)
 
     fig.tight_layout(rect=[0, 0.03, 1, 0.96])
-    img_buffer = io.BytesIO()
-    fig.savefig(img_buffer, format='png')
-    img_buffer.seek(0)
-    plt.close(fig)
-    return img_buffer
+    return _save_figure(fig, fmt, dpi)
@@ -1,72 +1,94 @@
 # 文件路径: learning_logger/services/chart_service.py
 import collections
+import hashlib
+import json
 from datetime import date, timedelta
-from sqlalchemy import func, desc
-import numpy as np
+from sqlalchemy import case, desc, func, select
 
 from .. import db
-from ..models import Stage, LogEntry, WeeklyData, DailyData, Category, SubCategory
-from ..helpers import get_custom_week_info
+from ..cache import UserScopedCache
+from ..models import Stage, LogEntry, WeeklyData, DailyData, DailyRollup, Category, SubCategory
+from . import rollup_service
+from .stage_timeline import StageTimeline
+
+chart_cache = UserScopedCache('chart', 'CHART_CACHE_TTL')
+# 单图图片按数据指纹缓存，指纹变化即为新条目，因此无需随写入失效
+chart_image_cache = UserScopedCache('chart_image', 'CHART_IMAGE_CACHE_TTL', default_ttl=24 * 3600,
+                                    max_entries_config_key='CHART_IMAGE_CACHE_MAX_ENTRIES')
+
+# 单图名称 -> 趋势数据中的字段；category_share 取分类数据的主分类部分
+CHART_IMAGE_SOURCES = {
+    'weekly_duration': 'weekly_duration_data',
+    'weekly_efficiency': 'weekly_efficiency_data',
+    'daily_duration': 'daily_duration_data',
+    'daily_efficiency': 'daily_efficiency_data',
+    'category_share': None,
+}
+
+
+def invalidate_chart_data(user_id):
+    """用户的日志、阶段或分类发生变化后，使其全部图表缓存失效。"""
+    chart_cache.invalidate(user_id)
 
 
 def _calculate_sma(data, window_size=7):
     """计算简单移动平均线，能正确处理None/NaN值。"""
-    if not data or window_size <= 1:
-        return [None] * len(data)
-
-    numeric_data = [float(v) if v is not None else np.nan for v in data]
+    from . import trend_engine  # 依赖 numpy，推迟到第一次计算时导入
+    return trend_engine.sma_series(data, window_size)
 
-    if len(numeric_data) < window_size:
-        return [None] * len(numeric_data)
 
-    sma_values = []
-    window = collections.deque(maxlen=window_size)
-    for i, value in enumerate(numeric_data):
-        window.append(value)
-        if i < window_size - 1:
-            sma_values.append(None)
-        else:
-            valid_values = [v for v in window if not np.isnan(v)]
-            sma = sum(valid_values) / len(valid_values) if valid_values else None
-            sma_values.append(round(sma, 2) if sma is not None else None)
+def _calculate_streaks(log_dates, today):
+    """根据升序的有记录日期计算 (当前连续天数, 最长连续天数)；今天尚未记录时从昨天起算。"""
+    longest = run = 0
+    previous = None
+    for d in log_dates:
+        run = run + 1 if previous is not None and (d - previous).days == 1 else 1
+        longest = max(longest, run)
+        previous = d
+    current = run if previous is not None and (today - previous).days <= 1 else 0
+    return current, longest
 
-    return sma_values
 
+def _calculate_kpis(user, daily_minutes, today=None):
+    """
+    为用户计算关键性能指标(KPIs)。
+    时长类指标由每日汇总表上的一条条件聚合查询得出，效率之星以标量子查询并入同一条语句；
+    连续天数直接复用已读取的 daily_minutes，不再额外查询。
+    """
+    today = today or date.today()
+    start_of_this_week = today - timedelta(days=today.weekday())
+    start_of_last_week = start_of_this_week - timedelta(days=7)
+    start_of_30_days = today - timedelta(days=29)
+
+    def minutes_between(start, end):
+        return func.coalesce(func.sum(case((DailyRollup.log_date.between(start, end), DailyRollup.total_minutes),
+                                           else_=0)), 0)
+
+    top_day = select(DailyData.log_date, DailyData.efficiency).join(Stage).where(
+        Stage.user_id == user.id, DailyData.efficiency.isnot(None)
+    ).order_by(desc(DailyData.efficiency), DailyData.log_date.desc()).limit(1)
+
+    row = db.session.execute(select(
+        func.coalesce(func.sum(DailyRollup.total_minutes), 0),
+        func.count(DailyRollup.log_date),
+        minutes_between(start_of_this_week, start_of_this_week + timedelta(days=6)),
+        minutes_between(start_of_last_week, start_of_this_week - timedelta(days=1)),
+        minutes_between(start_of_30_days, today),
+        top_day.with_only_columns(DailyData.log_date).scalar_subquery(),
+        top_day.with_only_columns(DailyData.efficiency).scalar_subquery(),
+    ).where(DailyRollup.user_id == user.id)).one()
+    (total_duration_minutes, total_days_with_logs, logs_this_week, logs_last_week, last_30_days_minutes,
+     top_efficiency_date, top_efficiency) = row
 
-def _calculate_kpis(user, stage_ids):
-    """为用户计算关键性能指标(KPIs)。"""
     kpis = {}
-
-    total_duration_minutes = db.session.query(func.sum(LogEntry.actual_duration)).filter(
-        LogEntry.stage_id.in_(stage_ids)).scalar() or 0
-    total_days_with_logs = db.session.query(func.count(func.distinct(LogEntry.log_date))).filter(
-        LogEntry.stage_id.in_(stage_ids)).scalar() or 0
     kpis['avg_daily_minutes'] = round(total_duration_minutes / total_days_with_logs,
                                       1) if total_days_with_logs > 0 else 0
 
-    top_efficiency_day = DailyData.query.join(Stage).filter(Stage.user_id == user.id).order_by(
-        desc(DailyData.efficiency)).first()
-    if top_efficiency_day and top_efficiency_day.efficiency is not None:
-        kpis[
-            'efficiency_star'] = f"{top_efficiency_day.log_date.strftime('%Y-%m-%d')} (效率: {top_efficiency_day.efficiency:.1f})"
+    if top_efficiency_date is not None:
+        kpis['efficiency_star'] = f"{top_efficiency_date.strftime('%Y-%m-%d')} (效率: {top_efficiency:.1f})"
     else:
         kpis['efficiency_star'] = "无足够数据"
 
-    today = date.today()
-    start_of_this_week = today - timedelta(days=today.weekday())
-    end_of_this_week = start_of_this_week + timedelta(days=6)
-    logs_this_week = db.session.query(func.sum(LogEntry.actual_duration)).join(Stage).filter(
-        Stage.user_id == user.id,
-        LogEntry.log_date.between(start_of_this_week, end_of_this_week)
-    ).scalar() or 0
-
-    start_of_last_week = start_of_this_week - timedelta(days=7)
-    end_of_last_week = start_of_this_week - timedelta(days=1)
-    logs_last_week = db.session.query(func.sum(LogEntry.actual_duration)).join(Stage).filter(
-        Stage.user_id == user.id,
-        LogEntry.log_date.between(start_of_last_week, end_of_last_week)
-    ).scalar() or 0
-
     if logs_last_week > 0:
         percentage_change = ((logs_this_week - logs_last_week) / logs_last_week) * 100
         kpis['weekly_trend'] = f"{'+' if percentage_change >= 0 else ''}{percentage_change:.0f}%"
@@ -75,21 +97,23 @@ def _calculate_kpis(user, stage_ids):
     else:
         kpis['weekly_trend'] = "无对比数据"
 
+    kpis['current_streak'], kpis['longest_streak'] = _calculate_streaks([d for d, _ in daily_minutes], today)
+    kpis['avg_30d_minutes'] = round(last_30_days_minutes / 30, 1)
+
     return kpis
 
 
-def _prepare_trend_data(user, all_stages, all_logs):
-    """准备每日和每周趋势的数据结构。"""
-    first_log_date = min(log.log_date for log in all_logs)
+def _prepare_trend_data(user, timeline, daily_minutes):
+    """
+    准备每日和每周趋势的数据结构。
+    daily_minutes 为来自每日汇总表的 [(log_date, minutes)]，按日期升序。
+    """
+    first_log_date = daily_minutes[0][0]
     last_log_date = date.today()
-    global_start_date = all_stages[0].start_date
-    stage_ids = [s.id for s in all_stages]
 
     date_range = [first_log_date + timedelta(days=x) for x in range((last_log_date - first_log_date).days + 1)]
     daily_labels = [d.isoformat() for d in date_range]
-    daily_duration_map = {d[0]: d[1] for d in
-                          db.session.query(LogEntry.log_date, func.sum(LogEntry.actual_duration)).filter(
-                              LogEntry.stage_id.in_(stage_ids)).group_by(LogEntry.log_date).all()}
+    daily_duration_map = dict(daily_minutes)
     daily_durations = [round((daily_duration_map.get(d, 0) or 0) / 60, 2) for d in date_range]
     daily_efficiency_map = {d.log_date: d.efficiency for d in
                             DailyData.query.join(Stage).filter(Stage.user_id == user.id).all()}
@@ -97,13 +121,12 @@ def _prepare_trend_data(user, all_stages, all_logs):
 
     weekly_data = collections.defaultdict(lambda: {'duration': 0, 'efficiency': None})
     for d in date_range:
-        year, week_num = get_custom_week_info(d, global_start_date)
+        year, week_num = timeline.global_week(d)
         weekly_data[(year, week_num)]['duration'] += daily_duration_map.get(d, 0)
 
     weekly_efficiency_from_db = WeeklyData.query.join(Stage).filter(Stage.user_id == user.id).all()
     for w_eff in weekly_efficiency_from_db:
-        week_start_in_stage = w_eff.stage.start_date + timedelta(weeks=w_eff.week_num - 1)
-        global_year, global_week_num = get_custom_week_info(week_start_in_stage, global_start_date)
+        global_year, global_week_num = timeline.global_week_for_stage_week(w_eff.stage_id, w_eff.week_num)
         if (global_year, global_week_num) in weekly_data:
             weekly_data[(global_year, global_week_num)]['efficiency'] = w_eff.efficiency
 
@@ -112,62 +135,60 @@ def _prepare_trend_data(user, all_stages, all_logs):
     weekly_durations = [round(weekly_data[k]['duration'] / 60, 2) for k in sorted_week_keys]
     weekly_efficiencies = [weekly_data[k]['efficiency'] for k in sorted_week_keys]
 
+    # 同一粒度的两条序列堆叠后一次计算
+    weekly_duration_trends, weekly_efficiency_trends = _calculate_sma([weekly_durations, weekly_efficiencies], 3)
+    daily_duration_trends, daily_efficiency_trends = _calculate_sma([daily_durations, daily_efficiencies], 7)
+
     return {
         'weekly_duration_data': {'labels': weekly_labels, 'actuals': weekly_durations,
-                                 'trends': _calculate_sma(weekly_durations, 3)},
+                                 'trends': weekly_duration_trends},
         'weekly_efficiency_data': {'labels': weekly_labels, 'actuals': weekly_efficiencies,
-                                   'trends': _calculate_sma(weekly_efficiencies, 3)},
+                                   'trends': weekly_efficiency_trends},
         'daily_duration_data': {'labels': daily_labels, 'actuals': daily_durations,
-                                'trends': _calculate_sma(daily_durations, 7)},
+                                'trends': daily_duration_trends},
         'daily_efficiency_data': {'labels': daily_labels, 'actuals': daily_efficiencies,
-                                  'trends': _calculate_sma(daily_efficiencies, 7)}
+                                  'trends': daily_efficiency_trends}
     }
 
 
-def _prepare_stage_annotations(user, all_stages, global_start_date, last_log_date):
+def _prepare_stage_annotations(timeline, last_log_date):
     """为图表覆盖层准备阶段注释数据。"""
-    annotations = []
-    for stage in all_stages:
-        start_g_year, start_g_week = get_custom_week_info(stage.start_date, global_start_date)
-
-        next_stage_check = Stage.query.filter(
-            Stage.user_id == user.id,
-            Stage.start_date > stage.start_date
-        ).order_by(Stage.start_date.asc()).first()
+    return [{
+        'name': span.stage.name,
+        'start_week_label': timeline.week_label(span.start_date),
+        'end_week_label': timeline.week_label(span.effective_end(last_log_date))
+    } for span in timeline]
 
-        end_date = (next_stage_check.start_date - timedelta(days=1)) if next_stage_check else last_log_date
-        end_g_year, end_g_week = get_custom_week_info(end_date, global_start_date)
 
-        annotations.append({
-            'name': stage.name,
-            'start_week_label': f"{start_g_year}-W{start_g_week:02}",
-            'end_week_label': f"{end_g_year}-W{end_g_week:02}"
-        })
-    return annotations
+def get_chart_data_for_user(user):
+    """
+    为前端渲染图表准备所有必要的数据，结果按用户缓存。
+    数据依赖“今天”的日期，因此日期也是缓存键的一部分。
+    """
+    chart_data = chart_cache.get_or_compute(user.id, ('trends', date.today().isoformat()),
+                                            lambda: _compute_chart_data_for_user(user))
+    return chart_data, False
 
 
-def get_chart_data_for_user(user):
+def _compute_chart_data_for_user(user):
     """
     为前端渲染图表准备所有必要的数据。
     此函数现在负责协调对辅助函数的调用。
     """
     all_stages = Stage.query.filter_by(user_id=user.id).order_by(Stage.start_date.asc()).all()
     if not all_stages:
-        return {'kpis': {}, 'stage_annotations': [], 'setup_needed': True}, False
+        return {'kpis': {}, 'stage_annotations': [], 'setup_needed': True}
 
-    stage_ids = [s.id for s in all_stages]
-    all_logs = LogEntry.query.filter(LogEntry.stage_id.in_(stage_ids)).all()
-    if not all_logs:
+    daily_minutes = rollup_service.get_daily_minutes(user.id)
+    if not daily_minutes:
         return {'kpis': {'avg_daily_minutes': 0, 'efficiency_star': 'N/A', 'weekly_trend': 'N/A'},
-                'has_data': False}, False
-
-    kpis = _calculate_kpis(user, stage_ids)
+                'has_data': False}
 
-    trend_data = _prepare_trend_data(user, all_stages, all_logs)
+    kpis = _calculate_kpis(user, daily_minutes)
 
-    global_start_date = all_stages[0].start_date
-    last_log_date = date.today()
-    stage_annotations = _prepare_stage_annotations(user, all_stages, global_start_date, last_log_date)
+    timeline = StageTimeline(all_stages)
+    trend_data = _prepare_trend_data(user, timeline, daily_minutes)
+    stage_annotations = _prepare_stage_annotations(timeline, date.today())
 
     final_data = {
         'kpis': kpis,
@@ -176,10 +197,18 @@ def get_chart_data_for_user(user):
         **trend_data
     }
 
-    return final_data, False
+    return final_data
 
 
 def get_category_chart_data(user, stage_id=None):
+    """
+    获取并构建用于分类和子分类分析的数据，结果按用户和阶段缓存。
+    """
+    return chart_cache.get_or_compute(user.id, ('category', stage_id or 'all'),
+                                      lambda: _compute_category_chart_data(user, stage_id))
+
+
+def _compute_category_chart_data(user, stage_id=None):
     """
     获取并构建用于分类和子分类分析的数据。
     """
@@ -222,3 +251,20 @@ def get_category_chart_data(user, stage_id=None):
     }
 
     return {'main': {'labels': main_labels, 'data': main_data}, 'drilldown': sub_data}
+
+
+def get_chart_image_source(user, kind):
+    """返回单图所需的数据，没有数据时返回 None。"""
+    if kind == 'category_share':
+        category_data = get_category_chart_data(user)
+        return category_data['main'] if category_data else None
+    trend_data, _ = get_chart_data_for_user(user)
+    if not trend_data.get('has_data'):
+        return None
+    return trend_data[CHART_IMAGE_SOURCES[kind]]
+
+
+def chart_fingerprint(kind, fmt, data):
+    """图表数据的内容指纹，用作不可变图片 URL 的一部分。"""
+    payload = json.dumps([kind, fmt, data], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:20]
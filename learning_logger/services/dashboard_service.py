@@ -0,0 +1,60 @@
+# 文件路径: learning_logger/services/dashboard_service.py
+from datetime import date, datetime
+
+import pytz
+from sqlalchemy import func, select
+
+from .. import db
+from ..cache import UserScopedCache
+from ..models import CountdownEvent, DailyPlanItem, DailyRollup, Milestone, Todo
+
+dashboard_cache = UserScopedCache('dashboard', 'DASHBOARD_CACHE_TTL', default_ttl=60)
+
+
+def invalidate_dashboard(user_id):
+    """日志、待办、倒计时、计划或成就变化后调用，使首页摘要失效。"""
+    dashboard_cache.invalidate(user_id)
+
+
+def _query_summary(user_id, today, now_utc):
+    """所有计数以标量子查询合并进同一条 SELECT，一次往返取回。"""
+    next_event = select(CountdownEvent.title, CountdownEvent.target_datetime_utc).where(
+        CountdownEvent.user_id == user_id, CountdownEvent.target_datetime_utc > now_utc
+    ).order_by(CountdownEvent.target_datetime_utc.asc()).limit(1)
+    today_plans = select(func.count(DailyPlanItem.id)).where(
+        DailyPlanItem.user_id == user_id, DailyPlanItem.plan_date == today)
+
+    row = db.session.execute(select(
+        select(func.coalesce(func.sum(DailyRollup.total_minutes), 0)).where(
+            DailyRollup.user_id == user_id, DailyRollup.log_date == today).scalar_subquery(),
+        next_event.with_only_columns(CountdownEvent.title).scalar_subquery(),
+        next_event.with_only_columns(CountdownEvent.target_datetime_utc).scalar_subquery(),
+        select(func.count(Todo.id)).where(Todo.user_id == user_id, Todo.is_completed.is_(False)).scalar_subquery(),
+        select(func.count(Milestone.id)).where(Milestone.user_id == user_id).scalar_subquery(),
+        today_plans.scalar_subquery(),
+        today_plans.where(DailyPlanItem.is_completed.is_(True)).scalar_subquery(),
+    )).one()
+    (today_minutes, countdown_title, countdown_target, pending_todos, milestones,
+     plans_total, plans_completed) = row
+
+    if countdown_target is not None and countdown_target.tzinfo is None:
+        countdown_target = pytz.utc.localize(countdown_target)
+    return {
+        'today_minutes': today_minutes,
+        'next_countdown': (countdown_title, countdown_target) if countdown_title is not None else None,
+        'pending_todos': pending_todos,
+        'milestones': milestones,
+        'plans_total': plans_total,
+        'plans_completed': plans_completed,
+    }
+
+
+def get_summary(user_id, today=None, now_utc=None):
+    """
+    返回首页摘要所需的原始计数。结果按用户与日期短时缓存，
+    相关数据写入时通过 invalidate_dashboard 失效；最近的倒计时可能在缓存期内过期，由调用方判断。
+    """
+    today = today or date.today()
+    now_utc = now_utc or datetime.now(pytz.utc)
+    return dashboard_cache.get_or_compute(user_id, ('summary', today.isoformat()),
+                                          lambda: _query_summary(user_id, today, now_utc))
@@ -3,15 +3,20 @@ import io
 import json
 import os
 import zipfile
-from datetime import date, datetime
+from datetime import date, datetime, timezone
 from flask import current_app
 from werkzeug.utils import secure_filename
 
 from .. import db
+from . import rollup_service, token_index_service
+from .chart_service import invalidate_chart_data
+from .dashboard_service import invalidate_dashboard
+from .settings_service import invalidate_settings
+from .wordcloud_service import invalidate_wordcloud
 from ..models import (
     User, Stage, Category, SubCategory, LogEntry, DailyData, WeeklyData,
     Motto, Todo, Milestone, MilestoneCategory, MilestoneAttachment,
-    DailyPlanItem, Setting, CountdownEvent
+    DailyPlanItem, Setting, CountdownEvent, DailyRollup, NoteTokenFrequency
 )
 
 MODELS_TO_HANDLE = [
@@ -20,6 +25,18 @@ MODELS_TO_HANDLE = [
     CountdownEvent, DailyPlanItem
 ]
 
+IMPORT_ORDER = [
+    'setting', 'stage', 'category', 'milestone_category', 'motto',
+    'todo', 'countdown_event', 'daily_plan_item',
+    'sub_category', 'milestone',
+    'log_entry', 'daily_data', 'weekly_data', 'milestone_attachment'
+]
+
+EXPORT_BATCH_SIZE = 500
+ATTACHMENT_CHUNK_SIZE = 64 * 1024
+IMPORT_BATCH_SIZE = 1000
+JSON_READ_CHUNK_SIZE = 64 * 1024
+
 
 def _clear_user_data(user):
     """
@@ -46,6 +63,8 @@ def _clear_user_data(user):
 
     DailyData.query.filter(DailyData.stage.has(user_id=user.id)).delete(synchronize_session=False)
     WeeklyData.query.filter(WeeklyData.stage.has(user_id=user.id)).delete(synchronize_session=False)
+    DailyRollup.query.filter_by(user_id=user.id).delete(synchronize_session=False)
+    NoteTokenFrequency.query.filter_by(user_id=user.id).delete(synchronize_session=False)
     Milestone.query.filter_by(user_id=user.id).delete(synchronize_session=False)
 
     Motto.query.filter_by(user_id=user.id).delete(synchronize_session=False)
@@ -61,45 +80,267 @@ def _clear_user_data(user):
     current_app.logger.info(f"Successfully cleared all database entries for user: {user.username}")
 
 
-def export_data_for_user(user):
+class _ZipStream:
     """
-    将指定用户的所有数据导出到一个ZIP压缩包的内存缓冲区中。
+    只能追加写入的缓冲区，供 ZipFile 以流模式写入。
+    它不支持 seek，ZipFile 会因此改用数据描述符，边压缩边输出。
     """
-    current_app.logger.info(f"Starting data export for user: {user.username}")
-    buffer = io.BytesIO()
 
-    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zf:
+    def __init__(self):
+        self._chunks = []
 
-        for model in MODELS_TO_HANDLE:
+    def write(self, data):
+        if data:
+            self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
 
-            records = model.query.filter(getattr(model, 'user_id', None) == user.id).all()
-            if hasattr(model, 'stage') and not hasattr(model, 'user_id'):
-                records = model.query.join(Stage).filter(Stage.user_id == user.id).all()
-            if hasattr(model, 'milestone') and not hasattr(model, 'user_id'):
-                records = model.query.join(Milestone).filter(Milestone.user_id == user.id).all()
+    def drain(self):
+        """取出已写入的字节；没有新数据时不产生任何块。"""
+        if self._chunks:
+            data = b''.join(self._chunks)
+            self._chunks.clear()
+            yield data
 
-            data = [record.to_dict() for record in records]
-            json_data = json.dumps(data, indent=4, ensure_ascii=False)
-            zf.writestr(f'data/{model.__tablename__}.json', json_data)
+
+def _user_scoped_query(model, user):
+    """返回只包含该用户数据的查询。"""
+    if hasattr(model, 'user_id'):
+        return model.query.filter(model.user_id == user.id)
+    if hasattr(model, 'stage_id'):
+        return model.query.join(Stage).filter(Stage.user_id == user.id)
+    if hasattr(model, 'milestone_id'):
+        return model.query.join(Milestone).filter(Milestone.user_id == user.id)
+    if hasattr(model, 'category_id'):
+        return model.query.join(Category).filter(Category.user_id == user.id)
+    raise ValueError(f"Cannot scope model {model.__name__} to a user.")
+
+
+def iter_export_zip(user):
+    """
+    以流的方式逐块生成用户数据的 ZIP 备份。
+    数据行通过 yield_per 分批读取并逐行写入，附件按块复制，
+    峰值内存与账户数据量无关。
+    """
+    current_app.logger.info(f"Starting streaming data export for user: {user.username}")
+    stream = _ZipStream()
+
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for model in MODELS_TO_HANDLE:
+            query = _user_scoped_query(model, user).order_by(*model.__table__.primary_key.columns)
+            with zf.open(f'data/{model.__tablename__}.json', 'w', force_zip64=True) as json_file:
+                json_file.write(b'[')
+                for index, record in enumerate(query.yield_per(EXPORT_BATCH_SIZE)):
+                    separator = b',\n' if index else b'\n'
+                    json_file.write(separator + json.dumps(record.to_dict(), ensure_ascii=False).encode('utf-8'))
+                    if index % EXPORT_BATCH_SIZE == EXPORT_BATCH_SIZE - 1:
+                        yield from stream.drain()
+                json_file.write(b'\n]')
+            yield from stream.drain()
 
         current_app.logger.info("Exported all database tables to JSON.")
 
         upload_folder = current_app.config.get('MILESTONE_UPLOADS')
-        user_upload_folder = os.path.join(upload_folder, str(user.id))
-        if upload_folder and os.path.exists(user_upload_folder):
-            for filename in os.listdir(user_upload_folder):
-                file_path = os.path.join(user_upload_folder, filename)
+        if upload_folder:
+            user_upload_folder = os.path.join(upload_folder, str(user.id))
+            if os.path.exists(user_upload_folder):
+                for filename in os.listdir(user_upload_folder):
+                    file_path = os.path.join(user_upload_folder, filename)
+                    with open(file_path, 'rb') as src, \
+                            zf.open(f'attachments/{filename}', 'w', force_zip64=True) as dest:
+                        while True:
+                            chunk = src.read(ATTACHMENT_CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            dest.write(chunk)
+                            yield from stream.drain()
+                current_app.logger.info("Exported all milestone attachments.")
+
+    yield from stream.drain()
 
-                zf.write(file_path, arcname=f'attachments/{filename}')
-            current_app.logger.info("Exported all milestone attachments.")
 
+def export_data_for_user(user):
+    """
+    将指定用户的所有数据导出到一个ZIP压缩包的内存缓冲区中。
+    大账户请使用 iter_export_zip 以流的方式输出。
+    """
+    buffer = io.BytesIO()
+    for chunk in iter_export_zip(user):
+        buffer.write(chunk)
     buffer.seek(0)
     return buffer
 
 
+def _iter_json_array(binary_file):
+    """
+    增量解析顶层为数组的 JSON 文件，逐个产出其中的对象。
+    每次只读取 JSON_READ_CHUNK_SIZE 个字符，内存占用与文件大小无关。
+    """
+    decoder = json.JSONDecoder()
+    reader = io.TextIOWrapper(binary_file, encoding='utf-8')
+    buffer = ''
+    started = False
+    while True:
+        chunk = reader.read(JSON_READ_CHUNK_SIZE)
+        buffer += chunk
+        pos = 0
+        while True:
+            while pos < len(buffer) and (buffer[pos].isspace() or buffer[pos] == ','):
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError("JSON backup file must contain an array.")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                obj, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            yield obj
+        buffer = buffer[pos:]
+        if not chunk:
+            if started or buffer.strip():
+                raise ValueError("Unexpected end of JSON backup file.")
+            return
+
+
+def _parse_datetime(value):
+    dt_obj = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if dt_obj.tzinfo is not None:
+        dt_obj = dt_obj.astimezone(timezone.utc)
+    # 存储为无时区信息的datetime对象以兼容SQLite
+    return dt_obj.replace(tzinfo=None)
+
+
+def _column_converter(column):
+    """根据列的真实类型返回字符串值的解析函数，无需转换时返回 None。"""
+    if isinstance(column.type, db.DateTime):
+        return _parse_datetime
+    if isinstance(column.type, db.Date):
+        return date.fromisoformat
+    return None
+
+
+def _column_default(column):
+    default = column.default
+    if default is None or not default.is_scalar and not default.is_callable:
+        return None
+    return default.arg(None) if default.is_callable else default.arg
+
+
+def _rebase_attachment_path(row, user):
+    """附件会被解压到当前用户的目录，相对路径中的用户 ID 随之更新。"""
+    if row.get('file_path'):
+        row['file_path'] = f"{user.id}/{os.path.basename(row['file_path'])}"
+
+
+ROW_FIXUPS = {
+    'milestone_attachment': _rebase_attachment_path,
+}
+
+
+class _TableImporter:
+    """
+    把一个表的备份记录转换成可直接批量插入的行。
+    旧主键被丢弃，外键通过 id_maps 映射到新插入的主键，
+    因此备份可以导入到已有其他数据的数据库中。
+    """
+
+    def __init__(self, model, user, id_maps):
+        self.model = model
+        self.table = model.__table__
+        self.user = user
+        self.id_maps = id_maps
+        self.has_surrogate_id = 'id' in self.table.c and self.table.c.id.autoincrement in (True, 'auto') \
+            and list(self.table.primary_key.columns) == [self.table.c.id]
+        self.columns = [c for c in self.table.columns if not (self.has_surrogate_id and c.name == 'id')]
+        self.converters = {c.name: _column_converter(c) for c in self.columns}
+        self.foreign_keys = {}
+        for column in self.columns:
+            for fk in column.foreign_keys:
+                self.foreign_keys[column.name] = fk.column.table.name
+        self.skipped = 0
+
+    def convert(self, record):
+        """返回 (旧主键, 行字典)；外键无法映射且不可为空时返回 None。"""
+        row = {}
+        for column in self.columns:
+            name = column.name
+            value = record[name] if name in record else _column_default(column)
+
+            target_table = self.foreign_keys.get(name)
+            if target_table == 'user':
+                value = self.user.id
+            elif target_table and value is not None:
+                value = self.id_maps.get(target_table, {}).get(value)
+                if value is None and not column.nullable:
+                    self.skipped += 1
+                    return None
+
+            converter = self.converters[name]
+            if converter and isinstance(value, str):
+                try:
+                    value = converter(value) if value else None
+                except ValueError:
+                    current_app.logger.warning(f"Could not parse value '{value}' for column '{self.table.name}.{name}'")
+                    value = None
+            row[name] = value
+
+        fixup = ROW_FIXUPS.get(self.table.name)
+        if fixup:
+            fixup(row, self.user)
+        return record.get('id'), row
+
+    def insert(self, batch):
+        """批量插入一批 (旧主键, 行)；被其他表引用的表记录新旧主键的对应关系。"""
+        if not batch:
+            return
+        old_ids = [old_id for old_id, _ in batch]
+        rows = [row for _, row in batch]
+        if self.table.name in self.id_maps:
+            stmt = self.table.insert().returning(self.table.c.id, sort_by_parameter_order=True)
+            new_ids = db.session.execute(stmt, rows).scalars().all()
+            self.id_maps[self.table.name].update(zip(old_ids, new_ids))
+        else:
+            db.session.execute(self.table.insert(), rows)
+
+
+def _import_table(zf, model, user, id_maps):
+    """以增量解析 + 分批 executemany 的方式导入一个表，返回导入的行数。"""
+    importer = _TableImporter(model, user, id_maps)
+    imported = 0
+    batch = []
+    with zf.open(f'data/{model.__tablename__}.json') as json_file:
+        for record in _iter_json_array(json_file):
+            converted = importer.convert(record)
+            if converted is None:
+                continue
+            batch.append(converted)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                importer.insert(batch)
+                imported += len(batch)
+                batch = []
+    importer.insert(batch)
+    imported += len(batch)
+    if importer.skipped:
+        current_app.logger.warning(
+            f"Skipped {importer.skipped} rows of '{model.__tablename__}' with unresolved foreign keys.")
+    return imported
+
+
 def import_data_for_user(user, zip_file_stream):
     """
     从一个ZIP文件流中为指定用户导入数据，此操作会先清空用户现有数据。
+    JSON 增量解析并按列类型转换，每个表分批插入；主键重新分配，外键随之重映射。
     """
     current_app.logger.info(f"Starting data import for user: {user.username}")
     try:
@@ -109,55 +350,19 @@ def import_data_for_user(user, zip_file_stream):
         with zipfile.ZipFile(zip_file_stream, 'r') as zf:
 
             model_map = {model.__tablename__: model for model in MODELS_TO_HANDLE}
+            archive_names = set(zf.namelist())
+            id_maps = {fk.column.table.name: {} for model in MODELS_TO_HANDLE
+                       for fk in model.__table__.foreign_keys if fk.column.table.name != 'user'}
 
-            import_order = [
-                'setting', 'stage', 'category', 'milestone_category', 'motto',
-                'todo', 'countdown_event', 'daily_plan_item',
-                'sub_category', 'milestone',
-                'log_entry', 'daily_data', 'weekly_data', 'milestone_attachment'
-            ]
-
-            for table_name in import_order:
+            for table_name in IMPORT_ORDER:
                 model = model_map.get(table_name)
-                if not model:
+                if not model or f'data/{table_name}.json' not in archive_names:
                     continue
+                imported = _import_table(zf, model, user, id_maps)
+                current_app.logger.info(f"Imported {imported} rows into '{table_name}'.")
 
-                json_path = f'data/{table_name}.json'
-                if json_path in zf.namelist():
-                    with zf.open(json_path) as json_file:
-                        records = json.load(json_file)
-                        for record_data in records:
-
-                            if 'user_id' in model.__table__.columns:
-                                record_data['user_id'] = user.id
-
-                            # --- MODIFICATION START ---
-                            # 修正了日期和时间字符串的解析逻辑
-                            for key, value in record_data.items():
-                                # 只处理非空字符串
-                                if isinstance(value, str) and value:
-                                    # 更稳健地判断是否为日期时间字段，例如检查结尾是否为 _at 或 _utc
-                                    if 'datetime' in key or key.endswith('_at') or key.endswith('_utc'):
-                                        try:
-                                            # fromisoformat 可以处理带或不带时区信息的ISO格式字符串
-                                            dt_obj = datetime.fromisoformat(value.replace('Z', '+00:00'))
-                                            # 存储为无时区信息的datetime对象以兼容SQLite
-                                            record_data[key] = dt_obj.replace(tzinfo=None)
-                                        except ValueError:
-                                            current_app.logger.warning(
-                                                f"Could not parse datetime string '{value}' for key '{key}'")
-                                            pass
-                                    elif 'date' in key:
-                                        try:
-                                            record_data[key] = date.fromisoformat(value)
-                                        except ValueError:
-                                            current_app.logger.warning(
-                                                f"Could not parse date string '{value}' for key '{key}'")
-                                            pass
-                            # --- MODIFICATION END ---
-
-                            db.session.add(model(**record_data))
-
+            rollup_service.rebuild_for_user(user.id)
+            token_index_service.rebuild_for_user(user.id)
             current_app.logger.info("Imported all JSON data to database session.")
 
             upload_folder = current_app.config.get('MILESTONE_UPLOADS')
@@ -177,6 +382,10 @@ def import_data_for_user(user, zip_file_stream):
                 current_app.logger.info("Extracted all attachments.")
 
         db.session.commit()
+        invalidate_chart_data(user.id)
+        invalidate_wordcloud(user.id)
+        invalidate_dashboard(user.id)
+        invalidate_settings(user.id)
         current_app.logger.info("Data import committed successfully.")
         return True, "数据导入成功！所有旧数据已被覆盖。"
 
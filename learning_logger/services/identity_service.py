@@ -0,0 +1,64 @@
+# 文件路径: learning_logger/services/identity_service.py
+"""
+Flask-Login 的用户加载缓存。
+
+每个已登录请求都要先解析 current_user；这里缓存 (id, 用户名, 邮箱)，
+命中时构造一个轻量的 Principal，不访问 user 表。
+User 行被更新或删除时（改名、改密码等）经 ORM 事件自动失效；
+进程内 'memory' 后端的失效传不到其他 worker，此时 TTL 以 USER_LOCAL_CACHE_TTL 为上限。
+"""
+from sqlalchemy import event
+
+from .. import db
+from ..cache import UserScopedCache
+from ..models import User
+
+identity_cache = UserScopedCache('identity', 'USER_CACHE_TTL', default_ttl=300,
+                                 local_ttl_config_key='USER_LOCAL_CACHE_TTL')
+
+
+class Principal:
+    """当前登录用户的只读身份，提供 Flask-Login 需要的接口以及 id/username/email。"""
+    __slots__ = ('id', 'username', 'email')
+
+    is_authenticated = True
+    is_active = True
+    is_anonymous = False
+
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
+
+    def get_id(self):
+        return str(self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, (Principal, User)) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f'<Principal {self.username}>'
+
+
+def _load_identity(user_id):
+    row = db.session.query(User.id, User.username, User.email).filter(User.id == user_id).first()
+    return tuple(row) if row else None
+
+
+def load_principal(user_id):
+    """按 id 返回 Principal；用户不存在时返回 None（同样会被缓存，删除用户时失效）。"""
+    identity = identity_cache.get_or_compute(user_id, ('principal',), lambda: _load_identity(user_id))
+    return Principal(*identity) if identity else None
+
+
+def invalidate_user(user_id):
+    identity_cache.invalidate(user_id)
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_on_change(mapper, connection, target):
+    invalidate_user(target.id)
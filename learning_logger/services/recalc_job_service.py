@@ -0,0 +1,141 @@
+# 文件路径: learning_logger/services/recalc_job_service.py
+"""
+导入后的效率重算后台任务。
+
+任务进度保存在 recalc_job 表中：提交任务的 worker 与轮询进度的 worker 可以不是同一个进程。
+各阶段在本进程的线程池中处理，每个阶段在独立的应用上下文（独立的数据库会话）中执行，
+完成一个阶段就用一条原子 UPDATE 累加计数。
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from .. import db
+from ..models import RecalcJob, Stage
+from . import record_service
+
+# 已结束的任务保留多久，供前端轮询最终状态
+FINISHED_JOB_RETENTION = timedelta(days=1)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(app):
+    """
+    惰性创建进程内共享的线程池。
+    SQLite 同一时刻只允许一个写入者，因此在 SQLite 上只使用单个工作线程。
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            max_workers = app.config.get('RECALC_MAX_WORKERS', 4)
+            if db.engine.dialect.name == 'sqlite':
+                max_workers = 1
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='recalc')
+        return _executor
+
+
+def shutdown(wait=True):
+    """关闭线程池；下次提交任务时按当前应用重建。"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
+
+
+def _prune_finished_jobs(user_id):
+    cutoff = datetime.utcnow() - FINISHED_JOB_RETENTION
+    RecalcJob.query.filter(RecalcJob.user_id == user_id, RecalcJob.finished_at < cutoff).delete(
+        synchronize_session=False)
+
+
+def _recalculate_stage(stage_id):
+    stage = db.session.get(Stage, stage_id)
+    if stage is None:
+        return False
+    return record_service.recalculate_efficiency_for_stage(stage)
+
+
+def _record_result(job_id, success):
+    """原子地累加完成/失败计数；最后一个阶段结束时写入 finished_at。返回任务是否已结束。"""
+    counter = RecalcJob.completed if success else RecalcJob.failed
+    db.session.execute(update(RecalcJob).where(RecalcJob.id == job_id).values({counter: counter + 1}))
+    finished = db.session.execute(
+        update(RecalcJob).where(RecalcJob.id == job_id, RecalcJob.finished_at.is_(None),
+                                RecalcJob.completed + RecalcJob.failed >= RecalcJob.total)
+        .values(finished_at=datetime.utcnow())).rowcount
+    db.session.commit()
+    return bool(finished)
+
+
+def _run_stage(job_id, stage_id):
+    success = False
+    try:
+        success = _recalculate_stage(stage_id)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        finished = _record_result(job_id, success)
+    return finished
+
+
+def _run_stage_in_own_context(app, job_id, stage_id):
+    """在独立的应用上下文（即独立的数据库会话）中重算一个阶段，上下文退出时会话随之释放。"""
+    with app.app_context():
+        try:
+            if _run_stage(job_id, stage_id):
+                job = db.session.get(RecalcJob, job_id)
+                app.logger.info(f"Recalculation job {job_id} finished: {job.completed}/{job.total} stages succeeded.")
+        except Exception as e:
+            app.logger.error(f"Recalculation job {job_id} failed for stage {stage_id}: {e}", exc_info=True)
+
+
+def submit_recalculation(app, user_id, stage_ids):
+    """
+    为一组阶段提交效率重算任务并立即返回 RecalcJob。
+    各阶段在线程池中并发处理，每个阶段使用自己的会话；
+    配置 RECALC_JOBS_EAGER 时（例如测试用的内存 SQLite）在当前线程中依次执行。
+    """
+    stage_ids = list(stage_ids)
+    _prune_finished_jobs(user_id)
+    job = RecalcJob(id=uuid.uuid4().hex, user_id=user_id, total=len(stage_ids),
+                    finished_at=None if stage_ids else datetime.utcnow())
+    db.session.add(job)
+    db.session.commit()
+
+    if app.config.get('RECALC_JOBS_EAGER'):
+        for stage_id in stage_ids:
+            try:
+                _run_stage(job.id, stage_id)
+            except Exception as e:
+                app.logger.error(f"Recalculation job {job.id} failed for stage {stage_id}: {e}", exc_info=True)
+        return job
+
+    executor = _get_executor(app)
+    for stage_id in stage_ids:
+        executor.submit(_run_stage_in_own_context, app, job.id, stage_id)
+    return job
+
+
+def get_job_for_user(job_id, user_id):
+    return RecalcJob.query.filter_by(id=job_id, user_id=user_id).first()
+
+
+def wait_for_job(job_id, timeout=None, poll_interval=0.05):
+    """轮询直到任务结束，返回任务是否已结束。使用独立连接读取，不影响当前会话。"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    query = select(RecalcJob.finished_at).where(RecalcJob.id == job_id)
+    while True:
+        with db.engine.connect() as connection:
+            if connection.execute(query).scalar() is not None:
+                return True
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        time.sleep(poll_interval)
@@ -1,11 +1,34 @@
 # 文件路径: learning_logger/services/record_service.py
 import math
+from dataclasses import dataclass
 from datetime import date, timedelta
 from itertools import groupby
 from flask import current_app
+from sqlalchemy import func, insert, select, tuple_
+from sqlalchemy.orm import joinedload
 from .. import db
 from ..models import Stage, LogEntry, WeeklyData, DailyData, Category, SubCategory
-from ..helpers import get_custom_week_info
+from ..helpers import get_custom_week_info, upsert_statement
+from . import chart_service, dashboard_service, rollup_service, token_index_service, wordcloud_service
+from .rollup_service import DEFAULT_MOOD
+from .stage_timeline import StageTimeline
+
+UPSERT_BATCH_SIZE = 1000
+WEEKS_PER_PAGE = 8
+LOG_STREAM_BATCH_SIZE = 500
+
+
+def _efficiency_from_totals(total_duration_minutes, weighted_mood_duration_sum):
+    """
+    按“方案C：对数加权模型”由当日汇总值计算效率分。
+    公式: 每日效率 = (加权平均心情) × log(1 + 总学习小时数)
+    """
+    if not total_duration_minutes:
+        return 0.0
+
+    average_mood = weighted_mood_duration_sum / total_duration_minutes
+    total_hours = total_duration_minutes / 60.0
+    return average_mood * math.log1p(total_hours)
 
 
 def _calculate_daily_efficiency_score(log_date, stage_id):
@@ -19,16 +42,46 @@ def _calculate_daily_efficiency_score(log_date, stage_id):
         return 0.0
 
     total_duration_minutes = sum(log.actual_duration or 0 for log in logs_for_day)
+    weighted_mood_duration_sum = sum((log.actual_duration or 0) * (log.mood or DEFAULT_MOOD) for log in logs_for_day)
 
-    if total_duration_minutes == 0:
-        return 0.0
+    return _efficiency_from_totals(total_duration_minutes, weighted_mood_duration_sum)
 
-    weighted_mood_duration_sum = sum((log.actual_duration or 0) * (log.mood or 3) for log in logs_for_day)
-    average_mood = weighted_mood_duration_sum / total_duration_minutes
-    total_hours = total_duration_minutes / 60.0
-    final_score = average_mood * math.log1p(total_hours)
 
-    return final_score
+def _aggregate_daily_totals(stage_id):
+    """
+    用一条 GROUP BY 查询取出阶段内每天的总时长与“时长×心情”之和。
+    返回按日期升序排列的 (log_date, total_minutes, weighted_mood_sum) 列表。
+    """
+    duration = func.coalesce(LogEntry.actual_duration, 0)
+    mood = func.coalesce(LogEntry.mood, DEFAULT_MOOD)
+    return db.session.query(
+        LogEntry.log_date,
+        func.sum(duration),
+        func.sum(duration * mood)
+    ).filter(
+        LogEntry.stage_id == stage_id
+    ).group_by(LogEntry.log_date).order_by(LogEntry.log_date.asc()).all()
+
+
+def _bulk_upsert(model, rows, index_elements):
+    """
+    以 INSERT ... ON CONFLICT DO UPDATE 批量写入派生数据。
+    仅 PostgreSQL 与 SQLite 支持该语法；其他方言退化为先删后插。
+    """
+    if not rows:
+        return
+
+    stmt = upsert_statement(model)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(index_elements=index_elements,
+                                          set_={'efficiency': stmt.excluded.efficiency})
+        # 分批写入，避免单条语句的绑定参数超过数据库上限
+        for i in range(0, len(rows), UPSERT_BATCH_SIZE):
+            db.session.execute(stmt.values(rows[i:i + UPSERT_BATCH_SIZE]))
+    else:
+        for row in rows:
+            model.query.filter_by(**{key: row[key] for key in index_elements}).delete(synchronize_session=False)
+        db.session.execute(insert(model), rows)
 
 
 def _get_or_create_daily_data(log_date, stage_id, score):
@@ -47,23 +100,52 @@ def _get_or_create_weekly_data(year, week_num, stage_id, score):
     weekly_data.efficiency = score
 
 
+def _invalidate_user_caches(user_id, notes_changed=False):
+    """日志或派生数据写入后，使依赖它们的缓存失效；日志本身变化时词云也随之失效。"""
+    chart_service.invalidate_chart_data(user_id)
+    dashboard_service.invalidate_dashboard(user_id)
+    if notes_changed:
+        wordcloud_service.invalidate_wordcloud(user_id)
+
+
+@dataclass(frozen=True)
+class DayUpdate:
+    """一次增量更新后某天及其所在周的最新数值，供请求处理函数直接组装响应。"""
+    log_date: date
+    log_count: int
+    total_duration: int
+    daily_efficiency: float
+    year: int
+    week_num: int
+    weekly_efficiency: float
+
+
 def update_efficiency_for_date(log_date, stage):
     """
     Incrementally updates the efficiency score for a specific date and its corresponding week.
     This is much faster than recalculating the entire stage.
+    Returns a DayUpdate with the new values, or None if the update failed.
     """
+    # 提交会使 stage 过期，先取出要用的字段，避免提交后再次查询
+    stage_id, stage_name, stage_start = stage.id, stage.name, stage.start_date
     try:
+        duration = func.coalesce(LogEntry.actual_duration, 0)
+        log_count, total_minutes, weighted_sum = db.session.query(
+            func.count(LogEntry.id),
+            func.coalesce(func.sum(duration), 0),
+            func.coalesce(func.sum(duration * func.coalesce(LogEntry.mood, DEFAULT_MOOD)), 0)
+        ).filter(LogEntry.log_date == log_date, LogEntry.stage_id == stage_id).one()
 
-        daily_score = _calculate_daily_efficiency_score(log_date, stage.id)
-        _get_or_create_daily_data(log_date, stage.id, daily_score)
+        daily_score = _efficiency_from_totals(total_minutes, weighted_sum)
+        _get_or_create_daily_data(log_date, stage_id, daily_score)
 
-        year, week_num = get_custom_week_info(log_date, stage.start_date)
+        year, week_num = get_custom_week_info(log_date, stage_start)
 
-        week_start_date = stage.start_date + timedelta(weeks=week_num - 1)
+        week_start_date = stage_start + timedelta(weeks=week_num - 1)
         week_end_date = week_start_date + timedelta(days=6)
 
         daily_scores_for_week = db.session.query(DailyData.efficiency).filter(
-            DailyData.stage_id == stage.id,
+            DailyData.stage_id == stage_id,
             DailyData.log_date.between(week_start_date, week_end_date)
         ).all()
 
@@ -71,94 +153,187 @@ def update_efficiency_for_date(log_date, stage):
         count = len(daily_scores_for_week)
         average_score = total_score / count if count > 0 else 0.0
 
-        _get_or_create_weekly_data(year, week_num, stage.id, average_score)
+        _get_or_create_weekly_data(year, week_num, stage_id, average_score)
 
         db.session.commit()
-        current_app.logger.info(f"Incrementally updated efficiency for date: {log_date} in stage '{stage.name}'.")
+        current_app.logger.info(f"Incrementally updated efficiency for date: {log_date} in stage '{stage_name}'.")
+        return DayUpdate(log_date=log_date, log_count=log_count, total_duration=total_minutes,
+                         daily_efficiency=daily_score, year=year, week_num=week_num,
+                         weekly_efficiency=average_score)
 
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error in update_efficiency_for_date for date '{log_date}': {e}", exc_info=True)
+        return None
 
 
-def recalculate_efficiency_for_stage(stage):
+def _compute_weekly_scores(stage, daily_efficiencies_map, stage_end_date):
+    """
+    在内存中按阶段自定义周计算周平均效率。
+    没有记录的日子按 0 分计入，周的有效区间被截断在阶段起止日期与今天之内。
+    """
+    weekly_scores = {}
+    unique_weeks = sorted(set(get_custom_week_info(d, stage.start_date) for d in daily_efficiencies_map))
+    for year, week_num in unique_weeks:
+        theoretical_week_start = stage.start_date + timedelta(weeks=week_num - 1)
+        theoretical_week_end = theoretical_week_start + timedelta(days=6)
+        effective_start = max(theoretical_week_start, stage.start_date)
+        effective_end = min(theoretical_week_end, stage_end_date, date.today())
+        days_in_week = (effective_end - effective_start).days + 1 if effective_end >= effective_start else 0
+
+        total_score = sum(
+            daily_efficiencies_map.get(effective_start + timedelta(days=i), 0) for i in range(days_in_week))
+        weekly_scores[(year, week_num)] = total_score / days_in_week if days_in_week > 0 else 0
+    return weekly_scores
+
+
+def recalculate_efficiency_for_stage(stage, timeline=None):
+    """
+    全量重算一个阶段的每日/每周效率。
+    日志只通过一条聚合查询读取一次，所有分数在内存中计算，
+    随后各用一条批量 upsert 写入 DailyData 与 WeeklyData，并清理过期的派生行。
+    阶段的结束日期取自 timeline；连续重算多个阶段时可传入同一个 timeline 复用。
+    返回是否成功。
+    """
     try:
-        all_logs = stage.log_entries.all()
-        DailyData.query.filter_by(stage_id=stage.id).delete()
-        WeeklyData.query.filter_by(stage_id=stage.id).delete()
-        db.session.commit()
-
-        if not all_logs:
-            return
-
-        unique_log_dates = sorted(list(set(log.log_date for log in all_logs)))
-        daily_efficiencies_map = {}
-        for log_date in unique_log_dates:
-            score = _calculate_daily_efficiency_score(log_date, stage.id)
-            _get_or_create_daily_data(log_date, stage.id, score)
-            daily_efficiencies_map[log_date] = score
-
-        db.session.commit()
-
-        next_stage = Stage.query.filter(Stage.user_id == stage.user_id, Stage.start_date > stage.start_date).order_by(
-            Stage.start_date.asc()).first()
-        stage_end_date = (next_stage.start_date - timedelta(days=1)) if next_stage else date.today()
-
-        unique_weeks = sorted(list(set(get_custom_week_info(d, stage.start_date) for d in unique_log_dates)))
-        for year, week_num in unique_weeks:
-            theoretical_week_start = stage.start_date + timedelta(weeks=week_num - 1)
-            theoretical_week_end = theoretical_week_start + timedelta(days=6)
-            effective_start = max(theoretical_week_start, stage.start_date)
-            effective_end = min(theoretical_week_end, stage_end_date, date.today())
-            days_in_week = (effective_end - effective_start).days + 1 if effective_end >= effective_start else 0
-
-            total_score = sum(
-                daily_efficiencies_map.get(effective_start + timedelta(days=i), 0) for i in range(days_in_week))
-            average_score = total_score / days_in_week if days_in_week > 0 else 0
-            _get_or_create_weekly_data(year, week_num, stage.id, average_score)
+        daily_totals = _aggregate_daily_totals(stage.id)
+        daily_efficiencies_map = {
+            log_date: _efficiency_from_totals(total_minutes or 0, weighted_sum or 0)
+            for log_date, total_minutes, weighted_sum in daily_totals
+        }
+
+        if not daily_efficiencies_map:
+            DailyData.query.filter_by(stage_id=stage.id).delete(synchronize_session=False)
+            WeeklyData.query.filter_by(stage_id=stage.id).delete(synchronize_session=False)
+            db.session.commit()
+            _invalidate_user_caches(stage.user_id)
+            return True
+
+        if timeline is None:
+            timeline = StageTimeline.for_user(stage.user_id)
+        stage_end_date = timeline.span_for(stage.id).effective_end()
+        weekly_scores = _compute_weekly_scores(stage, daily_efficiencies_map, stage_end_date)
+
+        DailyData.query.filter(
+            DailyData.stage_id == stage.id,
+            DailyData.log_date.notin_(list(daily_efficiencies_map))
+        ).delete(synchronize_session=False)
+        WeeklyData.query.filter(
+            WeeklyData.stage_id == stage.id,
+            db.tuple_(WeeklyData.year, WeeklyData.week_num).notin_(list(weekly_scores))
+        ).delete(synchronize_session=False)
+
+        _bulk_upsert(DailyData, [
+            {'log_date': log_date, 'stage_id': stage.id, 'efficiency': score}
+            for log_date, score in daily_efficiencies_map.items()
+        ], index_elements=['log_date', 'stage_id'])
+        _bulk_upsert(WeeklyData, [
+            {'year': year, 'week_num': week_num, 'stage_id': stage.id, 'efficiency': score}
+            for (year, week_num), score in weekly_scores.items()
+        ], index_elements=['year', 'week_num', 'stage_id'])
 
         db.session.commit()
+        _invalidate_user_caches(stage.user_id)
         current_app.logger.info(f"Successfully recalculated efficiency for stage '{stage.name}'.")
+        return True
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error in recalculate_efficiency_for_stage for stage '{stage.name}': {e}",
                                  exc_info=True)
+        return False
+
 
+def parse_page_cursor(value):
+    """把 'YYYY-MM-DD' 形式的游标解析为日期；格式错误时抛出 ValueError。"""
+    return date.fromisoformat(value)
 
-def get_structured_logs_for_stage(stage, sort_order='desc'):
+
+def _iter_log_weeks(stage, week_keys, range_start, range_end, is_reverse, continued=False):
+    """
+    以 yield_per 游标按排序方向读取日志，每凑齐一周就产出一周的结构。
+    continued 为真表示第一周的前一部分已在上一页出现过，此时它的锚点带上首个日期，避免页面中出现重复的元素 id。
+    """
+    day_efficiency = dict(db.session.query(DailyData.log_date, DailyData.efficiency).filter(
+        DailyData.stage_id == stage.id, DailyData.log_date.between(range_start, range_end)))
+    week_efficiency = {(year, week_num): efficiency for year, week_num, efficiency in db.session.query(
+        WeeklyData.year, WeeklyData.week_num, WeeklyData.efficiency).filter(
+        WeeklyData.stage_id == stage.id,
+        tuple_(WeeklyData.year, WeeklyData.week_num).in_(week_keys))}
+
+    order = LogEntry.log_date.desc() if is_reverse else LogEntry.log_date.asc()
+    logs = LogEntry.query.options(joinedload(LogEntry.subcategory).joinedload(SubCategory.category)).filter(
+        LogEntry.stage_id == stage.id, LogEntry.log_date.between(range_start, range_end)
+    ).order_by(order, LogEntry.id.asc()).yield_per(LOG_STREAM_BATCH_SIZE)
+
+    for index, (week_key, week_logs) in enumerate(
+            groupby(logs, key=lambda log: get_custom_week_info(log.log_date, stage.start_date))):
+        days = []
+        for day_date, day_logs in groupby(week_logs, key=lambda log: log.log_date):
+            day_logs = list(day_logs)
+            days.append({'date': day_date, 'efficiency': day_efficiency.get(day_date) or 0, 'logs': day_logs,
+                         'total_duration': sum(log.actual_duration for log in day_logs if log.actual_duration)})
+        is_continued = continued and index == 0
+        anchor = f"{week_key[0]}-{week_key[1]}"
+        if is_continued:
+            anchor += f"-{days[0]['date'].isoformat()}"
+        yield {'year': week_key[0], 'week_num': week_key[1], 'anchor': anchor, 'continued': is_continued,
+               'efficiency': week_efficiency.get(week_key) or 0, 'days': days}
+
+
+def get_log_page_for_stage(stage, sort_order='desc', cursor=None, per_page=WEEKS_PER_PAGE, stream=False):
+    """
+    按日期做键集分页：cursor 为上一页的最后一个日期，返回其后 per_page 个有记录的周及下一页游标（没有更多时为 None）。
+    先取至多 per_page * 7 + 1 个不同日期确定本页包含哪些周，
+    再只加载这些日期内的日志、日效率与周效率。
+    普通的周最多 7 个日期，总是完整地出现在一页中；早于阶段起始日的记录都归入起始年的第 1 周，
+    这一周的日期数可能超过窗口，此时按日期拆到后续页，续页中的这一周标记为 continued。
+    stream=True 时 weeks 为生成器，供流式渲染边读边输出；否则为列表。
+    """
     is_reverse = (sort_order == 'desc')
-    all_logs = stage.log_entries.order_by(LogEntry.log_date.asc(), LogEntry.id.asc()).all()
-    day_data_map = {d.log_date: d for d in stage.daily_data.all()}
-    week_data_map = {(w.year, w.week_num): w for w in stage.weekly_data.all()}
-    structured_logs = []
-    if not all_logs:
-        return structured_logs
-    logs_by_week_iter = groupby(all_logs, key=lambda log: get_custom_week_info(log.log_date, stage.start_date))
-    for (year, week_num), week_logs in logs_by_week_iter:
-        days_in_week = []
-        logs_by_day_iter = groupby(list(week_logs), key=lambda log: log.log_date)
-        for day_date, day_logs in logs_by_day_iter:
-            day_data = day_data_map.get(day_date)
-            days_in_week.append(
-                {'date': day_date, 'efficiency': day_data.efficiency if day_data else 0, 'logs': list(day_logs)})
-        week_data = week_data_map.get((year, week_num))
-        structured_logs.append(
-            {'year': year, 'week_num': week_num, 'efficiency': week_data.efficiency if week_data else 0,
-             'days': sorted(days_in_week, key=lambda d: d['date'], reverse=is_reverse)})
-    return sorted(structured_logs, key=lambda w: (w['year'], w['week_num']), reverse=is_reverse)
+    dates_query = db.session.query(LogEntry.log_date).filter(LogEntry.stage_id == stage.id).distinct()
+    if cursor is not None:
+        dates_query = dates_query.filter(LogEntry.log_date < cursor if is_reverse else LogEntry.log_date > cursor)
+    order = LogEntry.log_date.desc() if is_reverse else LogEntry.log_date.asc()
+    # 一周最多 7 个日期，多取一个即可判断是否还有下一页
+    window = per_page * 7 + 1
+    candidate_dates = [d for d, in dates_query.order_by(order).limit(window)]
+
+    week_keys = []
+    page_dates = []
+    for log_date in candidate_dates:
+        week_key = get_custom_week_info(log_date, stage.start_date)
+        if not week_keys or week_keys[-1] != week_key:
+            if len(week_keys) == per_page:
+                break
+            week_keys.append(week_key)
+        page_dates.append(log_date)
+    if not page_dates:
+        return {'weeks': [], 'week_keys': [], 'next_cursor': None}
+    if len(page_dates) == window:
+        # 整个窗口都没有越过第 per_page 周，说明其中有超过 7 个日期的周（合并的提前记录）：
+        # 留下最后一个日期给下一页，这一周在下一页接着显示
+        page_dates.pop()
+        if get_custom_week_info(page_dates[-1], stage.start_date) != week_keys[-1]:
+            week_keys.pop()
+
+    has_more = len(page_dates) < len(candidate_dates)
+    continued = cursor is not None and get_custom_week_info(cursor, stage.start_date) == week_keys[0]
+    weeks = _iter_log_weeks(stage, week_keys, min(page_dates), max(page_dates), is_reverse, continued)
+    return {'weeks': weeks if stream else list(weeks), 'week_keys': week_keys,
+            'next_cursor': page_dates[-1].isoformat() if has_more else None}
 
 
 def add_log_for_stage(stage_id, user, form_data):
     stage = Stage.query.filter_by(id=stage_id, user_id=user.id).first()
 
-    if not stage: return False, "指定的阶段不存在或无权访问。", None
+    if not stage: return False, "指定的阶段不存在或无权访问。", None, None
 
     try:
         subcategory_id = form_data.get('subcategory_id', type=int)
         if subcategory_id:
             subcategory = SubCategory.query.join(Category).filter(SubCategory.id == subcategory_id,
                                                                   Category.user_id == user.id).first()
-            if not subcategory: return False, "选择了无效的分类。", None
+            if not subcategory: return False, "选择了无效的分类。", None, None
 
         hours_str = form_data.get('duration_hours', '0')
         minutes_str = form_data.get('duration_minutes', '0')
@@ -175,18 +350,25 @@ def add_log_for_stage(stage_id, user, form_data):
         db.session.add(new_log)
 
         db.session.flush()
-        new_log_id = new_log.id
+        new_log_id, log_date, notes, user_id = new_log.id, new_log.log_date, new_log.notes, user.id
+        rollup_service.add_log(user_id, new_log)
+        token_index_service.add_note(user_id, stage.id, notes)
         db.session.commit()
 
-        update_efficiency_for_date(new_log.log_date, stage)
+        day_update = update_efficiency_for_date(log_date, stage)
+        _invalidate_user_caches(user_id, notes_changed=bool(notes))
 
-        return True, '新纪录添加成功！', new_log_id
+        # 提交后实例已过期：一条查询连同分类一起刷新，供调用方直接渲染
+        new_log = db.session.scalars(
+            select(LogEntry).options(joinedload(LogEntry.subcategory).joinedload(SubCategory.category))
+            .where(LogEntry.id == new_log_id)).one()
+        return True, '新纪录添加成功！', new_log, day_update
 
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Add log error: {e}", exc_info=True)
 
-        return False, f'发生错误: {e}', None
+        return False, f'发生错误: {e}', None, None
 
 
 def update_log_for_user(log_id, user, form_data):
@@ -209,6 +391,8 @@ def update_log_for_user(log_id, user, form_data):
         hours = int(hours_str) if hours_str and hours_str.strip() else 0
         minutes = int(minutes_str) if minutes_str and minutes_str.strip() else 0
         total_duration = (hours * 60) + minutes
+        old_minutes, old_weighted = rollup_service.log_totals(log)
+        old_notes = log.notes
 
         log.log_date = new_date
         log.task = form_data.get('task')
@@ -218,12 +402,19 @@ def update_log_for_user(log_id, user, form_data):
         log.mood = form_data.get('mood', type=int)
         log.subcategory_id = subcategory_id
 
+        rollup_service.remove_log(user.id, old_date, old_minutes, old_weighted)
+        rollup_service.add_log(user.id, log)
+        notes_changed = old_notes != log.notes
+        if notes_changed:
+            token_index_service.remove_note(user.id, stage.id, old_notes)
+            token_index_service.add_note(user.id, stage.id, log.notes)
         db.session.commit()
 
         update_efficiency_for_date(new_date, stage)
 
         if old_date != new_date:
             update_efficiency_for_date(old_date, stage)
+        _invalidate_user_caches(user.id, notes_changed=notes_changed)
 
         return True, '记录更新成功！'
     except Exception as e:
@@ -234,21 +425,32 @@ def update_log_for_user(log_id, user, form_data):
 
 def delete_log_for_user(log_id, user):
     log = get_log_entry_for_user(log_id, user)
-    if not log: return False, '未找到要删除的记录或无权访问。'
+    if not log: return False, '未找到要删除的记录或无权访问。', None
+    return delete_log_entry(log, user)
+
+
+def delete_log_entry(log, user):
+    """删除一条已确认归属于 user 的记录，返回 (成功与否, 消息, DayUpdate)。"""
     try:
         stage = log.stage
 
         date_to_update = log.log_date
+        minutes, weighted = rollup_service.log_totals(log)
+        notes = log.notes
+        user_id = user.id
 
         db.session.delete(log)
+        rollup_service.remove_log(user_id, date_to_update, minutes, weighted)
+        token_index_service.remove_note(user_id, stage.id, notes)
         db.session.commit()
 
-        update_efficiency_for_date(date_to_update, stage)
-        return True, '记录已删除。'
+        day_update = update_efficiency_for_date(date_to_update, stage)
+        _invalidate_user_caches(user_id, notes_changed=bool(notes))
+        return True, '记录已删除。', day_update
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Delete log error: {e}", exc_info=True)
-        return False, f'删除时发生错误: {e}'
+        return False, f'删除时发生错误: {e}', None
 
 
 def get_log_entry_for_user(log_id, user):
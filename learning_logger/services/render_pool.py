@@ -0,0 +1,181 @@
+# 文件路径: learning_logger/services/render_pool.py
+"""
+CPU 密集型渲染（词云、matplotlib 导出图）的进程池。
+
+工作进程启动时各自创建一个应用并推入应用上下文，预先加载 jieba 词典、
+matplotlib 与停用词，之后的任务无需再付出这些初始化开销。
+排队任务数有上限，超出时立即抛出 RenderPoolBusy，由请求处理函数转换为 503；
+等待结果超过 RENDER_TIMEOUT 秒则抛出 RenderTimeout。正在运行的任务无法取消，
+因此超时后终止整个进程池，卡住的工作进程及其占用的队列名额随之释放，下次提交时重建。
+RENDER_POOL_WORKERS 为 0 时在当前线程内直接执行（测试环境使用）。
+"""
+import multiprocessing
+import threading
+from itertools import islice
+from concurrent.futures import (FIRST_COMPLETED, Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError,
+                                wait as wait_futures)
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class RenderPoolBusy(Exception):
+    """渲染队列已满。"""
+
+
+class RenderTimeout(Exception):
+    """渲染任务未能在限定时间内完成。"""
+
+
+def _init_worker(config_name):
+    from .. import create_app, preload_heavy_modules
+    app = create_app(config_name)
+    app.app_context().push()
+    if not app.config.get('PRELOAD_HEAVY_MODULES'):
+        preload_heavy_modules(app)
+    from . import wordcloud_service
+    wordcloud_service._load_stopwords()
+
+
+def _ping():
+    return True
+
+
+class _RenderPool:
+    def __init__(self, config_name, max_workers, queue_size, start_method):
+        self.max_workers = max_workers
+        self._slots = threading.BoundedSemaphore(max_workers + queue_size)
+        self._executor = ProcessPoolExecutor(max_workers=max_workers,
+                                             mp_context=multiprocessing.get_context(start_method),
+                                             initializer=_init_worker, initargs=(config_name,))
+        # 预热：让所有工作进程立即启动并完成初始化
+        for _ in range(max_workers):
+            self._executor.submit(_ping)
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise RenderPoolBusy()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        future.render_pool = self
+        return future
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def terminate(self):
+        """强制结束所有工作进程；未完成的任务以 BrokenProcessPool 结束并释放名额。"""
+        processes = list((self._executor._processes or {}).values())
+        for process in processes:
+            process.terminate()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _get_pool(app):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = _RenderPool(app.config.get('CONFIG_NAME', 'default'),
+                                max_workers=app.config['RENDER_POOL_WORKERS'],
+                                queue_size=app.config.get('RENDER_QUEUE_SIZE', 8),
+                                start_method=app.config.get('RENDER_START_METHOD', 'spawn'))
+        return _pool
+
+
+def shutdown():
+    """关闭进程池；下次提交任务时按当前配置重建。"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def _recycle(pool):
+    """终止 pool；若它仍是当前进程池则清空引用，下次提交时按当前配置重建。"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.terminate()
+
+
+def submit(fn, *args):
+    """
+    提交一个渲染任务并返回 Future。fn 与参数必须可被 pickle（模块级函数）。
+    队列已满时抛出 RenderPoolBusy。
+    """
+    app = current_app._get_current_object()
+    if not app.config.get('RENDER_POOL_WORKERS'):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    return _get_pool(app).submit(fn, *args)
+
+
+def _abandon(futures):
+    """取消尚未开始的任务；已在运行的任务无法取消，回收它们所在的进程池。"""
+    stuck = {future.render_pool for future in futures
+             if not future.cancel() and not future.done() and getattr(future, 'render_pool', None)}
+    for pool in stuck:
+        _recycle(pool)
+
+
+def wait(future):
+    """等待任务结果，超过 RENDER_TIMEOUT 秒抛出 RenderTimeout；工作进程崩溃时重建进程池。"""
+    timeout = current_app.config.get('RENDER_TIMEOUT', 30)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        _abandon([future])
+        current_app.logger.warning(f"Render task exceeded {timeout}s; the render pool was recycled.")
+        raise RenderTimeout()
+    except BrokenProcessPool:
+        pool = getattr(future, 'render_pool', None)
+        if pool is not None:
+            current_app.logger.error("Render pool broke; it will be recreated on the next task.")
+            _recycle(pool)
+        raise
+
+
+def run(fn, *args):
+    """提交任务并等待结果。"""
+    return wait(submit(fn, *args))
+
+
+def iter_completed(tasks, window=None):
+    """
+    tasks 为 (名称, fn, 参数元组) 的可迭代对象，按完成顺序逐个产出 (名称, 结果)。
+    同时在途的任务不超过 window 个（默认等于渲染进程数），任务再多也不会占满队列而触发 RenderPoolBusy。
+    每次等待下一个任务完成最多 RENDER_TIMEOUT 秒，超时抛出 RenderTimeout；提前退出时取消尚未开始的任务。
+    """
+    window = window or max(current_app.config.get('RENDER_POOL_WORKERS') or 0, 1)
+    timeout = current_app.config.get('RENDER_TIMEOUT', 30)
+    pending = iter(tasks)
+    in_flight = {}
+    try:
+        while True:
+            for name, fn, args in islice(pending, window - len(in_flight)):
+                in_flight[submit(fn, *args)] = name
+            if not in_flight:
+                return
+            done, _ = wait_futures(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                _abandon(in_flight)
+                current_app.logger.warning(f"Render batch waited {timeout}s without progress; the render pool was recycled.")
+                raise RenderTimeout()
+            for future in done:
+                yield in_flight.pop(future), wait(future)
+    finally:
+        for future in in_flight:
+            future.cancel()
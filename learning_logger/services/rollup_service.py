@@ -0,0 +1,123 @@
+# 文件路径: learning_logger/services/rollup_service.py
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, insert
+
+from .. import db
+from ..helpers import upsert_statement
+from ..models import User, Stage, LogEntry, DailyRollup
+
+DEFAULT_MOOD = 3
+
+rollup_cli = AppGroup('rollup', help='维护每日汇总表 daily_rollup。')
+
+
+def log_totals(log):
+    """返回一条日志对汇总表的贡献: (分钟数, 时长×心情)。"""
+    duration = log.actual_duration or 0
+    return duration, duration * (log.mood or DEFAULT_MOOD)
+
+
+def apply_delta(user_id, log_date, minutes, weighted_mood_sum, entries):
+    """
+    把一次日志变更的增量累加到 (user_id, log_date) 这一行上，不提交事务。
+    记录数归零的行会被删除。
+    """
+    stmt = upsert_statement(DailyRollup)
+    if stmt is not None:
+        stmt = stmt.values(user_id=user_id, log_date=log_date, total_minutes=minutes,
+                           weighted_mood_sum=weighted_mood_sum, entry_count=entries)
+        stmt = stmt.on_conflict_do_update(index_elements=['user_id', 'log_date'], set_={
+            'total_minutes': DailyRollup.total_minutes + stmt.excluded.total_minutes,
+            'weighted_mood_sum': DailyRollup.weighted_mood_sum + stmt.excluded.weighted_mood_sum,
+            'entry_count': DailyRollup.entry_count + stmt.excluded.entry_count,
+        })
+        db.session.execute(stmt)
+    else:
+        rollup = db.session.get(DailyRollup, (user_id, log_date), with_for_update=True)
+        if rollup is None:
+            rollup = DailyRollup(user_id=user_id, log_date=log_date, total_minutes=0, weighted_mood_sum=0,
+                                 entry_count=0)
+            db.session.add(rollup)
+        rollup.total_minutes += minutes
+        rollup.weighted_mood_sum += weighted_mood_sum
+        rollup.entry_count += entries
+        db.session.flush()
+
+    if entries < 0:
+        DailyRollup.query.filter(DailyRollup.user_id == user_id, DailyRollup.log_date == log_date,
+                                 DailyRollup.entry_count <= 0).delete(synchronize_session=False)
+
+
+def add_log(user_id, log):
+    minutes, weighted = log_totals(log)
+    apply_delta(user_id, log.log_date, minutes, weighted, 1)
+
+
+def remove_log(user_id, log_date, minutes, weighted_mood_sum):
+    apply_delta(user_id, log_date, -minutes, -weighted_mood_sum, -1)
+
+
+def _aggregate_from_logs(user_id):
+    """直接从原始日志按天聚合，作为汇总表的“真值”。"""
+    duration = func.coalesce(LogEntry.actual_duration, 0)
+    return db.session.query(
+        LogEntry.log_date,
+        func.sum(duration),
+        func.sum(duration * func.coalesce(LogEntry.mood, DEFAULT_MOOD)),
+        func.count(LogEntry.id)
+    ).join(Stage).filter(Stage.user_id == user_id).group_by(LogEntry.log_date).all()
+
+
+def rebuild_for_user(user_id):
+    """从原始日志重建用户的汇总行，不提交事务。用于导入、删除阶段等批量变更之后。"""
+    DailyRollup.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    rows = [{'user_id': user_id, 'log_date': log_date, 'total_minutes': minutes or 0,
+             'weighted_mood_sum': weighted or 0, 'entry_count': count}
+            for log_date, minutes, weighted, count in _aggregate_from_logs(user_id)]
+    if rows:
+        db.session.execute(insert(DailyRollup), rows)
+    return len(rows)
+
+
+def check_consistency(user_id):
+    """
+    比较汇总表与原始日志，返回所有存在偏差的日期。
+    每项形如 {'log_date', 'expected', 'actual'}，值为 (分钟数, 时长×心情, 记录数)，缺失为 None。
+    """
+    expected = {log_date: (minutes or 0, weighted or 0, count)
+                for log_date, minutes, weighted, count in _aggregate_from_logs(user_id)}
+    actual = {r.log_date: (r.total_minutes, r.weighted_mood_sum, r.entry_count)
+              for r in DailyRollup.query.filter_by(user_id=user_id)}
+    drift = []
+    for log_date in sorted(set(expected) | set(actual)):
+        if expected.get(log_date) != actual.get(log_date):
+            drift.append({'log_date': log_date, 'expected': expected.get(log_date),
+                          'actual': actual.get(log_date)})
+    return drift
+
+
+def get_daily_minutes(user_id):
+    """返回用户每天的总学习分钟数，按日期升序 [(log_date, minutes)]。"""
+    return DailyRollup.query.filter_by(user_id=user_id).with_entities(
+        DailyRollup.log_date, DailyRollup.total_minutes).order_by(DailyRollup.log_date.asc()).all()
+
+
+@rollup_cli.command('check')
+@click.option('--fix', is_flag=True, help='发现偏差时从原始日志重建该用户的汇总行。')
+def check_command(fix):
+    """检查所有用户的汇总表与原始日志是否一致。"""
+    drifted_users = 0
+    for user_id, username in db.session.query(User.id, User.username).order_by(User.id):
+        drift = check_consistency(user_id)
+        if not drift:
+            continue
+        drifted_users += 1
+        click.echo(f"User {username} (ID: {user_id}): {len(drift)} drifted day(s)")
+        for item in drift[:10]:
+            click.echo(f"  {item['log_date']}: expected {item['expected']}, found {item['actual']}")
+        if fix:
+            rebuild_for_user(user_id)
+            db.session.commit()
+            click.echo("  rebuilt from raw logs.")
+    click.echo(f"{drifted_users} user(s) with drift.")
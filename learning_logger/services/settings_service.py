@@ -0,0 +1,50 @@
+# 文件路径: learning_logger/services/settings_service.py
+from flask import g, has_app_context
+
+from .. import db
+from ..cache import UserScopedCache
+from ..models import Setting
+
+settings_cache = UserScopedCache('settings', 'SETTINGS_CACHE_TTL', default_ttl=3600,
+                                 local_ttl_config_key='SETTINGS_LOCAL_CACHE_TTL')
+
+
+def _load_settings(user_id):
+    return dict(db.session.query(Setting.key, Setting.value).filter(Setting.user_id == user_id))
+
+
+def get_user_settings(user_id):
+    """
+    返回用户全部设置 {键: 值}，返回值应视为只读。
+    同一请求内只解析一次；跨请求由版本化缓存保存，命中时不访问数据库。
+    """
+    memo = g.setdefault('_user_settings', {})
+    if user_id not in memo:
+        memo[user_id] = settings_cache.get_or_compute(user_id, ('all',), lambda: _load_settings(user_id))
+    return memo[user_id]
+
+
+def get_user_setting(user_id, key, default=None):
+    return get_user_settings(user_id).get(key, default)
+
+
+def set_user_setting(user_id, key, value):
+    setting = db.session.get(Setting, (key, user_id))
+    if setting:
+        setting.value = value
+    else:
+        db.session.add(Setting(user_id=user_id, key=key, value=value))
+    db.session.commit()
+    invalidate_settings(user_id)
+
+
+def invalidate_settings(user_id):
+    """设置被写入、导入或清空后调用。"""
+    settings_cache.invalidate(user_id)
+    if has_app_context():
+        g.get('_user_settings', {}).pop(user_id, None)
+
+
+def clear_request_memo(exc=None):
+    """请求结束时丢弃请求内的记忆，避免复用的应用上下文把旧值带到下一个请求。"""
+    g.pop('_user_settings', None)
@@ -0,0 +1,69 @@
+# 文件路径: learning_logger/services/stage_timeline.py
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+from ..helpers import get_custom_week_info
+from ..models import Stage
+
+
+@dataclass(frozen=True)
+class StageSpan:
+    """单个阶段在用户时间线上的有效区间。end_date 为 None 表示一直延续到今天。"""
+    stage: Stage
+    start_date: date
+    end_date: date | None
+    week_offset: int
+
+    def effective_end(self, today=None):
+        return self.end_date if self.end_date is not None else (today or date.today())
+
+
+class StageTimeline:
+    """
+    用户全部阶段按起始日期排好序后的共享视图。
+    一个阶段的结束日期为下一个更晚开始的阶段的前一天；week_offset 为
+    阶段起始周相对全局第一周的偏移，可把阶段内的周序号换算成全局周。
+    构建后不再访问数据库。
+    """
+
+    def __init__(self, stages):
+        ordered = sorted(stages, key=lambda s: (s.start_date, s.id or 0))
+        self.global_start_date = ordered[0].start_date if ordered else None
+        spans = []
+        next_start = None
+        for i in range(len(ordered) - 1, -1, -1):
+            stage = ordered[i]
+            # 同一天开始的阶段共享同一个结束日期，与原先 start_date > 的查询语义一致
+            if i + 1 < len(ordered) and ordered[i + 1].start_date > stage.start_date:
+                next_start = ordered[i + 1].start_date
+            end_date = next_start - timedelta(days=1) if next_start else None
+            week_offset = (stage.start_date - self.global_start_date).days // 7
+            spans.append(StageSpan(stage, stage.start_date, end_date, week_offset))
+        self.spans = spans[::-1]
+        self._by_id = {span.stage.id: span for span in self.spans}
+
+    @classmethod
+    def for_user(cls, user_id):
+        return cls(Stage.query.filter_by(user_id=user_id).order_by(Stage.start_date.asc()).all())
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __iter__(self):
+        return iter(self.spans)
+
+    def span_for(self, stage_id):
+        return self._by_id[stage_id]
+
+    def global_week(self, day):
+        """返回某天的全局 (年, 周序号)。"""
+        return get_custom_week_info(day, self.global_start_date)
+
+    def week_label(self, day):
+        year, week_num = self.global_week(day)
+        return f"{year}-W{week_num:02}"
+
+    def global_week_for_stage_week(self, stage_id, week_num):
+        """把阶段内的第 week_num 周换算为全局 (年, 周序号)。"""
+        span = self._by_id[stage_id]
+        return self.global_week(span.start_date + timedelta(weeks=week_num - 1))
@@ -0,0 +1,103 @@
+# 文件路径: learning_logger/services/token_index_service.py
+from collections import Counter
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, insert
+
+from .. import db
+from ..helpers import upsert_statement
+from ..models import User, Stage, LogEntry, NoteTokenFrequency
+
+TOKEN_MAX_LENGTH = 64
+
+token_index_cli = AppGroup('token-index', help='维护词云使用的笔记词频表 note_token_frequency。')
+
+
+def tokenize(notes):
+    """
+    对一条笔记分词并计数。只丢弃单字与超长词，停用词在读取时过滤，
+    这样停用词表更新后无需重建索引。
+    """
+    if not notes or not notes.strip():
+        return Counter()
+    import jieba
+    return Counter(token for token in (t.strip() for t in jieba.cut(notes))
+                   if 1 < len(token) <= TOKEN_MAX_LENGTH)
+
+
+def apply_counts(user_id, stage_id, counts, sign=1):
+    """把一组词频按 sign(+1/-1) 累加到阶段的词频表上，不提交事务。计数归零的行会被删除。"""
+    if not counts:
+        return
+    rows = [{'stage_id': stage_id, 'token': token, 'user_id': user_id, 'count': sign * count}
+            for token, count in counts.items()]
+    stmt = upsert_statement(NoteTokenFrequency)
+    if stmt is not None:
+        stmt = stmt.on_conflict_do_update(index_elements=['stage_id', 'token'], set_={
+            'count': NoteTokenFrequency.count + stmt.excluded.count,
+        })
+        db.session.execute(stmt, rows)
+    else:
+        for row in rows:
+            entry = db.session.get(NoteTokenFrequency, (stage_id, row['token']), with_for_update=True)
+            if entry is None:
+                entry = NoteTokenFrequency(stage_id=stage_id, token=row['token'], user_id=user_id, count=0)
+                db.session.add(entry)
+            entry.count += row['count']
+        db.session.flush()
+
+    if sign < 0:
+        NoteTokenFrequency.query.filter(NoteTokenFrequency.stage_id == stage_id,
+                                        NoteTokenFrequency.token.in_(list(counts)),
+                                        NoteTokenFrequency.count <= 0).delete(synchronize_session=False)
+
+
+def add_note(user_id, stage_id, notes):
+    apply_counts(user_id, stage_id, tokenize(notes))
+
+
+def remove_note(user_id, stage_id, notes):
+    apply_counts(user_id, stage_id, tokenize(notes), sign=-1)
+
+
+def rebuild_for_user(user_id):
+    """从原始笔记重建用户的词频表，不提交事务。用于导入等批量变更之后。"""
+    NoteTokenFrequency.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    per_stage = {}
+    notes = db.session.query(LogEntry.stage_id, LogEntry.notes).join(Stage).filter(
+        Stage.user_id == user_id, LogEntry.notes.isnot(None))
+    for stage_id, note in notes.yield_per(1000):
+        per_stage.setdefault(stage_id, Counter()).update(tokenize(note))
+    rows = [{'stage_id': stage_id, 'token': token, 'user_id': user_id, 'count': count}
+            for stage_id, counts in per_stage.items() for token, count in counts.items()]
+    if rows:
+        db.session.execute(insert(NoteTokenFrequency), rows)
+    return len(rows)
+
+
+def get_frequencies(user_id, stage_id=None):
+    """
+    返回 {词: 次数}；给定 stage_id 时只统计该阶段，否则汇总用户的全部阶段。
+    只读取词频表，不在请求中回填；升级前的历史笔记用 `flask token-index rebuild` 一次性建立。
+    """
+    query = db.session.query(NoteTokenFrequency.token, func.sum(NoteTokenFrequency.count)).filter(
+        NoteTokenFrequency.user_id == user_id)
+    if stage_id:
+        query = query.filter(NoteTokenFrequency.stage_id == stage_id)
+    return dict(query.group_by(NoteTokenFrequency.token).all())
+
+
+@token_index_cli.command('rebuild')
+@click.option('--user-id', type=int, default=None, help='只重建指定用户；默认处理所有用户。')
+def rebuild_command(user_id):
+    """从原始笔记重建词频表（升级后回填历史数据，或修复偏差）。"""
+    from .wordcloud_service import invalidate_wordcloud
+    users = db.session.query(User.id, User.username).order_by(User.id)
+    if user_id is not None:
+        users = users.filter(User.id == user_id)
+    for uid, username in users:
+        rows = rebuild_for_user(uid)
+        db.session.commit()
+        invalidate_wordcloud(uid)
+        click.echo(f"User {username} (ID: {uid}): {rows} token row(s).")
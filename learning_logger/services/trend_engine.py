@@ -0,0 +1,103 @@
+# 文件路径: learning_logger/services/trend_engine.py
+"""
+向量化的移动平均计算，NaN/None 视为缺失值。
+
+所有函数沿最后一个轴计算，因此可以把多条等长序列堆叠成二维数组一次算完。
+"""
+import math
+
+import numpy as np
+
+
+def to_float_array(data):
+    """把包含 None 的序列（或序列的列表）转换为 float 数组，None 变为 NaN。"""
+    if isinstance(data, np.ndarray):
+        return data.astype(float, copy=False)
+    if data and isinstance(data[0], (list, tuple, np.ndarray)):
+        return np.array([to_float_array(row) for row in data], dtype=float)
+    return np.array([np.nan if v is None else v for v in data], dtype=float)
+
+
+def rolling_mean(values, window):
+    """
+    基于累积和的简单移动平均，忽略窗口内的 NaN。
+    结果与输入等长：前 window-1 个位置以及窗口内全为 NaN 的位置为 NaN。
+    """
+    x = to_float_array(values)
+    out = np.full(x.shape, np.nan)
+    n = x.shape[-1]
+    if window < 1 or n < window:
+        return out
+
+    valid = ~np.isnan(x)
+    pad = [(0, 0)] * (x.ndim - 1) + [(1, 0)]
+    csum = np.pad(np.cumsum(np.where(valid, x, 0.0), axis=-1), pad)
+    ccount = np.pad(np.cumsum(valid, axis=-1), pad)
+
+    sums = csum[..., window:] - csum[..., :-window]
+    counts = ccount[..., window:] - ccount[..., :-window]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    means[counts == 0] = np.nan
+    out[..., window - 1:] = means
+    return out
+
+
+def _ema_dense(v, alpha):
+    """不含 NaN 的一维序列的 EMA（y0 = v0）。分块使用闭式解，避免逐元素的 Python 循环。"""
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        return v.copy()
+    # 块长度保证 decay**-block 不超过 1e12，维持数值精度
+    block = max(1, int(12 * math.log(10) / -math.log(decay)))
+    out = np.empty_like(v)
+    prev = v[0]
+    for start in range(0, len(v), block):
+        chunk = v[start:start + block]
+        k = np.arange(1, len(chunk) + 1)
+        growth = decay ** -k
+        out[start:start + len(chunk)] = decay ** k * (prev + alpha * np.cumsum(chunk * growth))
+        prev = out[start + len(chunk) - 1]
+    return out
+
+
+def ema(values, span):
+    """
+    指数移动平均，alpha = 2 / (span + 1)。
+    NaN 不参与更新，其位置沿用上一个有效的 EMA 值；首个有效值之前为 NaN。
+    """
+    x = to_float_array(values)
+    if x.ndim > 1:
+        return np.stack([ema(row, span) for row in x])
+
+    out = np.full(x.shape, np.nan)
+    valid_idx = np.flatnonzero(~np.isnan(x))
+    if valid_idx.size == 0:
+        return out
+
+    dense = _ema_dense(x[valid_idx], 2.0 / (span + 1))
+    # 把稀疏位置上的结果向后填充到后续的 NaN 位置
+    positions = np.maximum.accumulate(np.where(~np.isnan(x), np.arange(len(x)), -1))
+    has_value = positions >= 0
+    rank = np.searchsorted(valid_idx, positions[has_value])
+    out[has_value] = dense[rank]
+    return out
+
+
+def to_chart_list(values, ndigits=2):
+    """转换为 JSON 友好的列表：NaN 变为 None，其余保留 ndigits 位小数。"""
+    return [None if math.isnan(v) else round(v, ndigits) for v in np.asarray(values, dtype=float).tolist()]
+
+
+def sma_series(data, window):
+    """
+    图表使用的 SMA：窗口不足或 window <= 1 时全部为 None。
+    data 可以是单条序列，也可以是多条等长序列的列表（返回对应的列表）。
+    """
+    x = to_float_array(data)
+    if x.size == 0 or window <= 1:
+        return [[None] * x.shape[-1] for _ in range(len(x))] if x.ndim > 1 else [None] * x.shape[-1]
+    means = rolling_mean(x, window)
+    if means.ndim > 1:
+        return [to_chart_list(row) for row in means]
+    return to_chart_list(means)
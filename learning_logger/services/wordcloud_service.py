@@ -1,27 +1,125 @@
+import hashlib
 import io
 import os
 import random
-import jieba
-import numpy as np
+import sys
+import threading
+
+import click
 from flask import current_app
-from PIL import Image
-from wordcloud import WordCloud
+from flask.cli import AppGroup
 
 # 从您的项目中导入实际的模型
-from ..models import Stage, LogEntry
+from ..cache import UserScopedCache
+from . import render_pool, token_index_service
+
+AVAILABLE_MASKS = [
+    'arrow-growth.png', 'bar-chart.png', 'book-open.png', 'brain-profile.png',
+    'code-brackets.png', 'dialogue-bubble.png', 'flask-solid.png', 'gear-solid.png',
+    'graduation-cap.png', 'key-solid.png', 'laptop-solid.png', 'lightbulb-on.png', 'microscope.png',
+    'puzzle-piece.png', 'tree-of-knowledge.png', 'trophy-solid.png'
+]
+
+PALETTES = {
+    'default': ["#4B0082", "#8A2BE2", "#9932CC", "#BA55D3", "#C71585"],
+    'primary_gradient': ["#E0BBE4", "#957DAD", "#D291BC", "#FEC8D8", "#FFDFD3"],
+    'inspiration': ["#FFD700", "#FFA500", "#FF8C00", "#FF4500", "#FF6347"],
+    'calm': ["#B0E0E6", "#ADD8E6", "#87CEEB", "#87CEFA", "#00BFFF"],
+    'forest': ["#90EE90", "#3CB371", "#2E8B57", "#006400", "#556B2F"]
+}
+
+# 缓存两类条目：词频语料及其摘要 ('corpus', 阶段) 与渲染好的 PNG ('png', 摘要, 遮罩, 调色板)
+wordcloud_cache = UserScopedCache('wordcloud', 'WORDCLOUD_CACHE_TTL', default_ttl=24 * 3600,
+                                  max_entries_config_key='WORDCLOUD_CACHE_MAX_ENTRIES')
+
+
+STOPWORDS_FILES = [
+    'cn_stopwords.txt',
+    'baidu_stopwords.txt',
+    'hit_stopwords.txt',
+    'scu_stopwords.txt',
+    'custom_stopwords.txt'
+]
+
+# 进程级的静态资源缓存：停用词为 frozenset，遮罩为只读数组，键为 (遮罩文件, 宽, 高)
+_assets_lock = threading.Lock()
+_stopwords = None
+_mask_arrays = {}
+# 静态资源版本号存放在词云缓存后端中（Redis 后端时各进程共享），本进程已对齐的版本记在 _assets_version
+ASSETS_VERSION_KEY = 'wordcloud:assets:version'
+_assets_version = None
+
+wordcloud_cli = AppGroup('wordcloud', help='词云静态资源维护。')
+
+
+def invalidate_wordcloud(user_id):
+    """用户的笔记发生变化后调用，使语料摘要与已渲染的词云失效。"""
+    wordcloud_cache.invalidate(user_id)
+
+
+def _drop_local_assets():
+    global _stopwords
+    with _assets_lock:
+        _stopwords = None
+        _mask_arrays.clear()
+    # 渲染进程各自持有一份资源，回收进程池后由新进程重新加载
+    render_pool.shutdown()
+
+
+def reload_assets():
+    """
+    停用词或遮罩文件更新后调用：递增共享的资源版本号并立即丢弃本进程的资源。
+    其他进程在下一次生成词云时发现版本变化，各自丢弃旧资源并回收渲染进程池；
+    版本号参与词云 ETag 与缓存键，旧资源渲染的图片不会再被命中。返回新的版本号。
+    """
+    global _assets_version
+    version = wordcloud_cache.backend.incr(ASSETS_VERSION_KEY)
+    _drop_local_assets()
+    _assets_version = version
+    return version
+
+
+def _sync_assets():
+    """与共享的资源版本号对齐，返回当前版本号。"""
+    global _assets_version
+    version = wordcloud_cache.backend.get_counter(ASSETS_VERSION_KEY)
+    if _assets_version is not None and version != _assets_version:
+        current_app.logger.info(f"Word cloud assets changed to version {version}; reloading in this process.")
+        _drop_local_assets()
+    _assets_version = version
+    return version
+
+
+@wordcloud_cli.command('reload-assets')
+def reload_assets_command():
+    """通知所有进程重新加载停用词与遮罩（需要共享的 Redis 缓存后端）。"""
+    if current_app.config.get('CACHE_BACKEND', 'memory') != 'redis':
+        click.echo("Warning: the cache backend is not shared; running servers will not see this reload. "
+                   "Use POST /admin/wordcloud/reload-assets or restart the workers instead.")
+    click.echo(f"Word cloud assets version is now {reload_assets()}.")
+
+
+def asset_stats():
+    """返回静态资源缓存的条目数与大致内存占用（字节）。"""
+    with _assets_lock:
+        stopwords = _stopwords
+        masks = dict(_mask_arrays)
+    stopword_bytes = sys.getsizeof(stopwords) + sum(sys.getsizeof(w) for w in stopwords) if stopwords else 0
+    return {
+        'stopwords': len(stopwords) if stopwords else 0,
+        'stopwords_bytes': stopword_bytes,
+        'masks': len(masks),
+        'masks_bytes': sum(array.nbytes for array in masks.values())
+    }
 
 
 def _load_stopwords():
-    """从静态文件夹加载所有指定的停用词文件。"""
+    """返回所有停用词文件合并后的 frozenset，每个进程只从磁盘读取一次。"""
+    global _stopwords
+    if _stopwords is not None:
+        return _stopwords
     stopwords = set()
-    stopwords_files = [
-        'cn_stopwords.txt',
-        'baidu_stopwords.txt',
-        'hit_stopwords.txt',
-        'scu_stopwords.txt',
-        'custom_stopwords.txt'
-    ]
-    for filename in stopwords_files:
+    for filename in STOPWORDS_FILES:
         # 使用 current_app 上下文来获取正确的路径
         stopwords_path = os.path.join(current_app.static_folder, filename)
         if os.path.exists(stopwords_path):
@@ -29,23 +127,24 @@ def _load_stopwords():
                 stopwords.update([line.strip() for line in f])
         elif current_app:
              current_app.logger.warning(f"Stopwords file not found: {stopwords_path}")
-    return stopwords
+    with _assets_lock:
+        if _stopwords is None:
+            _stopwords = frozenset(stopwords)
+        return _stopwords
 
 
 def _get_mask_image(mask_name='random', width=800, height=800):
     """
     从静态文件夹加载一个指定的或随机的遮罩图片。
     强制将图片缩放到指定尺寸，并自动处理透明背景。
+    处理结果按 (遮罩文件, 宽, 高) 缓存在进程内，返回的数组只读。
     """
+    import numpy as np
+    from PIL import Image
     try:
         # 使用 current_app 上下文来获取正确的路径
         masks_dir = os.path.join(current_app.static_folder, 'images', 'masks')
-        available_masks = [
-            'arrow-growth.png', 'bar-chart.png', 'book-open.png', 'brain-profile.png',
-            'code-brackets.png', 'dialogue-bubble.png', 'flask-solid.png', 'gear-solid.png',
-            'graduation-cap.png', 'key-solid.png', 'laptop-solid.png', 'lightbulb-on.png', 'microscope.png',
-            'puzzle-piece.png', 'tree-of-knowledge.png', 'trophy-solid.png'
-        ]
+        available_masks = AVAILABLE_MASKS
 
         if not available_masks:
             raise FileNotFoundError("No mask images found in the masks directory.")
@@ -62,6 +161,11 @@ def _get_mask_image(mask_name='random', width=800, height=800):
             selected_mask_file = random.choice(available_masks)
             mask_path = os.path.join(masks_dir, selected_mask_file)
 
+        cache_key = (selected_mask_file, width, height)
+        cached = _mask_arrays.get(cache_key)
+        if cached is not None:
+            return cached
+
         with Image.open(mask_path) as original_mask_img:
             # **核心修改：强制将图片缩放到目标尺寸，忽略原始宽高比**
             resized_img = original_mask_img.resize((width, height), Image.Resampling.LANCZOS)
@@ -75,7 +179,10 @@ def _get_mask_image(mask_name='random', width=800, height=800):
             else:
                 final_mask_img = resized_img.convert('RGB')
 
-        return np.array(final_mask_img)
+        mask_array = np.array(final_mask_img)
+        mask_array.setflags(write=False)
+        with _assets_lock:
+            return _mask_arrays.setdefault(cache_key, mask_array)
 
     except Exception as e:
         if current_app:
@@ -88,14 +195,7 @@ def get_color_func(palette='default'):
     """
     根据调色板名称返回一个自定义的颜色函数。
     """
-    palettes = {
-        'default': ["#4B0082", "#8A2BE2", "#9932CC", "#BA55D3", "#C71585"],
-        'primary_gradient': ["#E0BBE4", "#957DAD", "#D291BC", "#FEC8D8", "#FFDFD3"],
-        'inspiration': ["#FFD700", "#FFA500", "#FF8C00", "#FF4500", "#FF6347"],
-        'calm': ["#B0E0E6", "#ADD8E6", "#87CEEB", "#87CEFA", "#00BFFF"],
-        'forest': ["#90EE90", "#3CB371", "#2E8B57", "#006400", "#556B2F"]
-    }
-    colors = palettes.get(palette, palettes['default'])
+    colors = PALETTES.get(palette, PALETTES['default'])
 
     def color_func(word, font_size, position, orientation, random_state=None, **kwargs):
         return random.choice(colors)
@@ -103,27 +203,31 @@ def get_color_func(palette='default'):
     return color_func
 
 
-def generate_wordcloud_for_user(user, stage_id=None, mask_name='random', palette='default'):
+def _load_corpus(user, stage_id=None):
     """
-    为用户生成一个美化的词云图片。
+    从词频表读取语料，返回 (SHA-256 摘要, {词: 次数})；没有任何词时返回 (None, {})。
+    结果随笔记变更而失效。
     """
-    # **错误修复：将 LogEntry.query 修改为 LogEntry.query()**
-    query = LogEntry.query.join(Stage).filter(Stage.user_id == user.id)
-    if stage_id and stage_id != 'all':
-        query = query.filter(Stage.id == stage_id)
 
-    notes_list = [log.notes for log in query.all() if log.notes and log.notes.strip()]
-    if not notes_list:
-        return None
+    def compute():
+        frequencies = token_index_service.get_frequencies(user.id, stage_id)
+        if not frequencies:
+            return None, {}
+        digest = hashlib.sha256()
+        for token, count in sorted(frequencies.items()):
+            digest.update(f"{token}\0{count}\0".encode('utf-8'))
+        return digest.hexdigest(), frequencies
+
+    return wordcloud_cache.get_or_compute(user.id, ('corpus', stage_id or 'all'), compute)
 
-    stopwords = _load_stopwords()
-    full_text = ' '.join(notes_list)
-    word_list = jieba.cut(full_text)
 
-    filtered_words = [word for word in word_list if word not in stopwords and len(word) > 1]
-    if not filtered_words:
+def _render_wordcloud_png(frequencies, mask_name, palette):
+    """按词频渲染词云，返回 PNG 字节；过滤停用词后无可用词或渲染失败时返回 None。"""
+    from wordcloud import WordCloud
+    stopwords = _load_stopwords()
+    filtered = {word: count for word, count in frequencies.items() if word not in stopwords}
+    if not filtered:
         return None
-    segmented_text = ' '.join(filtered_words)
 
     # 使用 current_app 上下文来获取正确的路径
     font_path = os.path.join(current_app.static_folder, 'fonts', 'NotoSansSC-Regular.ttf')
@@ -152,14 +256,49 @@ def generate_wordcloud_for_user(user, stage_id=None, mask_name='random', palette
             collocations=False,
             margin=10,
             max_words=250
-        ).generate(segmented_text)
+        ).generate_from_frequencies(filtered)
 
         img_buffer = io.BytesIO()
         wordcloud.to_image().save(img_buffer, format='PNG')
-        img_buffer.seek(0)
-        return img_buffer
+        return img_buffer.getvalue()
 
     except Exception as e:
         if current_app:
             current_app.logger.error(f"Failed to generate word cloud: {e}", exc_info=True)
         return None
+
+
+def prepare_wordcloud(user, stage_id=None, mask_name='random', palette='default'):
+    """
+    解析一次词云请求，返回 (etag, render)。
+    etag 由语料摘要、阶段、遮罩与调色板共同决定；render() 返回（可能来自缓存的）PNG 字节，
+    未命中缓存时在渲染进程池中生成，可能抛出 RenderPoolBusy / RenderTimeout。
+    用户没有任何可用的词时返回 (None, None)。'random' 遮罩在这里先选定具体文件，再参与缓存键。
+    """
+    digest, frequencies = _load_corpus(user, stage_id)
+    if digest is None:
+        return None, None
+
+    if mask_name not in AVAILABLE_MASKS:
+        mask_name = random.choice(AVAILABLE_MASKS)
+    if palette not in PALETTES:
+        palette = 'default'
+    assets_version = _sync_assets()
+    etag = hashlib.sha256(
+        f"{digest}:{stage_id or 'all'}:{mask_name}:{palette}:{assets_version}".encode()).hexdigest()[:32]
+
+    def render():
+        return wordcloud_cache.get_or_compute(
+            user.id, ('png', etag),
+            lambda: render_pool.run(_render_wordcloud_png, frequencies, mask_name, palette))
+
+    return etag, render
+
+
+def generate_wordcloud_for_user(user, stage_id=None, mask_name='random', palette='default'):
+    """
+    为用户生成一个美化的词云图片。
+    """
+    _, render = prepare_wordcloud(user, stage_id, mask_name, palette)
+    png = render() if render else None
+    return io.BytesIO(png) if png else None
@@ -0,0 +1,41 @@
+"""Add composite indexes for hot queries
+
+Revision ID: a7c3e9d41b25
+Revises: fd9a1b2c3e4f
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9d41b25'
+down_revision = 'fd9a1b2c3e4f'
+branch_labels = None
+depends_on = None
+
+# (表名, 索引名, 列) —— 与 record_service、chart_service 和 main.index 中的过滤/排序条件一一对应。
+INDEXES = [
+    ('log_entry', 'ix_log_entry_stage_id_log_date', ['stage_id', 'log_date']),
+    ('log_entry', 'ix_log_entry_subcategory_id', ['subcategory_id']),
+    ('daily_data', 'ix_daily_data_stage_id_log_date', ['stage_id', 'log_date']),
+    ('weekly_data', 'ix_weekly_data_stage_id_year_week_num', ['stage_id', 'year', 'week_num']),
+    ('stage', 'ix_stage_user_id_start_date', ['user_id', 'start_date']),
+    ('todo', 'ix_todo_user_id_is_completed', ['user_id', 'is_completed']),
+    ('countdown_event', 'ix_countdown_event_user_id_target_datetime_utc', ['user_id', 'target_datetime_utc']),
+    ('milestone', 'ix_milestone_user_id_event_date', ['user_id', 'event_date']),
+    ('daily_plan_item', 'ix_daily_plan_item_user_id_plan_date', ['user_id', 'plan_date']),
+]
+
+
+def upgrade():
+    for table_name, index_name, columns in INDEXES:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.create_index(index_name, columns, unique=False)
+
+
+def downgrade():
+    for table_name, index_name, _ in reversed(INDEXES):
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.drop_index(index_name)
@@ -0,0 +1,44 @@
+"""Add daily_rollup table maintained by the record service
+
+Revision ID: b81f4c2d9e07
+Revises: a7c3e9d41b25
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b81f4c2d9e07'
+down_revision = 'a7c3e9d41b25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_rollup',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('log_date', sa.Date(), nullable=False),
+    sa.Column('total_minutes', sa.Integer(), nullable=False),
+    sa.Column('weighted_mood_sum', sa.Integer(), nullable=False),
+    sa.Column('entry_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'log_date')
+    )
+
+    # 从现有日志回填汇总表
+    op.execute("""
+        INSERT INTO daily_rollup (user_id, log_date, total_minutes, weighted_mood_sum, entry_count)
+        SELECT stage.user_id,
+               log_entry.log_date,
+               SUM(COALESCE(log_entry.actual_duration, 0)),
+               SUM(COALESCE(log_entry.actual_duration, 0) * COALESCE(log_entry.mood, 3)),
+               COUNT(log_entry.id)
+        FROM log_entry JOIN stage ON log_entry.stage_id = stage.id
+        GROUP BY stage.user_id, log_entry.log_date
+    """)
+
+
+def downgrade():
+    op.drop_table('daily_rollup')
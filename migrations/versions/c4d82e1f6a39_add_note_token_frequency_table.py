@@ -0,0 +1,38 @@
+"""Add note_token_frequency table for incremental word cloud frequencies
+
+Revision ID: c4d82e1f6a39
+Revises: b81f4c2d9e07
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d82e1f6a39'
+down_revision = 'b81f4c2d9e07'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # 分词依赖 jieba，无法在 SQL 中回填；升级后运行 `flask token-index rebuild` 为已有笔记建立词频
+    op.create_table('note_token_frequency',
+    sa.Column('stage_id', sa.Integer(), nullable=False),
+    sa.Column('token', sa.String(length=64), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['stage_id'], ['stage.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('stage_id', 'token')
+    )
+    with op.batch_alter_table('note_token_frequency', schema=None) as batch_op:
+        batch_op.create_index('ix_note_token_frequency_user_id', ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('note_token_frequency', schema=None) as batch_op:
+        batch_op.drop_index('ix_note_token_frequency_user_id')
+
+    op.drop_table('note_token_frequency')
@@ -0,0 +1,39 @@
+"""Add recalc_job table so import recalculation progress is shared across workers
+
+Revision ID: d5e93a7b0c12
+Revises: c4d82e1f6a39
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5e93a7b0c12'
+down_revision = 'c4d82e1f6a39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recalc_job',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('recalc_job', schema=None) as batch_op:
+        batch_op.create_index('ix_recalc_job_user_id', ['user_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recalc_job', schema=None) as batch_op:
+        batch_op.drop_index('ix_recalc_job_user_id')
+
+    op.drop_table('recalc_job')
@@ -120,6 +120,9 @@ document.addEventListener('DOMContentLoaded', function () {
                 document.getElementById('kpi-avg-time').textContent = data.kpis.avg_daily_formatted || 'N/A';
                 document.getElementById('kpi-efficiency-star').textContent = data.kpis.efficiency_star || 'N/A';
                 document.getElementById('kpi-weekly-trend').textContent = data.kpis.weekly_trend || 'N/A';
+                document.getElementById('kpi-current-streak').textContent = `${data.kpis.current_streak ?? 0} 天`;
+                document.getElementById('kpi-longest-streak').textContent = `${data.kpis.longest_streak ?? 0} 天`;
+                document.getElementById('kpi-avg-30d').textContent = data.kpis.avg_30d_formatted || 'N/A';
                 updateCharts('weekly');
             } catch (error) {
                 console.error('Error fetching trend data:', error);
@@ -81,10 +81,9 @@ const handleAjaxFormSubmit = async (form) => {
             if (result.updates) {
                 for (const key in result.updates) {
                     const updateInfo = result.updates[key];
-                    const targetElement = document.querySelector(updateInfo.target_id);
-                    if (targetElement) {
+                    document.querySelectorAll(updateInfo.target_id).forEach(targetElement => {
                         targetElement.textContent = updateInfo.value;
-                    }
+                    });
                 }
             }
 
@@ -1,7 +1,11 @@
 # tests/conftest.py
 
+from datetime import date
+
 import pytest
+from flask import g
 from learning_logger import create_app, db as _db
+from learning_logger.models import User, Stage
 
 @pytest.fixture(scope='session')
 def app():
@@ -44,4 +48,63 @@ def db(app):
 
         # 在测试结束后，清理会话并删除所有表
         _db.session.remove()
-        _db.drop_all()
\ No newline at end of file
+        _db.drop_all()
+
+@pytest.fixture(scope='function')
+def make_user(db):
+    """
+    返回一个创建并提交用户的函数，邮箱为 用户名@example.com。
+    """
+    def _make_user(username='tester', email=None):
+        user = User(username=username, email=email or f'{username}@example.com')
+        user.set_password('pw')
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return _make_user
+
+@pytest.fixture(scope='function')
+def user(make_user):
+    """
+    一个已保存的普通用户。
+    """
+    return make_user()
+
+@pytest.fixture(scope='function')
+def make_stage(db, user):
+    """
+    返回一个为用户（默认 user）创建并提交阶段的函数。
+    """
+    def _make_stage(start_date=date(2024, 1, 1), name='阶段', owner=None):
+        stage = Stage(name=name, start_date=start_date, user_id=(owner or user).id)
+        db.session.add(stage)
+        db.session.commit()
+        return stage
+    return _make_stage
+
+@pytest.fixture(scope='function')
+def stage(make_stage):
+    """
+    user 名下从 2024-01-01 开始的一个阶段。
+    """
+    return make_stage()
+
+@pytest.fixture(scope='function')
+def login(client):
+    """
+    返回一个让 client 以指定用户身份登录的函数。
+    测试中各请求复用同一个应用上下文，先清掉 Flask-Login 记在 g 上的用户，下一次请求才会按会话重新加载。
+    """
+    def _login(user):
+        g.pop('_login_user', None)
+        with client.session_transaction() as sess:
+            sess['_user_id'] = str(user.id)
+        return client
+    return _login
+
+@pytest.fixture(scope='function')
+def logged_in_client(login, user):
+    """
+    以 user 身份登录的测试客户端。
+    """
+    return login(user)
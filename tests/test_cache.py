@@ -0,0 +1,103 @@
+# tests/test_cache.py
+import time
+
+from werkzeug.datastructures import MultiDict
+
+from learning_logger.cache import LRUCache, MISSING, RedisCache, UserScopedCache
+from learning_logger.services import chart_service, record_service
+
+
+def test_lru_cache_evicts_least_recently_used_and_expired_entries(monkeypatch):
+    cache = LRUCache(max_entries=2, ttl=10)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is MISSING
+
+    clock = [1000.0]
+    monkeypatch.setattr('learning_logger.cache.time.monotonic', lambda: clock[0])
+    cache.set('d', 4)
+    clock[0] += 11
+    assert cache.get('d') is MISSING
+
+
+class StubRedis:
+    """只实现 RedisCache 用到的命令（get/set ex/incr/delete），值与真实客户端一样以 bytes 返回。"""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, key):
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self.store[key]
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        self.store[key] = (value, time.monotonic() + ex if ex else None)
+
+    def incr(self, key):
+        value = int(self.get(key) or 0) + 1
+        self.store[key] = (str(value).encode(), None)
+        return value
+
+    def delete(self, key):
+        self.store.pop(key, None)
+
+
+def test_redis_backend_shares_invalidation_between_processes(app, monkeypatch):
+    """
+    GIVEN two user-scoped caches (as in two gunicorn workers) on the same Redis-style client
+    WHEN one computes a value and the other invalidates the user
+    THEN the value round-trips through pickle, is shared, and the invalidation is seen by both
+    """
+    client = StubRedis()
+    monkeypatch.setitem(app.config, 'CACHE_BACKEND', 'redis')
+    monkeypatch.setitem(app.config, 'CACHE_REDIS_CLIENT', client)
+    worker_a = UserScopedCache('shared', 'CHART_CACHE_TTL')
+    worker_b = UserScopedCache('shared', 'CHART_CACHE_TTL')
+    assert isinstance(worker_a.backend, RedisCache)
+
+    computed = []
+    compute = lambda: computed.append(1) or {'minutes': [30, 45]}
+    assert worker_a.get_or_compute(7, ('trend',), compute) == {'minutes': [30, 45]}
+    assert worker_b.get_or_compute(7, ('trend',), compute) == {'minutes': [30, 45]}
+    assert len(computed) == 1
+
+    worker_b.invalidate(7)
+    worker_a.get_or_compute(7, ('trend',), compute)
+    assert len(computed) == 2
+    assert all(key.startswith('learning_logger:shared:') for key in client.store)
+
+
+def test_chart_data_is_cached_until_a_log_is_written(app, db, user, stage, monkeypatch):
+    """
+    GIVEN the in-memory chart cache
+    WHEN chart data is requested twice and then a log is added through record_service
+    THEN the second request is a hit and the write makes the next request recompute
+    """
+    monkeypatch.setitem(app.config, 'CACHE_BACKEND', 'memory')
+    chart_service.chart_cache.reset()
+
+    try:
+        first, _ = chart_service.get_chart_data_for_user(user)
+        second, _ = chart_service.get_chart_data_for_user(user)
+        assert second is first
+        assert first['has_data'] is False
+
+        with app.test_request_context():
+            success, _, _, _ = record_service.add_log_for_stage(stage.id, user, MultiDict({
+                'log_date': '2024-01-02', 'task': '复习', 'duration_minutes': '30', 'mood': '4'}))
+        assert success
+
+        third, _ = chart_service.get_chart_data_for_user(user)
+        assert third['has_data'] is True
+        stats = chart_service.chart_cache.stats_dict()
+        assert (stats['hits'], stats['misses'], stats['invalidations']) == (1, 2, 1)
+    finally:
+        chart_service.chart_cache.reset()
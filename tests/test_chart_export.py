@@ -0,0 +1,143 @@
+# tests/test_chart_export.py
+import io
+import zipfile
+from datetime import date, timedelta
+
+from flask import g
+
+from learning_logger.models import Category, SubCategory, LogEntry
+from learning_logger.services import rollup_service
+
+
+def test_export_charts_zips_all_rendered_images(db, user, make_stage, logged_in_client):
+    """
+    GIVEN a user with categorised logs in two stages
+    WHEN charts are exported as SVG with per-stage category images
+    THEN the ZIP holds the summaries plus one category image per stage with data
+    """
+    category = Category(name='数学', user_id=user.id)
+    db.session.add(category)
+    db.session.flush()
+    sub = SubCategory(name='线代', category_id=category.id)
+    db.session.add(sub)
+    start = date.today() - timedelta(days=20)
+    first = make_stage(start, name='一')
+    second = make_stage(start + timedelta(days=10), name='二')
+    make_stage(start + timedelta(days=15), name='空')
+    for stage in (first, second):
+        db.session.add(LogEntry(stage_id=stage.id, log_date=stage.start_date, task='t', actual_duration=90,
+                                subcategory_id=sub.id))
+    db.session.flush()
+    rollup_service.rebuild_for_user(user.id)
+    db.session.commit()
+
+    response = logged_in_client.get('/charts/export?format=svg&per_stage=1')
+
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+        names = set(zf.namelist())
+        assert names == {'trends_summary.svg', 'category_summary.svg',
+                         f'category_stage_{first.id}.svg', f'category_stage_{second.id}.svg'}
+        assert zf.read('trends_summary.svg').lstrip().startswith(b'<?xml')
+
+
+def test_export_charts_with_more_stages_than_render_slots(app, db, user, make_stage, logged_in_client, monkeypatch):
+    """
+    GIVEN a one-worker render pool with no queue slots and a user with four stages of data
+    WHEN charts are exported with per-stage images
+    THEN jobs are submitted a window at a time and every image is exported instead of failing as busy
+    """
+    from learning_logger.services import render_pool
+    monkeypatch.setitem(app.config, 'RENDER_POOL_WORKERS', 1)
+    monkeypatch.setitem(app.config, 'RENDER_QUEUE_SIZE', 0)
+    render_pool.shutdown()
+
+    category = Category(name='数学', user_id=user.id)
+    db.session.add(category)
+    db.session.flush()
+    sub = SubCategory(name='线代', category_id=category.id)
+    db.session.add(sub)
+    start = date.today() - timedelta(days=40)
+    stages = [make_stage(start + timedelta(days=10 * i), name=f'阶段{i}') for i in range(4)]
+    for stage in stages:
+        db.session.add(LogEntry(stage_id=stage.id, log_date=stage.start_date, task='t', actual_duration=60,
+                                subcategory_id=sub.id))
+    db.session.flush()
+    rollup_service.rebuild_for_user(user.id)
+    db.session.commit()
+
+    try:
+        response = logged_in_client.get('/charts/export?format=png&quality=preview&per_stage=1')
+    finally:
+        render_pool.shutdown()
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(response.data)) as zf:
+        assert set(zf.namelist()) == {'trends_summary.png', 'category_summary.png',
+                                      *(f'category_stage_{stage.id}.png' for stage in stages)}
+
+
+def test_chart_images_use_fingerprinted_immutable_urls(app, db, user, make_stage, logged_in_client, monkeypatch):
+    """
+    GIVEN a user with logs and the in-memory image cache
+    WHEN a single chart is requested through its latest URL and then anonymously through the signed URLs
+    THEN it is rendered once, served publicly with a long immutable Cache-Control, tampered URLs are rejected
+         and stale fingerprints redirect
+    """
+    from learning_logger.services import chart_plotter, chart_service
+    monkeypatch.setitem(app.config, 'CACHE_BACKEND', 'memory')
+    chart_service.chart_image_cache.reset()
+    chart_service.chart_cache.reset()
+    renders = []
+    real_render = chart_plotter.render_single_chart
+    monkeypatch.setattr(chart_plotter, 'render_single_chart',
+                        lambda *args: renders.append(args[0]) or real_render(*args))
+
+    stage = make_stage(date.today() - timedelta(days=10), name='一')
+    db.session.add(LogEntry(stage_id=stage.id, log_date=stage.start_date, task='t', actual_duration=60))
+    db.session.flush()
+    rollup_service.rebuild_for_user(user.id)
+    db.session.commit()
+
+    try:
+        latest = logged_in_client.get('/charts/image/weekly_duration.png')
+        assert latest.status_code == 302
+        image_url = latest.headers['Location']
+        urls = logged_in_client.get('/charts/api/image-urls').json['weekly_duration']
+        assert urls['url'].endswith(image_url)
+
+        # 签名地址无需登录即可访问，可以嵌入邮件与外部仪表盘；
+        # 测试中请求复用同一个应用上下文，需丢掉 Flask-Login 留在 g 中的当前用户
+        g.pop('_login_user', None)
+        anonymous = app.test_client()
+        first = anonymous.get(image_url)
+        second = anonymous.get(image_url)
+        assert first.status_code == second.status_code == 200
+        assert first.data.startswith(b'\x89PNG') and second.data == first.data
+        cache_control = first.headers['Cache-Control']
+        assert 'public' in cache_control and 'immutable' in cache_control and 'max-age=31536000' in cache_control
+        assert renders == ['weekly_duration']
+
+        dashboard = anonymous.get(urls['latest_url'])
+        assert dashboard.status_code == 302 and dashboard.headers['Location'].endswith(image_url)
+        assert 'no-store' in dashboard.headers['Cache-Control']
+
+        # 篡改用户、类型或签名都会被拒绝
+        assert anonymous.get(image_url.replace(f'/image/{user.id}/', f'/image/{user.id + 1}/')).status_code == 404
+        assert anonymous.get(image_url.replace('weekly_duration', 'daily_duration')).status_code == 404
+        assert anonymous.get(image_url.split('?')[0]).status_code == 404
+        login_redirect = anonymous.get('/charts/image/weekly_duration.png')
+        assert login_redirect.status_code == 302 and '/auth/' in login_redirect.headers['Location']
+        g.pop('_login_user', None)
+
+        db.session.add(LogEntry(stage_id=stage.id, log_date=date.today(), task='t', actual_duration=30))
+        rollup_service.rebuild_for_user(user.id)
+        db.session.commit()
+        chart_service.invalidate_chart_data(user.id)
+        stale = anonymous.get(image_url)
+        assert stale.status_code == 302 and stale.headers['Location'] != image_url
+        assert logged_in_client.get('/charts/image/unknown.png').status_code == 404
+    finally:
+        chart_service.chart_image_cache.reset()
+        chart_service.chart_cache.reset()
@@ -0,0 +1,57 @@
+# tests/test_chart_service.py
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from learning_logger.models import LogEntry, DailyData
+from learning_logger.services import chart_service, rollup_service
+
+
+def test_calculate_kpis_uses_a_single_statement(db, user, stage):
+    """
+    GIVEN a user with logs in this week, last week and an older streak
+    WHEN KPIs are calculated from the daily rollup
+    THEN all values come from one SQL statement and match the hand-computed figures
+    """
+    today = date(2024, 5, 15)  # 周三
+    offsets = [0, 1, 2, 7, 8, 40, 41, 42, 43, 44]
+    for offset in offsets:
+        db.session.add(LogEntry(stage_id=stage.id, log_date=today - timedelta(days=offset), task='t',
+                                actual_duration=60 + offset, mood=3))
+    db.session.add_all([DailyData(stage_id=stage.id, log_date=today, efficiency=None),
+                        DailyData(stage_id=stage.id, log_date=today - timedelta(days=7), efficiency=8.25)])
+    db.session.flush()
+    rollup_service.rebuild_for_user(user.id)
+    db.session.commit()
+    daily_minutes = rollup_service.get_daily_minutes(user.id)
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        kpis = chart_service._calculate_kpis(user, daily_minutes, today=today)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert len(statements) == 1
+    total = sum(60 + o for o in offsets)
+    this_week, last_week = 60 + 61 + 62, 67 + 68
+    assert kpis['avg_daily_minutes'] == round(total / len(offsets), 1)
+    assert kpis['weekly_trend'] == f"+{(this_week - last_week) / last_week * 100:.0f}%"
+    assert kpis['efficiency_star'] == '2024-05-08 (效率: 8.2)'
+    assert kpis['current_streak'] == 3
+    assert kpis['longest_streak'] == 5
+    assert kpis['avg_30d_minutes'] == round((this_week + last_week) / 30, 1)
+
+
+def test_calculate_streaks_counts_from_yesterday():
+    """
+    GIVEN log dates ending yesterday, and ones ending two days ago
+    WHEN streaks are calculated
+    THEN the current streak only survives when yesterday was logged
+    """
+    today = date(2024, 5, 15)
+    dates = [today - timedelta(days=o) for o in (5, 3, 2, 1)]
+    assert chart_service._calculate_streaks(dates, today) == (3, 3)
+    assert chart_service._calculate_streaks(dates[:-1], today) == (0, 2)
+    assert chart_service._calculate_streaks([], today) == (0, 0)
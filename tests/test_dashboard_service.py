@@ -0,0 +1,79 @@
+# tests/test_dashboard_service.py
+from datetime import date, datetime, timedelta
+
+import pytz
+from sqlalchemy import event
+
+from learning_logger.models import Todo, Milestone, DailyPlanItem, CountdownEvent, DailyRollup
+from learning_logger.services import dashboard_service
+
+
+def test_summary_matches_per_counter_queries_in_one_statement(db, user, make_user, make_stage):
+    """
+    GIVEN a user with logs, todos, milestones, plans and countdowns (plus another user's data)
+    WHEN the dashboard summary is computed
+    THEN every counter matches its own query and the whole summary takes a single statement
+    """
+    today = date.today()
+    now_utc = datetime.now(pytz.utc)
+    other = make_user('other')
+    make_stage(today - timedelta(days=10))
+    db.session.add_all([
+        DailyRollup(user_id=user.id, log_date=today, total_minutes=95, weighted_mood_sum=0, entry_count=2),
+        DailyRollup(user_id=user.id, log_date=today - timedelta(days=1), total_minutes=40, weighted_mood_sum=0,
+                    entry_count=1),
+        DailyRollup(user_id=other.id, log_date=today, total_minutes=500, weighted_mood_sum=0, entry_count=1),
+        Todo(content='a', user_id=user.id), Todo(content='b', user_id=user.id),
+        Todo(content='c', user_id=user.id, is_completed=True), Todo(content='d', user_id=other.id),
+        Milestone(title='m', user_id=user.id),
+        DailyPlanItem(content='p1', plan_date=today, user_id=user.id, is_completed=True),
+        DailyPlanItem(content='p2', plan_date=today, user_id=user.id),
+        DailyPlanItem(content='p3', plan_date=today - timedelta(days=1), user_id=user.id),
+        CountdownEvent(title='过去', target_datetime_utc=now_utc - timedelta(days=1), user_id=user.id),
+        CountdownEvent(title='较远', target_datetime_utc=now_utc + timedelta(days=30), user_id=user.id),
+        CountdownEvent(title='最近', target_datetime_utc=now_utc + timedelta(days=3), user_id=user.id),
+        CountdownEvent(title='别人', target_datetime_utc=now_utc + timedelta(days=1), user_id=other.id),
+    ])
+    db.session.commit()
+    user_id = user.id
+
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        summary = dashboard_service.get_summary(user_id, today=today, now_utc=now_utc)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    assert len(statements) == 1
+    title, target = summary.pop('next_countdown')
+    assert title == '最近' and (target - now_utc).days == 3
+    assert summary == {'today_minutes': 95, 'pending_todos': 2, 'milestones': 1,
+                       'plans_total': 2, 'plans_completed': 1}
+
+    empty = dashboard_service.get_summary(make_user('empty').id)
+    assert empty['next_countdown'] is None and empty['today_minutes'] == 0
+
+
+def test_dashboard_summary_is_cached_until_a_todo_changes(app, logged_in_client, db, monkeypatch):
+    """
+    GIVEN the in-memory dashboard cache and a logged-in user
+    WHEN the dashboard is loaded twice, a todo is added, and it is loaded again
+    THEN the second load is a cache hit and the new todo is visible on the third
+    """
+    monkeypatch.setitem(app.config, 'CACHE_BACKEND', 'memory')
+    dashboard_service.dashboard_cache.reset()
+
+    try:
+        assert '没有待办事项' in logged_in_client.get('/').get_data(as_text=True)
+        logged_in_client.get('/')
+        logged_in_client.post('/todo/add', data={'content': '写周报'})
+        assert '您有 1 个待办事项' in logged_in_client.get('/').get_data(as_text=True)
+
+        stats = dashboard_service.dashboard_cache.stats_dict()
+        assert (stats['hits'], stats['misses'], stats['invalidations']) == (1, 2, 1)
+    finally:
+        dashboard_service.dashboard_cache.reset()
@@ -0,0 +1,77 @@
+# tests/test_data_service.py
+import io
+import json
+import zipfile
+from datetime import date
+
+from learning_logger.models import Stage, Category, SubCategory, LogEntry
+from learning_logger.services import data_service
+
+
+def test_streaming_export_produces_valid_archive(app, db, user, stage, tmp_path, monkeypatch):
+    """
+    GIVEN a user with a stage, a category tree and some logs
+    WHEN the export is streamed chunk by chunk
+    THEN the chunks form a readable ZIP whose JSON files hold exactly that user's rows
+    """
+    monkeypatch.setitem(app.config, 'MILESTONE_UPLOADS', str(tmp_path))
+    category = Category(name='数学', user_id=user.id)
+    db.session.add(category)
+    db.session.flush()
+    sub = SubCategory(name='线代', category_id=category.id)
+    db.session.add(sub)
+    db.session.flush()
+    for day in range(1, 4):
+        db.session.add(LogEntry(stage_id=stage.id, log_date=date(2024, 1, day), task=f'任务{day}',
+                                actual_duration=30, subcategory_id=sub.id))
+    db.session.commit()
+    (tmp_path / str(user.id)).mkdir()
+    (tmp_path / str(user.id) / 'cert.png').write_bytes(b'\x89PNG' * 50000)
+
+    chunks = list(data_service.iter_export_zip(user))
+
+    assert all(chunks)
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as zf:
+        logs = json.loads(zf.read('data/log_entry.json'))
+        subcategories = json.loads(zf.read('data/sub_category.json'))
+        todos = json.loads(zf.read('data/todo.json'))
+        attachment = zf.read('attachments/cert.png')
+    assert [log['task'] for log in logs] == ['任务1', '任务2', '任务3']
+    assert subcategories == [sub.to_dict()]
+    assert todos == []
+    assert attachment == b'\x89PNG' * 50000
+
+
+def test_import_remaps_ids_into_populated_database(app, db, make_user, make_stage, tmp_path, monkeypatch):
+    """
+    GIVEN a legacy indented backup whose primary keys collide with rows of another user
+    WHEN it is imported for a second user
+    THEN every row gets a fresh id and the foreign keys follow the new ids
+    """
+    monkeypatch.setitem(app.config, 'MILESTONE_UPLOADS', str(tmp_path))
+    owner, importer = make_user('owner'), make_user('importer')
+    existing_stage = make_stage(date(2023, 1, 1), name='已有阶段', owner=owner)
+
+    backup = io.BytesIO()
+    with zipfile.ZipFile(backup, 'w') as zf:
+        zf.writestr('data/stage.json', json.dumps([
+            {'id': existing_stage.id, 'name': '导入阶段', 'start_date': '2024-01-01', 'user_id': 99}], indent=4))
+        zf.writestr('data/category.json', json.dumps([{'id': 7, 'name': '数学', 'user_id': 99}], indent=4))
+        zf.writestr('data/sub_category.json', json.dumps([{'id': 8, 'name': '线代', 'category_id': 7}], indent=4))
+        zf.writestr('data/log_entry.json', json.dumps([
+            {'id': 1, 'log_date': '2024-01-02', 'task': '复习', 'actual_duration': 45, 'mood': 4,
+             'stage_id': existing_stage.id, 'subcategory_id': 8},
+            {'id': 2, 'log_date': '2024-01-03', 'task': '孤立记录', 'actual_duration': 10,
+             'stage_id': 12345, 'subcategory_id': None}], indent=4))
+    backup.seek(0)
+
+    success, _ = data_service.import_data_for_user(importer, backup)
+
+    assert success
+    assert Stage.query.filter_by(user_id=owner.id).one().name == '已有阶段'
+    imported_stage = Stage.query.filter_by(user_id=importer.id).one()
+    assert imported_stage.id != existing_stage.id
+    log = LogEntry.query.filter_by(stage_id=imported_stage.id).one()
+    assert log.log_date == date(2024, 1, 2)
+    assert log.subcategory.name == '线代'
+    assert log.subcategory.category.user_id == importer.id
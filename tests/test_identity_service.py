@@ -0,0 +1,73 @@
+# tests/test_identity_service.py
+from flask import g
+from sqlalchemy import event
+
+from learning_logger.models import User
+from learning_logger.services import identity_service
+
+
+def test_user_loader_skips_user_table_on_cache_hits(app, client, db, make_user, login, monkeypatch):
+    """
+    GIVEN the in-memory identity cache and a logged-in user
+    WHEN two pages are requested, the user is renamed, and a third page is requested
+    THEN only the first request reads the user table, and the rename is visible on the third
+    """
+    monkeypatch.setitem(app.config, 'CACHE_BACKEND', 'memory')
+    identity_service.identity_cache.reset()
+    user = make_user('旧名字', email='ident@example.com')
+    user_id = user.id
+    login(user)
+
+    user_queries = []
+
+    def get_page():
+        # 测试中各请求复用同一个应用上下文，先清掉 Flask-Login 记在 g 上的用户，让每次请求都走 user_loader
+        g.pop('_login_user', None)
+        return client.get('/settings/account').get_data(as_text=True)
+
+    def listener(conn, cursor, statement, *args):
+        if 'FROM user' in statement:
+            user_queries.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert '旧名字' in get_page()
+        assert '旧名字' in get_page()
+        assert len(user_queries) == 1
+
+        db.session.get(User, user_id).username = '新名字'
+        db.session.commit()
+        assert '新名字' in get_page()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+    stats = identity_service.identity_cache.stats_dict()
+    assert (stats['hits'], stats['misses'], stats['invalidations']) == (1, 2, 1)
+    assert stats['hit_rate'] == round(1 / 3, 3)
+    identity_service.identity_cache.reset()
+
+
+def test_principal_behaves_like_a_logged_in_user():
+    principal = identity_service.Principal(7, 'alice', 'alice@example.com')
+    assert principal.is_authenticated and principal.is_active and not principal.is_anonymous
+    assert principal.get_id() == '7'
+    assert not hasattr(principal, '__dict__')
+
+
+def test_identity_ttl_is_short_when_the_cache_is_process_local(app, monkeypatch):
+    """
+    GIVEN the per-process memory backend, then a shared Redis-style backend
+    WHEN the identity cache builds its backend
+    THEN deletions and renames in another worker can only be missed for USER_LOCAL_CACHE_TTL seconds
+    """
+    try:
+        monkeypatch.setitem(app.config, 'CACHE_BACKEND', 'memory')
+        identity_service.identity_cache.reset()
+        assert identity_service.identity_cache.backend.ttl == app.config['USER_LOCAL_CACHE_TTL']
+
+        monkeypatch.setitem(app.config, 'CACHE_BACKEND', 'redis')
+        monkeypatch.setitem(app.config, 'CACHE_REDIS_CLIENT', object())
+        identity_service.identity_cache.reset()
+        assert identity_service.identity_cache.backend.ttl == app.config['USER_CACHE_TTL']
+    finally:
+        identity_service.identity_cache.reset()
@@ -0,0 +1,60 @@
+# tests/test_indexes.py
+import os
+from datetime import date, datetime
+
+import pytest
+import sqlalchemy as sa
+
+from learning_logger import db as _db
+from learning_logger.models import (Stage, LogEntry, DailyData, WeeklyData, Todo, CountdownEvent,
+                                    DailyPlanItem)
+
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+HOT_QUERIES = [
+    ('ix_log_entry_stage_id_log_date',
+     sa.select(LogEntry).where(LogEntry.stage_id == 1, LogEntry.log_date == date(2024, 1, 1))),
+    ('ix_daily_data_stage_id_log_date',
+     sa.select(DailyData).where(DailyData.stage_id == 1).order_by(DailyData.log_date)),
+    ('ix_weekly_data_stage_id_year_week_num',
+     sa.select(WeeklyData).where(WeeklyData.stage_id == 1)),
+    ('ix_stage_user_id_start_date',
+     sa.select(Stage).where(Stage.user_id == 1).order_by(Stage.start_date)),
+    ('ix_todo_user_id_is_completed',
+     sa.select(sa.func.count()).select_from(Todo).where(Todo.user_id == 1, Todo.is_completed.is_(False))),
+    ('ix_countdown_event_user_id_target_datetime_utc',
+     sa.select(CountdownEvent).where(CountdownEvent.user_id == 1,
+                                     CountdownEvent.target_datetime_utc > datetime(2024, 1, 1))
+     .order_by(CountdownEvent.target_datetime_utc)),
+    ('ix_daily_plan_item_user_id_plan_date',
+     sa.select(DailyPlanItem).where(DailyPlanItem.user_id == 1, DailyPlanItem.plan_date == date(2024, 1, 1))),
+]
+
+
+def _explain(connection, stmt):
+    """返回语句的查询计划文本。"""
+    sql = str(stmt.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.dialect.name == 'sqlite' else 'EXPLAIN '
+    return '\n'.join(' '.join(str(col) for col in row) for row in connection.exec_driver_sql(prefix + sql))
+
+
+@pytest.mark.parametrize('index_name, stmt', HOT_QUERIES, ids=[name for name, _ in HOT_QUERIES])
+def test_hot_queries_use_indexes_on_sqlite(db, index_name, stmt):
+    with db.engine.connect() as connection:
+        assert index_name in _explain(connection, stmt)
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason='set TEST_POSTGRES_URL to run the PostgreSQL plan checks')
+@pytest.mark.parametrize('index_name, stmt', HOT_QUERIES, ids=[name for name, _ in HOT_QUERIES])
+def test_hot_queries_use_indexes_on_postgresql(index_name, stmt):
+    engine = sa.create_engine(POSTGRES_URL)
+    try:
+        with engine.connect() as connection:
+            transaction = connection.begin()
+            _db.metadata.create_all(connection)
+            # 空表上顺序扫描总是最便宜，关闭它才能看出索引是否可用
+            connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+            assert index_name in _explain(connection, stmt)
+            transaction.rollback()
+    finally:
+        engine.dispose()
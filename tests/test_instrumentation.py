@@ -0,0 +1,84 @@
+# tests/test_instrumentation.py
+import json
+import logging
+import re
+from datetime import date, timedelta
+
+from learning_logger import instrumentation
+from learning_logger.models import LogEntry
+
+
+def test_requests_report_sql_counts_through_header_log_and_metrics(app, logged_in_client, user, monkeypatch, caplog):
+    """
+    GIVEN a logged-in admin and a low query-count warning threshold
+    WHEN the dashboard is requested and then /admin/metrics
+    THEN the dashboard response carries Server-Timing, a WARNING JSON log line is written,
+         and the metrics endpoint aggregates the dashboard's queries with their origin
+    """
+    monkeypatch.setitem(app.config, 'ADMIN_EMAILS', [user.email])
+    monkeypatch.setitem(app.config, 'SQL_PROFILER_WARN_QUERIES', 0)
+    instrumentation.metrics.reset()
+
+    with caplog.at_level(logging.WARNING, logger=app.logger.name):
+        response = logged_in_client.get('/')
+    timing = re.fullmatch(r'db;dur=[\d.]+;desc="(\d+) queries"', response.headers['Server-Timing'])
+    assert timing and int(timing.group(1)) >= 2
+
+    line = json.loads(next(r.getMessage() for r in caplog.records if '"request_sql"' in r.getMessage()))
+    assert line['endpoint'] == 'main.index' and line['queries'] == int(timing.group(1))
+    assert any(entry['origin'] and entry['origin'].startswith('learning_logger/') for entry in line['slowest'])
+
+    snapshot = logged_in_client.get('/admin/metrics').json
+    dashboard = snapshot['sql']['endpoints']['main.index']
+    assert dashboard['requests'] == 1 and dashboard['queries'] == line['queries']
+    assert snapshot['sql']['slowest_statements'][0]['endpoint'] == 'main.index'
+    assert 'identity' in snapshot['caches']
+    instrumentation.metrics.reset()
+
+
+def test_admin_metrics_is_hidden_from_other_users(logged_in_client):
+    """
+    GIVEN a logged-in user who is not listed in ADMIN_EMAILS
+    WHEN /admin/metrics is requested
+    THEN the response is 404
+    """
+    assert logged_in_client.get('/admin/metrics').status_code == 404
+
+
+def test_streamed_responses_count_queries_issued_while_streaming(app, logged_in_client, db, user, stage, monkeypatch):
+    """
+    GIVEN a logged-in admin whose stage has logs spread over several weeks
+    WHEN the streamed records page is requested and then /admin/metrics
+    THEN the header only reports the queries before streaming, while the metrics
+         include the queries issued as the weeks were rendered
+    """
+    monkeypatch.setitem(app.config, 'ADMIN_EMAILS', [user.email])
+    instrumentation.metrics.reset()
+    for week in range(3):
+        db.session.add(LogEntry(stage_id=stage.id, log_date=date(2024, 1, 1) + timedelta(weeks=week), task='t',
+                                actual_duration=30))
+    db.session.commit()
+
+    # 与 WSGI 服务器一样，发送完响应体后关闭响应
+    with logged_in_client.get(f'/records/?stage_id={stage.id}') as response:
+        assert response.is_streamed
+        response.get_data()
+    timing = re.fullmatch(r'db;dur=[\d.]+;desc="(\d+) queries before streaming"', response.headers['Server-Timing'])
+    assert timing
+
+    records = logged_in_client.get('/admin/metrics').json['sql']['endpoints']['records.list_records']
+    assert records['requests'] == 1 and records['queries'] > int(timing.group(1))
+    instrumentation.metrics.reset()
+
+
+def test_cache_stats_is_limited_to_admins(app, client, user, make_user, login, monkeypatch):
+    """
+    GIVEN ADMIN_EMAILS listing a single account
+    WHEN /charts/api/cache-stats is requested by another user and then by the admin
+    THEN the other user gets 404 and the admin gets the statistics
+    """
+    monkeypatch.setitem(app.config, 'ADMIN_EMAILS', [user.email])
+    assert login(make_user('someone')).get('/charts/api/cache-stats').status_code == 404
+
+    response = login(user).get('/charts/api/cache-stats')
+    assert response.status_code == 200 and 'identity' in response.json
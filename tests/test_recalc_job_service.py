@@ -0,0 +1,83 @@
+# tests/test_recalc_job_service.py
+import threading
+from datetime import date
+
+from flask import has_app_context
+
+from config import TestingConfig
+from learning_logger import create_app, db as _db
+from learning_logger.models import User, Stage, LogEntry, DailyData, RecalcJob
+from learning_logger.services import recalc_job_service
+
+
+def test_recalculation_job_processes_every_stage(app, db, user, make_stage):
+    """
+    GIVEN a user with two stages that have logs but no derived data
+    WHEN a recalculation job is submitted for those stages
+    THEN the job reports completion and every stage gets its DailyData rows
+    """
+    stages = [make_stage(date(2024, 1, 1 + i * 14), name=f'阶段{i}') for i in range(2)]
+    for stage in stages:
+        db.session.add(LogEntry(stage_id=stage.id, log_date=stage.start_date, task='t', actual_duration=90, mood=4))
+    db.session.commit()
+
+    job = recalc_job_service.submit_recalculation(app, user.id, [s.id for s in stages])
+
+    assert recalc_job_service.wait_for_job(job.id, timeout=5)
+    assert job.to_dict()['status'] == 'finished'
+    assert job.to_dict()['progress'] == 100
+    assert DailyData.query.count() == 2
+    assert recalc_job_service.get_job_for_user(job.id, user.id + 1) is None
+
+
+def test_recalculation_job_runs_in_worker_threads_with_shared_state(monkeypatch, tmp_path):
+    """
+    GIVEN a file-backed SQLite app with eager jobs disabled
+    WHEN a recalculation job is submitted for three stages
+    THEN each stage runs in a recalc thread under its own app context and session,
+         and progress is readable from the database by any process
+    """
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'jobs.db'}")
+    monkeypatch.setattr(TestingConfig, 'RECALC_JOBS_EAGER', False)
+    threaded_app = create_app('testing')
+    seen = []
+    real_recalculate = recalc_job_service._recalculate_stage
+
+    def spy(stage_id):
+        seen.append((threading.current_thread().name, has_app_context(), id(_db.session())))
+        return real_recalculate(stage_id)
+
+    monkeypatch.setattr(recalc_job_service, '_recalculate_stage', spy)
+    recalc_job_service.shutdown()
+    with threaded_app.app_context():
+        _db.create_all()
+        try:
+            user = User(username='threaded', email='threaded@example.com')
+            user.set_password('pw')
+            _db.session.add(user)
+            _db.session.flush()
+            stages = [Stage(name=f'阶段{i}', start_date=date(2024, 1, 1 + i * 7), user_id=user.id) for i in range(3)]
+            _db.session.add_all(stages)
+            _db.session.flush()
+            for stage in stages:
+                _db.session.add(LogEntry(stage_id=stage.id, log_date=stage.start_date, task='t',
+                                         actual_duration=60, mood=3))
+            _db.session.commit()
+            main_session = id(_db.session())
+
+            job = recalc_job_service.submit_recalculation(threaded_app, user.id, [s.id for s in stages])
+            job_id = job.id
+            assert recalc_job_service.wait_for_job(job_id, timeout=10)
+            recalc_job_service.shutdown()
+
+            assert len(seen) == 3
+            assert all(name.startswith('recalc') and in_context for name, in_context, _ in seen)
+            assert main_session not in {session_id for _, _, session_id in seen}
+            _db.session.expire_all()
+            assert recalc_job_service.get_job_for_user(job_id, user.id).to_dict()['status'] == 'finished'
+            assert _db.session.get(RecalcJob, job_id).completed == 3
+            assert DailyData.query.count() == 3
+        finally:
+            recalc_job_service.shutdown()
+            _db.session.remove()
+            _db.drop_all()
@@ -0,0 +1,206 @@
+# tests/test_record_service.py
+import re
+from datetime import date, timedelta
+
+from learning_logger.models import LogEntry, DailyData, WeeklyData
+from learning_logger.helpers import get_custom_week_info
+from learning_logger.services import record_service
+
+
+def test_recalculate_efficiency_matches_per_day_scores(db, make_stage):
+    """
+    GIVEN a stage with several logs spread over two weeks
+    WHEN the stage is fully recalculated
+    THEN daily scores equal the per-day formula and stale derived rows are removed
+    """
+    start = date(2024, 3, 4)
+    stage = make_stage(start)
+    for offset, duration, mood in [(0, 60, 5), (0, 30, None), (3, 120, 2), (9, 0, 4), (13, 45, 3)]:
+        db.session.add(LogEntry(stage_id=stage.id, log_date=start + timedelta(days=offset), task='t',
+                                actual_duration=duration, mood=mood))
+    db.session.add(DailyData(stage_id=stage.id, log_date=start - timedelta(days=1), efficiency=9.9))
+    db.session.commit()
+
+    record_service.recalculate_efficiency_for_stage(stage)
+
+    daily = {d.log_date: d.efficiency for d in DailyData.query.filter_by(stage_id=stage.id)}
+    assert set(daily) == {start + timedelta(days=o) for o in (0, 3, 9, 13)}
+    for log_date, efficiency in daily.items():
+        assert efficiency == record_service._calculate_daily_efficiency_score(log_date, stage.id)
+
+    weekly = {(w.year, w.week_num): w.efficiency for w in WeeklyData.query.filter_by(stage_id=stage.id)}
+    assert len(weekly) == 2
+    first_week = sum(daily.get(start + timedelta(days=i), 0) for i in range(7)) / 7
+    assert weekly[(start.year, 1)] == first_week
+
+
+def _weeks_of(pages):
+    return [(w['year'], w['week_num']) for page in pages for w in page['weeks']]
+
+
+def test_log_pages_walk_every_week_once(db, make_stage):
+    """
+    GIVEN a stage whose logs span a year boundary and leave some weeks empty
+    WHEN the weeks are paged with the keyset cursor in both directions
+    THEN every week with logs appears exactly once, in order, with per-day totals
+    """
+    start = date(2024, 12, 2)
+    stage = make_stage(start)
+    offsets = [0, 1, 1, 8, 20, 29, 30, 31, 45, 60, 61, 75]
+    for offset in offsets:
+        db.session.add(LogEntry(stage_id=stage.id, log_date=start + timedelta(days=offset), task='t',
+                                actual_duration=30, mood=3))
+    db.session.commit()
+    expected = sorted({get_custom_week_info(start + timedelta(days=o), start) for o in offsets})
+
+    for sort_order, ordered in (('asc', expected), ('desc', expected[::-1])):
+        pages, cursor = [], None
+        while True:
+            page = record_service.get_log_page_for_stage(stage, sort_order, cursor, per_page=3)
+            pages.append(page)
+            if page['next_cursor'] is None:
+                break
+            cursor = record_service.parse_page_cursor(page['next_cursor'])
+        assert _weeks_of(pages) == ordered
+        assert all(len(page['weeks']) <= 3 for page in pages)
+
+    first_page = record_service.get_log_page_for_stage(stage, 'asc', per_page=1)
+    day = first_page['weeks'][0]['days'][1]
+    assert day['date'] == start + timedelta(days=1)
+    assert day['total_duration'] == 60 and len(day['logs']) == 2
+
+
+def test_log_pages_split_the_merged_pre_start_week_by_date(db, make_stage):
+    """
+    GIVEN a stage with logs on 20 distinct dates before its start date, which all fall into week 1
+    WHEN the log pages are walked one week per page in both directions
+    THEN every log date appears exactly once and the pages after the first part of that week are marked continued
+    """
+    start = date(2024, 3, 4)
+    stage = make_stage(start)
+    log_dates = [start - timedelta(days=d) for d in range(1, 21)] + [start, start + timedelta(days=10)]
+    for log_date in log_dates:
+        db.session.add(LogEntry(stage_id=stage.id, log_date=log_date, task='t', actual_duration=30))
+    db.session.commit()
+
+    for sort_order in ('asc', 'desc'):
+        weeks, cursor = [], None
+        while True:
+            page = record_service.get_log_page_for_stage(stage, sort_order, cursor, per_page=1)
+            weeks += page['weeks']
+            if page['next_cursor'] is None:
+                break
+            cursor = record_service.parse_page_cursor(page['next_cursor'])
+        seen = [day['date'] for week in weeks for day in week['days']]
+        assert sorted(seen) == sorted(log_dates) and len(set(seen)) == len(seen)
+        merged = [week for week in weeks if (week['year'], week['week_num']) == (2024, 1)]
+        assert len(merged) > 1 and not merged[0]['continued'] and all(w['continued'] for w in merged[1:])
+        assert len({week['anchor'] for week in weeks}) == len(weeks)
+
+
+def test_weekly_badge_updates_reach_every_part_of_a_split_week(app, logged_in_client, db, make_stage, monkeypatch):
+    """
+    GIVEN a merged pre-start week that spans the first records page and the next fragment
+    WHEN a log on a date in the continued part is deleted
+    THEN the weekly update selector matches the badge in both parts of that week
+    """
+    monkeypatch.setitem(app.config, 'RECORDS_WEEKS_PER_PAGE', 1)
+    start = date(2024, 3, 4)
+    stage = make_stage(start)
+    for days_before in range(1, 21):
+        db.session.add(LogEntry(stage_id=stage.id, log_date=start - timedelta(days=days_before), task='t',
+                                actual_duration=30))
+    continued_day = start - timedelta(days=13)
+    extra = LogEntry(stage_id=stage.id, log_date=continued_day, task='t', actual_duration=45)
+    db.session.add(extra)
+    db.session.commit()
+
+    first_page = logged_in_client.get(f'/records/?stage_id={stage.id}&sort=asc').get_data(as_text=True)
+    cursor = record_service.get_log_page_for_stage(stage, 'asc', per_page=1)['next_cursor']
+    fragment = logged_in_client.get(f'/records/weeks?stage_id={stage.id}&sort=asc&cursor={cursor}').json['html']
+    assert continued_day.isoformat() in fragment and '（续）' in fragment
+
+    selector = logged_in_client.post(f'/records/delete/{extra.id}').json['updates']['weekly_efficiency']['target_id']
+    assert selector == '.badge[data-week="2024-1"]'
+    badge = re.compile(r'<span class="badge[^"]*"[^>]*data-week="2024-1"')
+    assert badge.search(first_page) and badge.search(fragment)
+
+
+def test_list_weeks_endpoint_returns_next_fragment(logged_in_client, db, make_stage):
+    """
+    GIVEN a logged-in user whose stage has more weeks than fit on one page
+    WHEN the records page and then the infinite-scroll endpoint are requested
+    THEN the page links to the next cursor and the endpoint returns the following weeks as HTML
+    """
+    start = date(2024, 1, 1)
+    stage = make_stage(start)
+    for week in range(10):
+        db.session.add(LogEntry(stage_id=stage.id, log_date=start + timedelta(weeks=week), task=f'任务{week}',
+                                actual_duration=30))
+    db.session.commit()
+
+    page = logged_in_client.get(f'/records/?stage_id={stage.id}')
+    assert page.status_code == 200
+    assert b'weeks-sentinel' in page.data and '任务9'.encode() in page.data
+    assert '任务1<'.encode() not in page.data
+
+    response = logged_in_client.get(f'/records/weeks?stage_id={stage.id}&sort=desc&cursor=2024-01-15')
+    assert response.status_code == 200
+    assert '任务1<' in response.json['html'] and '任务2<' not in response.json['html']
+    assert response.json['next_cursor'] is None and response.json['next_url'] is None
+
+    assert logged_in_client.get(f'/records/weeks?stage_id={stage.id}&cursor=bad').status_code == 400
+
+
+def test_records_page_streams_and_consumes_flashes(logged_in_client, db, stage):
+    """
+    GIVEN a logged-in user with a pending flash message
+    WHEN the records page is requested
+    THEN the page is sent as a stream, shows the message once and the next page no longer does
+    """
+    db.session.add(LogEntry(stage_id=stage.id, log_date=date(2024, 1, 2), task='流式任务', actual_duration=30))
+    db.session.commit()
+    with logged_in_client.session_transaction() as sess:
+        sess['_flashes'] = [('info', '一次性提示')]
+
+    response = logged_in_client.get(f'/records/?stage_id={stage.id}')
+    assert response.is_streamed
+    body = response.get_data(as_text=True)
+    assert '一次性提示' in body and '流式任务' in body
+
+    assert '一次性提示' not in logged_in_client.get('/records/').get_data(as_text=True)
+
+
+def test_add_and_delete_responses_use_service_results(logged_in_client, db, make_stage):
+    """
+    GIVEN a logged-in user with an active stage
+    WHEN logs are added and deleted through the records endpoints
+    THEN the JSON updates match the stored daily/weekly efficiency and the day's total duration
+    """
+    start = date.today() - timedelta(days=3)
+    stage = make_stage(start)
+    with logged_in_client.session_transaction() as sess:
+        sess['active_stage_id'] = stage.id
+
+    def add(minutes, mood):
+        return logged_in_client.post('/records/add', data={'log_date': start.isoformat(), 'task': 't',
+                                                 'duration_hours': '0', 'duration_minutes': str(minutes),
+                                                 'mood': str(mood)}).json
+
+    def expected_updates():
+        daily = DailyData.query.filter_by(stage_id=stage.id, log_date=start).one()
+        weekly = WeeklyData.query.filter_by(stage_id=stage.id, year=start.year, week_num=1).one()
+        return {'daily_efficiency': f"日效率: {round(daily.efficiency, 1)}",
+                'weekly_efficiency': f"周平均效率: {round(weekly.efficiency, 1)}"}
+
+    add(60, 5)
+    second = add(30, 2)
+    assert second['success']
+    assert {k: v['value'] for k, v in second['updates'].items()} == dict(expected_updates(), daily_duration='1.5h')
+
+    first_id, second_id = [log.id for log in LogEntry.query.filter_by(stage_id=stage.id).order_by(LogEntry.id)]
+    deleted = logged_in_client.post(f'/records/delete/{second_id}').json
+    assert deleted['remove_target'] == f'#log-entry-row-{second_id}'
+    assert {k: v['value'] for k, v in deleted['updates'].items()} == dict(expected_updates(), daily_duration='1.0h')
+
+    assert logged_in_client.post(f'/records/delete/{first_id}').json['reload'] is True
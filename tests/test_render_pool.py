@@ -0,0 +1,62 @@
+# tests/test_render_pool.py
+import os
+import time
+
+import pytest
+
+from learning_logger.services import render_pool
+
+
+def test_render_pool_runs_in_workers_with_backpressure_and_timeout(app, monkeypatch):
+    """
+    GIVEN a render pool with one warm worker and no spare queue slots
+    WHEN jobs are run, the pool is saturated and a job outlives the timeout
+    THEN jobs execute in another process, extra submissions are rejected and the wait times out
+    """
+    monkeypatch.setitem(app.config, 'RENDER_POOL_WORKERS', 1)
+    monkeypatch.setitem(app.config, 'RENDER_QUEUE_SIZE', 0)
+    render_pool.shutdown()
+    try:
+        assert render_pool.run(os.getpid) != os.getpid()
+
+        monkeypatch.setitem(app.config, 'RENDER_TIMEOUT', 0.5)
+        busy = render_pool.submit(time.sleep, 2)
+        with pytest.raises(render_pool.RenderPoolBusy):
+            render_pool.submit(os.getpid)
+        with pytest.raises(render_pool.RenderTimeout):
+            render_pool.wait(busy)
+    finally:
+        render_pool.shutdown()
+
+
+def test_render_pool_timeout_recycles_hung_worker_and_frees_slot(app, monkeypatch):
+    """
+    GIVEN a one-worker pool with no spare slots whose worker is stuck on a long job
+    WHEN waiting for that job times out
+    THEN the hung worker is terminated and the next submission gets a slot in a fresh pool
+    """
+    monkeypatch.setitem(app.config, 'RENDER_POOL_WORKERS', 1)
+    monkeypatch.setitem(app.config, 'RENDER_QUEUE_SIZE', 0)
+    monkeypatch.setitem(app.config, 'RENDER_TIMEOUT', 0.5)
+    render_pool.shutdown()
+    try:
+        hung = render_pool.submit(time.sleep, 60)
+        with pytest.raises(render_pool.RenderTimeout):
+            render_pool.wait(hung)
+
+        monkeypatch.setitem(app.config, 'RENDER_TIMEOUT', 30)
+        assert render_pool.run(os.getpid) != os.getpid()
+        assert hung.done()
+    finally:
+        render_pool.shutdown()
+
+
+def test_render_pool_runs_inline_when_disabled(app):
+    """
+    GIVEN RENDER_POOL_WORKERS set to 0 (the testing default)
+    WHEN a job is run
+    THEN it executes in the calling process and exceptions propagate
+    """
+    assert render_pool.run(os.getpid) == os.getpid()
+    with pytest.raises(ZeroDivisionError):
+        render_pool.run(divmod, 1, 0)
@@ -0,0 +1,39 @@
+# tests/test_rollup_service.py
+from datetime import date
+
+from werkzeug.datastructures import MultiDict
+
+from learning_logger.models import LogEntry, DailyRollup
+from learning_logger.services import record_service, rollup_service
+
+
+def _form(log_date, minutes, mood):
+    return MultiDict({'log_date': log_date, 'task': '复习', 'duration_minutes': str(minutes), 'mood': str(mood)})
+
+
+def test_rollup_follows_log_writes_and_detects_drift(app, db, user, stage):
+    """
+    GIVEN logs written through record_service
+    WHEN logs are added, moved to another date and deleted
+    THEN the daily rollup matches the raw logs, and direct writes show up as drift until rebuilt
+    """
+    with app.test_request_context():
+        _, _, first, _ = record_service.add_log_for_stage(stage.id, user, _form('2024-01-02', 60, 5))
+        _, _, second, _ = record_service.add_log_for_stage(stage.id, user, _form('2024-01-02', 30, 1))
+        first_id, second_id = first.id, second.id
+        record_service.update_log_for_user(second_id, user, _form('2024-01-03', 45, 2))
+        record_service.add_log_for_stage(stage.id, user, _form('2024-01-04', 20, 3))
+        record_service.delete_log_for_user(first_id, user)
+
+    rollups = {r.log_date: (r.total_minutes, r.weighted_mood_sum, r.entry_count) for r in DailyRollup.query}
+    assert rollups == {date(2024, 1, 3): (45, 90, 1), date(2024, 1, 4): (20, 60, 1)}
+    assert rollup_service.check_consistency(user.id) == []
+
+    db.session.add(LogEntry(stage_id=stage.id, log_date=date(2024, 1, 4), task='直接写入', actual_duration=10))
+    db.session.commit()
+    drift = rollup_service.check_consistency(user.id)
+    assert drift == [{'log_date': date(2024, 1, 4), 'expected': (30, 90, 2), 'actual': (20, 60, 1)}]
+
+    rollup_service.rebuild_for_user(user.id)
+    db.session.commit()
+    assert rollup_service.check_consistency(user.id) == []
@@ -0,0 +1,64 @@
+# tests/test_settings_service.py
+from sqlalchemy import event
+
+from learning_logger.models import Setting
+from learning_logger.services import settings_service
+
+
+def _count_setting_queries(db):
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        if 'FROM setting' in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    return statements, lambda: event.remove(db.engine, 'before_cursor_execute', listener)
+
+
+def test_settings_are_read_once_and_refreshed_after_a_write(app, logged_in_client, db, user, monkeypatch):
+    """
+    GIVEN the in-memory settings cache and a logged-in user with a saved theme
+    WHEN the appearance page is loaded twice and the theme is then changed
+    THEN the first load reads settings once, the second reads none, and the change is visible immediately
+    """
+    monkeypatch.setitem(app.config, 'CACHE_BACKEND', 'memory')
+    settings_service.settings_cache.reset()
+    db.session.add(Setting(user_id=user.id, key='theme', value='palette-blue'))
+    db.session.commit()
+    user_id = user.id
+
+    statements, stop = _count_setting_queries(db)
+    try:
+        first = logged_in_client.get('/settings/appearance')
+        assert 'data-theme="palette-blue"' in first.get_data(as_text=True)
+        assert len(statements) == 1
+
+        logged_in_client.get('/settings/appearance')
+        assert len(statements) == 1
+
+        logged_in_client.post('/settings/appearance', data={'theme': 'palette-green'})
+        assert Setting.query.filter_by(user_id=user_id, key='theme').one().value == 'palette-green'
+        assert 'data-theme="palette-green"' in logged_in_client.get('/settings/appearance').get_data(as_text=True)
+    finally:
+        stop()
+        settings_service.settings_cache.reset()
+
+
+def test_settings_ttl_is_short_when_the_cache_is_process_local(app, monkeypatch):
+    """
+    GIVEN the per-process memory backend, then a shared Redis-style backend
+    WHEN the settings cache builds its backend
+    THEN the memory backend uses the short local TTL, since other workers never see invalidations
+    """
+    try:
+        monkeypatch.setitem(app.config, 'CACHE_BACKEND', 'memory')
+        settings_service.settings_cache.reset()
+        assert settings_service.settings_cache.backend.ttl == app.config['SETTINGS_LOCAL_CACHE_TTL']
+
+        monkeypatch.setitem(app.config, 'CACHE_BACKEND', 'redis')
+        monkeypatch.setitem(app.config, 'CACHE_REDIS_CLIENT', object())
+        settings_service.settings_cache.reset()
+        assert settings_service.settings_cache.backend.ttl == app.config['SETTINGS_CACHE_TTL']
+    finally:
+        settings_service.settings_cache.reset()
@@ -0,0 +1,73 @@
+# tests/test_stage_timeline.py
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from learning_logger.models import Stage, LogEntry
+from learning_logger.services import chart_service, record_service, rollup_service
+from learning_logger.services.stage_timeline import StageTimeline
+
+
+@contextmanager
+def _count_queries(engine):
+    statements = []
+
+    def _record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', _record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, 'before_cursor_execute', _record)
+
+
+def _add_stages_with_logs(db, make_stage, owner, stage_count):
+    start = date.today() - timedelta(days=30 * stage_count)
+    for i in range(stage_count):
+        stage = make_stage(start + timedelta(days=30 * i), name=f'阶段{i}', owner=owner)
+        db.session.add(LogEntry(stage_id=stage.id, log_date=stage.start_date + timedelta(days=1), task='t',
+                                actual_duration=60, mood=4))
+    db.session.flush()
+    rollup_service.rebuild_for_user(owner.id)
+    db.session.commit()
+
+
+def test_timeline_spans_follow_next_later_stage(user, make_stage):
+    """
+    GIVEN stages where two share a start date
+    WHEN a timeline is built from them
+    THEN each stage ends the day before the next later stage and week offsets are global
+    """
+    starts = [date(2024, 1, 1), date(2024, 1, 1), date(2024, 1, 22)]
+    stages = [make_stage(d, name=f's{i}') for i, d in enumerate(starts)]
+
+    timeline = StageTimeline.for_user(user.id)
+
+    assert [span.end_date for span in timeline] == [date(2024, 1, 21), date(2024, 1, 21), None]
+    assert timeline.span_for(stages[2].id).week_offset == 3
+    assert timeline.global_week_for_stage_week(stages[2].id, 2) == (2024, 5)
+    assert timeline.week_label(date(2024, 1, 8)) == '2024-W02'
+
+
+def test_chart_and_recalculation_query_counts_do_not_grow_with_stages(db, make_user, make_stage):
+    """
+    GIVEN two users with 2 and 8 stages respectively
+    WHEN chart data is computed and a stage is recalculated for each
+    THEN both users issue the same number of SQL statements
+    """
+    few, many = make_user('few'), make_user('many')
+    _add_stages_with_logs(db, make_stage, few, 2)
+    _add_stages_with_logs(db, make_stage, many, 8)
+
+    counts = []
+    for user in (few, many):
+        stage = Stage.query.filter_by(user_id=user.id).first()
+        with _count_queries(db.engine) as chart_statements:
+            chart_service._compute_chart_data_for_user(user)
+        with _count_queries(db.engine) as recalc_statements:
+            record_service.recalculate_efficiency_for_stage(stage)
+        counts.append((len(chart_statements), len(recalc_statements)))
+
+    assert counts[0] == counts[1]
@@ -0,0 +1,39 @@
+# 文件路径: tests/test_startup_imports.py
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ('matplotlib', 'jieba', 'numpy', 'wordcloud', 'PIL')
+
+PROBE = (
+    "import sys\n"
+    "from learning_logger import create_app\n"
+    "create_app('testing')\n"
+    f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+)
+
+
+def _loaded_heavy_modules(**env):
+    result = subprocess.run([sys.executable, '-c', PROBE], capture_output=True, text=True, check=True,
+                            env=dict(os.environ, **env),
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    return [m for m in result.stdout.strip().split(',') if m]
+
+
+def test_create_app_does_not_import_heavy_modules():
+    """
+    GIVEN 默认配置（未开启预加载）
+    WHEN 在全新进程中调用 create_app
+    THEN matplotlib、jieba、numpy、wordcloud、PIL 都不会被导入
+    """
+    assert _loaded_heavy_modules(PRELOAD_HEAVY_MODULES='0') == []
+
+
+def test_preload_mode_imports_heavy_modules():
+    """
+    GIVEN PRELOAD_HEAVY_MODULES=1（gunicorn preload_app 模式）
+    WHEN 调用 create_app
+    THEN 重量级依赖在主进程中预先加载
+    """
+    loaded = _loaded_heavy_modules(PRELOAD_HEAVY_MODULES='1')
+    assert {'matplotlib', 'jieba', 'numpy'} <= set(loaded)
@@ -0,0 +1,61 @@
+# tests/test_token_index_service.py
+from datetime import date
+
+from werkzeug.datastructures import MultiDict
+
+from learning_logger.models import LogEntry, NoteTokenFrequency
+from learning_logger.services import record_service, token_index_service
+
+
+def _frequency_rows(user_id):
+    return {(r.stage_id, r.token): r.count for r in NoteTokenFrequency.query.filter_by(user_id=user_id)}
+
+
+def test_token_frequencies_follow_note_writes(app, db, user, make_stage):
+    """
+    GIVEN logs with notes written through record_service across two stages
+    WHEN notes are added, edited and deleted
+    THEN the incremental token table always matches a rebuild from raw notes
+    """
+    first = make_stage(date(2024, 1, 1), name='一')
+    second = make_stage(date(2024, 2, 1), name='二')
+
+    def form(notes, log_date='2024-02-02'):
+        return MultiDict({'log_date': log_date, 'task': 't', 'duration_minutes': '30', 'notes': notes})
+
+    with app.test_request_context():
+        _, _, log_a, _ = record_service.add_log_for_stage(first.id, user, form('学习 线性代数 线性代数', '2024-01-02'))
+        _, _, log_b, _ = record_service.add_log_for_stage(second.id, user, form('复习 线性代数'))
+        assert token_index_service.get_frequencies(user.id) == {'学习': 1, '线性代数': 3, '复习': 1}
+        assert token_index_service.get_frequencies(user.id, second.id) == {'复习': 1, '线性代数': 1}
+
+        record_service.update_log_for_user(log_a.id, user, form('学习 概率论', '2024-01-02'))
+        record_service.delete_log_for_user(log_b.id, user)
+
+    incremental = _frequency_rows(user.id)
+    assert incremental == {(first.id, '学习'): 1, (first.id, '概率论'): 1}
+
+    token_index_service.rebuild_for_user(user.id)
+    db.session.commit()
+    assert _frequency_rows(user.id) == incremental
+
+
+def test_reads_never_backfill_and_the_cli_rebuilds(app, db, runner, user, stage):
+    """
+    GIVEN notes written before the token index existed, one of them made only of filtered tokens
+    WHEN frequencies are read and then `flask token-index rebuild` is run
+    THEN reads return nothing without writing, and the command builds the index from raw notes
+    """
+    db.session.add_all([
+        LogEntry(stage_id=stage.id, log_date=date(2024, 1, 2), task='t', notes='复习 线性代数'),
+        LogEntry(stage_id=stage.id, log_date=date(2024, 1, 3), task='t', notes='的 了'),
+    ])
+    db.session.commit()
+
+    assert token_index_service.get_frequencies(user.id) == {}
+    assert _frequency_rows(user.id) == {}
+
+    result = runner.invoke(args=['token-index', 'rebuild', '--user-id', str(user.id)])
+    assert result.exit_code == 0, result.output
+    assert '2 token row(s)' in result.output
+    assert token_index_service.get_frequencies(user.id) == {'复习': 1, '线性代数': 1}
@@ -0,0 +1,92 @@
+# tests/test_trend_engine.py
+import collections
+import math
+import random
+
+import numpy as np
+import pytest
+
+from learning_logger.helpers import moving_average
+from learning_logger.services import trend_engine
+
+
+def _legacy_sma(data, window_size=7):
+    """重构前 chart_service._calculate_sma 的逐元素实现，作为对照。"""
+    if not data or window_size <= 1:
+        return [None] * len(data)
+    numeric_data = [float(v) if v is not None else np.nan for v in data]
+    if len(numeric_data) < window_size:
+        return [None] * len(numeric_data)
+    sma_values = []
+    window = collections.deque(maxlen=window_size)
+    for i, value in enumerate(numeric_data):
+        window.append(value)
+        if i < window_size - 1:
+            sma_values.append(None)
+        else:
+            valid_values = [v for v in window if not np.isnan(v)]
+            sma = sum(valid_values) / len(valid_values) if valid_values else None
+            sma_values.append(round(sma, 2) if sma is not None else None)
+    return sma_values
+
+
+def _legacy_moving_average(data, window_size=7):
+    """重构前 helpers.moving_average 的逐窗口实现。"""
+    if len(data) < window_size:
+        return np.array([])
+    result = []
+    for i in range(len(data) - window_size + 1):
+        window = data[i: i + window_size]
+        valid_values = window[~np.isnan(window)]
+        result.append(np.mean(valid_values) if len(valid_values) > 0 else np.nan)
+    return np.array(result)
+
+
+def _naive_ema(values, span):
+    alpha, prev, out = 2 / (span + 1), None, []
+    for v in values:
+        if v is not None and not math.isnan(v):
+            prev = v if prev is None else alpha * v + (1 - alpha) * prev
+        out.append(math.nan if prev is None else prev)
+    return out
+
+
+def _random_series(rng, integers):
+    length = rng.choice([0, 1, 2, 3, 6, 7, 8, rng.randint(9, 400)])
+    gap_rate = rng.choice([0.0, 0.2, 0.7, 1.0])
+    make = (lambda: rng.randint(0, 600)) if integers else (lambda: rng.uniform(0, 15))
+    return [None if rng.random() < gap_rate else make() for _ in range(length)]
+
+
+@pytest.mark.parametrize('seed', range(50))
+def test_sma_matches_legacy_implementation(seed):
+    rng = random.Random(seed)
+    window = rng.choice([0, 1, 2, 3, 7, 30])
+    integer_series = _random_series(rng, integers=True)
+    # 整数输入时累积和没有舍入误差，结果必须逐项相等
+    assert trend_engine.sma_series(integer_series, window) == _legacy_sma(integer_series, window)
+
+    float_series = _random_series(rng, integers=False)
+    for new, old in zip(trend_engine.sma_series(float_series, window), _legacy_sma(float_series, window)):
+        assert (new is None) == (old is None)
+        if new is not None:
+            assert abs(new - old) <= 0.01 + 1e-9
+
+
+@pytest.mark.parametrize('seed', range(30))
+def test_moving_average_and_ema_match_reference(seed):
+    rng = random.Random(seed)
+    series = _random_series(rng, integers=False)
+    window = rng.choice([1, 3, 7])
+    data = np.array([np.nan if v is None else v for v in series], dtype=float)
+    np.testing.assert_allclose(moving_average(data, window), _legacy_moving_average(data, window), rtol=1e-9,
+                               atol=1e-9)
+
+    span = rng.choice([1, 2, 3, 7, 30])
+    np.testing.assert_allclose(trend_engine.ema(series, span), _naive_ema(series, span), rtol=1e-9, atol=1e-9)
+
+
+def test_sma_series_computes_stacked_series_in_one_call():
+    durations, efficiencies = [1, 2, 3, 4], [None, 2.0, None, 4.0]
+    assert trend_engine.sma_series([durations, efficiencies], 2) == [
+        _legacy_sma(durations, 2), _legacy_sma(efficiencies, 2)]
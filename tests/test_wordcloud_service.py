@@ -0,0 +1,132 @@
+# tests/test_wordcloud_service.py
+from datetime import date
+
+from werkzeug.datastructures import MultiDict
+
+from learning_logger.models import LogEntry
+from learning_logger.services import record_service, token_index_service, wordcloud_service
+
+
+def test_wordcloud_is_rendered_once_and_served_with_etag(app, db, user, stage, logged_in_client, monkeypatch):
+    """
+    GIVEN the in-memory word cloud cache and a user with notes
+    WHEN the word cloud is requested repeatedly, conditionally, and after a note is added
+    THEN it renders once per corpus, answers If-None-Match with 304 and re-renders after the change
+    """
+    monkeypatch.setitem(app.config, 'CACHE_BACKEND', 'memory')
+    wordcloud_service.wordcloud_cache.reset()
+    renders = []
+    monkeypatch.setattr(wordcloud_service, '_render_wordcloud_png',
+                        lambda frequencies, mask, palette: renders.append(dict(frequencies)) or b'png')
+
+    db.session.add(LogEntry(stage_id=stage.id, log_date=date(2024, 1, 2), task='t', notes='学习 线性代数'))
+    token_index_service.rebuild_for_user(user.id)
+    db.session.commit()
+
+    url = '/charts/api/wordcloud?mask=book-open.png&palette=calm'
+    try:
+        first = logged_in_client.get(url)
+        second = logged_in_client.get(url)
+        assert first.status_code == second.status_code == 200
+        assert first.data == b'png'
+        assert first.headers['ETag'] == second.headers['ETag']
+        assert len(renders) == 1
+
+        conditional = logged_in_client.get(url, headers={'If-None-Match': first.headers['ETag']})
+        assert conditional.status_code == 304
+        assert logged_in_client.get('/charts/api/wordcloud?mask=book-open.png&palette=forest').headers['ETag'] != \
+            first.headers['ETag']
+
+        with app.test_request_context():
+            success, _, _, _ = record_service.add_log_for_stage(stage.id, user, MultiDict({
+                'log_date': '2024-01-03', 'task': '复习', 'duration_minutes': '30', 'mood': '4',
+                'notes': '复习 概率论'}))
+        assert success
+
+        changed = logged_in_client.get(url, headers={'If-None-Match': first.headers['ETag']})
+        assert changed.status_code == 200
+        assert changed.headers['ETag'] != first.headers['ETag']
+        assert renders[-1] == {'学习': 1, '线性代数': 1, '复习': 1, '概率论': 1}
+    finally:
+        wordcloud_service.wordcloud_cache.reset()
+
+
+def test_stopwords_and_masks_are_loaded_once_per_process(app, monkeypatch):
+    """
+    GIVEN a fresh asset cache
+    WHEN stopwords and a mask are requested twice
+    THEN the files are read once, the results are immutable and reload_assets drops them
+    """
+    from PIL import Image
+    wordcloud_service.reload_assets()
+    opened = []
+    real_open = Image.open
+    monkeypatch.setattr(Image, 'open', lambda path: opened.append(path) or real_open(path))
+    try:
+        stopwords = wordcloud_service._load_stopwords()
+        assert isinstance(stopwords, frozenset) and stopwords
+        assert wordcloud_service._load_stopwords() is stopwords
+
+        mask = wordcloud_service._get_mask_image('book-open.png', width=120, height=80)
+        assert wordcloud_service._get_mask_image('book-open.png', width=120, height=80) is mask
+        assert mask.shape == (80, 120, 3) and not mask.flags.writeable
+        assert len(opened) == 1
+
+        stats = wordcloud_service.asset_stats()
+        assert stats['stopwords'] == len(stopwords)
+        assert (stats['masks'], stats['masks_bytes']) == (1, mask.nbytes)
+
+        wordcloud_service.reload_assets()
+        assert wordcloud_service.asset_stats()['masks'] == 0
+        assert wordcloud_service._load_stopwords() is not stopwords
+    finally:
+        wordcloud_service.reload_assets()
+
+
+def test_asset_reload_reaches_every_process_and_recycles_the_render_pool(app, db, user, stage, logged_in_client, runner,
+                                                                        monkeypatch):
+    """
+    GIVEN an admin with indexed notes and a word cloud cache shared between processes
+    WHEN assets are reloaded through the admin hook, by another process bumping the version, and from the CLI
+    THEN each reload drops this process's assets, recycles the render pool and changes the word cloud ETag
+    """
+    from learning_logger.services import identity_service, render_pool
+    monkeypatch.setitem(app.config, 'CACHE_BACKEND', 'memory')
+    monkeypatch.setitem(app.config, 'ADMIN_EMAILS', [user.email])
+    wordcloud_service.wordcloud_cache.reset()
+    identity_service.identity_cache.reset()
+    recycled = []
+    monkeypatch.setattr(render_pool, 'shutdown', lambda: recycled.append(True))
+
+    db.session.add(LogEntry(stage_id=stage.id, log_date=date(2024, 1, 2), task='t', notes='学习 线性代数'))
+    token_index_service.rebuild_for_user(user.id)
+    db.session.commit()
+
+    def etag():
+        return wordcloud_service.prepare_wordcloud(user, mask_name='book-open.png')[0]
+
+    try:
+        before = etag()
+        wordcloud_service._load_stopwords()
+
+        response = logged_in_client.post('/admin/wordcloud/reload-assets')
+        assert response.status_code == 200 and response.json['assets_version'] == 1
+        assert response.json['assets']['stopwords'] == 0 and len(recycled) == 1
+        after_admin = etag()
+        assert after_admin != before
+
+        # 另一个进程递增了共享版本号：本进程在下一次生成词云时丢弃旧资源
+        wordcloud_service._load_stopwords()
+        wordcloud_service.wordcloud_cache.backend.incr(wordcloud_service.ASSETS_VERSION_KEY)
+        after_other = etag()
+        assert after_other != after_admin
+        assert wordcloud_service.asset_stats()['stopwords'] == 0 and len(recycled) == 2
+
+        result = runner.invoke(args=['wordcloud', 'reload-assets'])
+        assert result.exit_code == 0 and 'version is now 3' in result.output
+        assert 'not shared' in result.output
+        assert etag() != after_other and len(recycled) == 3
+    finally:
+        wordcloud_service.wordcloud_cache.reset()
+        identity_service.identity_cache.reset()
+        wordcloud_service._assets_version = None